@@ -0,0 +1,302 @@
+"""
+Benchmarks for the render and update hot paths.
+
+    python -m benchmarks.bench --frames 300 --out bench.json
+
+Each scenario builds a synthetic world (size, tile size, tilled/planted fraction, inventory
+fill, camera motion and zoom, wandering entities) and times these separately:
+
+    tilemap.update (crop growth), player.update, entities.update (scenarios with entities only),
+    ground.update, render.submit and render.draw
+
+The render stages make the same calls as main.py's loop, against an offscreen surface: the
+scrolling GroundLayer, one RenderQueue for the map's objects, entities, player and HUD, and a
+full redraw when the view moved (or zoomed) or only the dirty rects when it held still.
+
+Every scenario runs in its own Python process, so its peak memory is its own. Per-frame mean,
+p50 and p99 (in milliseconds) and peak memory (peak_rss_bytes, in bytes) are written as JSON
+so runs can be diffed across versions.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not on Windows; psutil is used there if it is installed
+    resource = None
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+from engine.camera import Camera
+from engine.entities import Entities, villager_kind
+from engine.framebuffer import GroundLayer
+from engine.inventory import Inventory
+from engine.player import Player
+from engine.render import RenderQueue
+from engine.tilemap import TileMap
+from main import MAX_DIRTY_ENTITIES
+
+SCREEN_W, SCREEN_H = 800, 600
+
+SCENARIOS = [
+    # name, tiles per side, tile size, tilled fraction, planted fraction, inventory fill, camera motion
+    dict(name="default_25", tiles=25, tile=64, tilled=0.0, planted=0.0, inventory=2, camera="still"),
+    dict(name="medium_100", tiles=100, tile=32, tilled=0.5, planted=0.25, inventory=4, camera="pan"),
+    dict(name="full_200", tiles=200, tile=64, tilled=1.0, planted=1.0, inventory=8, camera="pan"),
+    dict(name="full_200_small_tiles", tiles=200, tile=16, tilled=1.0, planted=1.0, inventory=8, camera="pan"),
+    dict(name="full_200_jump", tiles=200, tile=64, tilled=1.0, planted=1.0, inventory=8, camera="jump"),
+    dict(name="full_200_crop_field", tiles=200, tile=64, tilled=1.0, planted=1.0, inventory=8, camera="pan",
+         crop_field=True),
+    dict(name="entities_1000", tiles=100, tile=64, tilled=0.0, planted=0.0, inventory=2, camera="pan",
+         entities=1000),
+    dict(name="full_200_overview", tiles=200, tile=64, tilled=1.0, planted=1.0, inventory=8, camera="still",
+         crop_field=True, zoom="fit"),
+    dict(name="full_200_zoom", tiles=200, tile=64, tilled=1.0, planted=1.0, inventory=8, camera="zoom",
+         crop_field=True),
+    dict(name="inventory_32_slots", tiles=25, tile=64, tilled=0.0, planted=0.0, inventory=32, slots=32,
+         camera="still"),
+]
+
+ITEM_NAMES = ["carrot_seed", "tomato_seed", "carrot", "tomato"]
+
+
+def build_world(spec, seed=0):
+    rng = random.Random(seed)
+    size = spec["tiles"] * spec["tile"]
+    tilemap = TileMap(size, size, spec["tile"], spec["tile"], use_crop_field=spec.get("crop_field", False))
+    tiles = [(c, r) for r in range(tilemap.rows) for c in range(tilemap.cols) if tilemap.is_tillable(c, r)]
+    rng.shuffle(tiles)
+    tilled = tiles[:int(len(tiles) * spec["tilled"])]
+    for c, r in tilled:
+        tilemap.till(c, r)
+    for i, (c, r) in enumerate(tilled[:int(len(tiles) * spec["planted"])]):
+        tilemap.plant(c, r, "carrot" if i % 2 else "tomato")
+
+    slots = spec.get("slots", 8)
+    inventory = Inventory(slot_count=slots, slot_size=96 if slots <= 8 else 24)
+    for i in range(min(spec["inventory"], slots)):
+        # distinct names so each fills its own slot
+        inventory.add_item(ITEM_NAMES[i] if i < len(ITEM_NAMES) else "item_%d" % i, 5)
+
+    player = Player(size // 2, size // 2)
+    player.inventory = inventory
+    camera = Camera(SCREEN_W, SCREEN_H, size, size)
+    if spec.get("zoom") == "fit":
+        camera.set_zoom(camera.min_zoom, instant=True)
+    entities = Entities(size, size, seed=seed)
+    count = spec.get("entities", 0)
+    if count:
+        entities.add_many(villager_kind(), [rng.uniform(0, size - 64) for _ in range(count)],
+                          [rng.uniform(0, size - 64) for _ in range(count)])
+    return tilemap, player, inventory, camera, entities
+
+
+def move_camera(spec, frame, camera, player, rng):
+    if spec["camera"] == "pan":
+        # walk diagonally across the world, bouncing at the edges
+        span_x = max(1, camera.world_w - SCREEN_W)
+        span_y = max(1, camera.world_h - SCREEN_H)
+        x = (frame * 7) % (2 * span_x)
+        y = (frame * 5) % (2 * span_y)
+        player.set_position(min(x, 2 * span_x - x) + (SCREEN_W - player.rect.width) // 2,
+                            min(y, 2 * span_y - y) + (SCREEN_H - player.rect.height) // 2)
+    elif spec["camera"] == "jump":
+        player.set_position(rng.randrange(camera.world_w) - player.rect.width // 2,
+                            rng.randrange(camera.world_h) - player.rect.height // 2)
+    elif spec["camera"] == "zoom" and frame % 90 == 0:
+        camera.overview()  # ease out to the whole farm, then back in, over and over
+    camera.update(player.rect, 1.0 / 60)
+
+
+def stats(samples):
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        "mean_ms": sum(ordered) / n * 1000.0,
+        "p50_ms": ordered[n // 2] * 1000.0,
+        "p99_ms": ordered[min(n - 1, int(n * 0.99))] * 1000.0,
+        "max_ms": ordered[-1] * 1000.0,
+    }
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process in bytes, or None where it can't be read."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KiB on Linux and the BSDs
+        return peak if sys.platform == "darwin" else peak * 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, "peak_wset", memory.rss)  # peak working set on Windows
+
+
+def run_scenario(spec, frames):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    tilemap, player, inventory, camera, entities = build_world(spec)
+    build_time = time.perf_counter() - t0
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    surface = pygame.Surface((SCREEN_W, SCREEN_H)).convert()
+    surface_rect = surface.get_rect()
+    ground = GroundLayer(SCREEN_W, SCREEN_H)
+    queue = RenderQueue()
+    rng = random.Random(1)
+    timings = {"tilemap.update": [], "player.update": []}
+    if len(entities):
+        timings["entities.update"] = []
+    timings.update({"ground.update": [], "render.submit": [], "render.draw": []})
+    clock = time.perf_counter
+    dt = 1.0 / 60
+    player.vx = player.vy = 0
+    prev_rects = []
+
+    for frame in range(frames):
+        move_camera(spec, frame, camera, player, rng)
+
+        t = clock()
+        tilemap.update(dt)
+        timings["tilemap.update"].append(clock() - t)
+
+        t = clock()
+        player.update(dt)
+        timings["player.update"].append(clock() - t)
+
+        if len(entities):
+            t = clock()
+            entities.update(dt)
+            timings["entities.update"].append(clock() - t)
+
+        # the rest is main.py's render path, stage for stage
+        view = camera.world_view_rect()
+        zoomed = camera.zoom != 1.0
+        highlight = tilemap.world_to_tile(player.rect.centerx, player.rect.centery)
+        t = clock()
+        if zoomed:
+            ground.invalidate()
+            moved, damage = True, []
+        else:
+            moved, damage = ground.update(tilemap, view)
+        timings["ground.update"].append(clock() - t)
+
+        t = clock()
+        sprite_rects = [camera.apply(player.render_rect()), tilemap.highlight_rect(highlight, view),
+                        inventory.hud_rect(SCREEN_W, SCREEN_H)]
+        entity_rects = entities.rects(view) if len(entities) else []
+        crowded = len(entity_rects) > MAX_DIRTY_ENTITIES
+        sprite_rects.extend(entity_rects)
+        queue.begin(view)
+        if not zoomed:
+            tilemap.submit_objects(queue)
+        entities.submit(queue)
+        player.submit(queue)
+        inventory.submit(queue, SCREEN_W, SCREEN_H)
+        timings["render.submit"].append(clock() - t)
+
+        t = clock()
+        if moved or crowded:
+            if zoomed:
+                tilemap.draw_zoomed(surface, camera, highlight, queue)
+            else:
+                surface.blit(ground.surface, (0, 0))
+                queue.draw_world(surface)
+                tilemap.draw_highlight(surface, view, highlight)
+            queue.draw_screen(surface)
+        else:
+            dirty = [rect.clip(surface_rect) for rect in damage + prev_rects + sprite_rects if rect]
+            for rect in dirty:
+                if rect.width and rect.height:
+                    surface.set_clip(rect)
+                    surface.blit(ground.surface, rect, rect)
+                    queue.draw_world(surface, rect.move(view.left, view.top))
+                    tilemap.draw_highlight(surface, view, highlight)
+                    queue.draw_screen(surface)
+            surface.set_clip(None)
+        timings["render.draw"].append(clock() - t)
+        prev_rects = sprite_rects
+
+    totals = [sum(parts) for parts in zip(*timings.values())]
+    return {
+        "spec": spec,
+        "frames": frames,
+        "build_s": build_time,
+        # Python-side allocations while building the world (SDL surface memory is in peak_rss_bytes)
+        "build_python_peak_bytes": build_peak,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "crops": tilemap.crop_count(),
+        "tilled": tilemap.count_tilled(),
+        "subsystems": {name: stats(samples) for name, samples in timings.items()},
+        "frame": stats(totals),
+    }
+
+
+def run_isolated(spec, frames):
+    """run_scenario in a fresh interpreter, so peak_rss_bytes covers this scenario alone."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench", "--frames", str(frames),
+                          "--scenario", spec["name"], "--child"],
+                         cwd=root, stdout=subprocess.PIPE, check=True).stdout
+    return json.loads(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the render and update hot paths.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--scenario", action="append", help="only run scenarios with this name (repeatable)")
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    # run the one --scenario in this process and print its result (what run_isolated starts)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        pygame.init()
+        pygame.display.set_mode((SCREEN_W, SCREEN_H))
+        spec = next(spec for spec in SCENARIOS if spec["name"] == args.scenario[0])
+        json.dump(run_scenario(spec, args.frames), sys.stdout)
+        pygame.quit()
+        return
+
+    results = []
+    for spec in SCENARIOS:
+        if args.scenario and spec["name"] not in args.scenario:
+            continue
+        result = run_isolated(spec, args.frames)
+        results.append(result)
+        frame = result["frame"]
+        peak = result["peak_rss_bytes"]
+        print("%-24s mean %7.3f ms  p50 %7.3f ms  p99 %7.3f ms  peak %s" % (
+            spec["name"], frame["mean_ms"], frame["p50_ms"], frame["p99_ms"],
+            "%.0f MiB" % (peak / 2 ** 20) if peak is not None else "n/a"), file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        # peak_rss_bytes is null where it can't be read (Windows without psutil)
+        "scenarios": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import hashlib
+import io
+import os
+import struct
+import time
+
+import pygame
+
+
+def get_asset_path(*parts):
+    base_dir = os.path.dirname(os.path.dirname(__file__))  # one level up from engine
+    return os.path.join(base_dir, "assets", *parts)
+
+
+# When headless, no surfaces are created at all (see set_headless)
+_headless = False
+
+
+def set_headless(flag=True):
+    """Run without a display: asset loading is skipped and world objects keep no surfaces."""
+    global _headless
+    _headless = bool(flag)
+
+
+def is_headless():
+    return _headless
+
+
+class TextureAtlas:
+    """
+    TextureAtlas(page_size=1024)
+    Packs small surfaces into shared pages using simple shelf packing.
+    add(surface) copies the surface in and returns a subsurface of the page.
+    """
+    def __init__(self, page_size=1024):
+        self.page_size = int(page_size)
+        self.pages = []
+        self._cursor_x = 0
+        self._cursor_y = 0
+        self._shelf_h = 0
+
+    def _new_page(self):
+        page = pygame.Surface((self.page_size, self.page_size), pygame.SRCALPHA)
+        try:
+            page = page.convert_alpha()
+        except pygame.error:
+            pass
+        self.pages.append(page)
+        self._cursor_x = 0
+        self._cursor_y = 0
+        self._shelf_h = 0
+        return page
+
+    def fits(self, w, h):
+        return w <= self.page_size and h <= self.page_size
+
+    def add(self, surface):
+        w, h = surface.get_size()
+        if not self.pages:
+            self._new_page()
+        # move to the next shelf when the current one is full
+        if self._cursor_x + w > self.page_size:
+            self._cursor_x = 0
+            self._cursor_y += self._shelf_h
+            self._shelf_h = 0
+        if self._cursor_y + h > self.page_size:
+            self._new_page()
+
+        page = self.pages[-1]
+        rect = pygame.Rect(self._cursor_x, self._cursor_y, w, h)
+        page.fill((0, 0, 0, 0), rect)
+        page.blit(surface, rect, special_flags=pygame.BLEND_RGBA_MAX)
+        self._cursor_x += w
+        self._shelf_h = max(self._shelf_h, h)
+        return page.subsurface(rect)
+
+
+# cached pixel file: magic, version, width, height, then width * height RGBA bytes
+PIXELS_MAGIC = b'SDVP'
+PIXELS_VERSION = 1
+PIXELS_HEADER = struct.Struct('<4sHII')
+
+_tobytes = getattr(pygame.image, 'tobytes', None) or pygame.image.tostring
+
+
+class PixelCache:
+    """
+    PixelCache(directory)
+    Converted and scaled images kept on disk as raw RGBA, so later runs skip PNG decoding and
+    smoothscale. Entries are named by a hash of the source file's bytes and the target size:
+    an edited asset just misses the cache (delete the directory to drop old entries).
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._digests = {}  # path -> (mtime_ns, file size, digest)
+
+    def digest(self, path, data=None):
+        """Hash of the file at path (data: its bytes, if already read); None if it can't be read."""
+        try:
+            st = os.stat(path)
+            known = self._digests.get(path)
+            if known and known[:2] == (st.st_mtime_ns, st.st_size):
+                return known[2]
+            if data is None:
+                with open(path, 'rb') as f:
+                    data = f.read()
+        except OSError:
+            return None
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        self._digests[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def _entry(self, digest, size):
+        name = "%s-%dx%d.px" % (digest, size[0], size[1]) if size else digest + "-full.px"
+        return os.path.join(self.directory, name)
+
+    def get(self, digest, size=None):
+        """Converted surface stored for (digest, size), or None."""
+        try:
+            with open(self._entry(digest, size), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < PIXELS_HEADER.size:
+            return None
+        magic, version, w, h = PIXELS_HEADER.unpack_from(data)
+        if (magic != PIXELS_MAGIC or version != PIXELS_VERSION or len(data) != PIXELS_HEADER.size + w * h * 4
+                or (size and (w, h) != size)):
+            return None
+        pixels = memoryview(data)[PIXELS_HEADER.size:]
+        return pygame.image.frombuffer(pixels, (w, h), 'RGBA').convert_alpha()
+
+    def put(self, digest, size, surf):
+        """Store surf for (digest, size); a cache that can't be written is skipped."""
+        w, h = surf.get_size()
+        path = self._entry(digest, size)
+        tmp = path + ".tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(PIXELS_HEADER.pack(PIXELS_MAGIC, PIXELS_VERSION, w, h))
+                f.write(_tobytes(surf, 'RGBA'))
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+
+class LazyImages(dict):
+    """
+    LazyImages(load)
+    Dict of key -> image that calls load(key) the first time a key is looked up. Keys already
+    loaded are plain dict lookups, so it can be indexed from drawing loops.
+    """
+    def __init__(self, load):
+        super().__init__()
+        self._load = load
+
+    def __missing__(self, key):
+        image = self[key] = self._load(key)
+        return image
+
+
+class AssetManager:
+    """
+    AssetManager(atlas_page_size=1024, atlas_max_tile=128, cache_dir=None)
+    Loads, converts and scales every image once, on first request. Results are cached by
+    (path, size); surfaces no larger than atlas_max_tile on either side are packed into a
+    shared atlas. With cache_dir, converted pixels are also kept on disk (see PixelCache).
+    """
+    def __init__(self, atlas_page_size=1024, atlas_max_tile=128, cache_dir=None):
+        self.atlas = TextureAtlas(atlas_page_size)
+        self.atlas_max_tile = int(atlas_max_tile)
+        self._sheets = {}   # path -> converted full-size surface (or None if missing)
+        self._images = {}   # (path, size) -> scaled surface
+        self._derived = {}  # caller-defined key -> surface or list of surfaces
+        self.disk_cache = None
+        self.set_cache_dir(cache_dir)
+        # what loading has cost so far (see summary)
+        self.stats = {'images': 0, 'cache_hits': 0, 'decoded': 0, 'scaled': 0, 'seconds': 0.0}
+
+    def set_cache_dir(self, cache_dir):
+        """Keep converted pixels under cache_dir from now on (None: memory only)."""
+        self.disk_cache = PixelCache(cache_dir) if cache_dir else None
+
+    def _pack(self, surf):
+        w, h = surf.get_size()
+        if w <= self.atlas_max_tile and h <= self.atlas_max_tile:
+            return self.atlas.add(surf)
+        return surf
+
+    def _load_sheet(self, path):
+        if path in self._sheets:
+            return self._sheets[path]
+        surf = None
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                cache = self.disk_cache
+                digest = cache.digest(path, data) if cache else None
+                surf = cache.get(digest) if digest else None
+                if surf is not None:
+                    self.stats['cache_hits'] += 1
+                else:
+                    surf = pygame.image.load(io.BytesIO(data), path).convert_alpha()
+                    self.stats['decoded'] += 1
+                    if digest:
+                        cache.put(digest, None, surf)
+            except Exception:
+                surf = None
+        self._sheets[path] = surf
+        return surf
+
+    def sheet(self, path):
+        """Return the converted image at path, or None if it is missing, unreadable or headless."""
+        if _headless:
+            return None
+        if path in self._sheets:
+            return self._sheets[path]
+        start = time.perf_counter()
+        surf = self._load_sheet(path)
+        self.stats['images'] += 1
+        self.stats['seconds'] += time.perf_counter() - start
+        return surf
+
+    def image(self, path, size=None):
+        """Return the image at path scaled to size, or a magenta placeholder if it can't be loaded."""
+        if _headless:
+            return None
+        size = tuple(size) if size else None
+        key = (path, size)
+        surf = self._images.get(key)
+        if surf is not None:
+            return surf
+
+        start = time.perf_counter()
+        cache = self.disk_cache
+        digest = cache.digest(path) if cache and size else None
+        surf = cache.get(digest, size) if digest else None
+        if surf is not None:
+            # scaled copy from an earlier run; the full-size sheet isn't needed
+            self.stats['cache_hits'] += 1
+        else:
+            sheet = self._load_sheet(path)
+            if sheet is not None:
+                if size:
+                    surf = pygame.transform.smoothscale(sheet, size)
+                    self.stats['scaled'] += 1
+                    if digest:
+                        cache.put(digest, size, surf)
+                else:
+                    surf = sheet
+            else:
+                # fallback (pink placeholder)
+                surf = pygame.Surface(size or (64, 64), pygame.SRCALPHA)
+                surf.fill((255, 0, 255))
+
+        surf = self._pack(surf)
+        self._images[key] = surf
+        self.stats['images'] += 1
+        self.stats['seconds'] += time.perf_counter() - start
+        return surf
+
+    def derived(self, key, build):
+        """
+        Return the cached result of build() for key. build returns a surface or a list of
+        surfaces cut from other assets (e.g. animation frames); small ones go into the atlas.
+        """
+        if _headless:
+            return None
+        if key in self._derived:
+            return self._derived[key]
+        result = build()
+        if isinstance(result, list):
+            result = [self._pack(s) for s in result]
+        elif result is not None:
+            result = self._pack(result)
+        self._derived[key] = result
+        return result
+
+    def summary(self):
+        """One line on what loading images has cost so far."""
+        stats = self.stats
+        return ("assets: %d images in %.1f ms (%d from the disk cache, %d decoded, %d scaled)"
+                % (stats['images'], stats['seconds'] * 1000.0, stats['cache_hits'], stats['decoded'], stats['scaled']))
+
+    def clear(self):
+        self._sheets.clear()
+        self._images.clear()
+        self._derived.clear()
+        self.atlas = TextureAtlas(self.atlas.page_size)
+
+
+_default = None
+
+
+def get_assets():
+    """Return the engine-wide AssetManager."""
+    global _default
+    if _default is None:
+        _default = AssetManager()
+    return _default
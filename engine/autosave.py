@@ -0,0 +1,324 @@
+"""
+Background autosave.
+
+Autosave runs as a simulation system, so it only ever looks at the world between ticks. When a
+save is due it takes a WorldSnapshot, which shares the TileMap's grid and flag arrays instead of
+copying them; the first change to a chunk's tiles or crops while a snapshot is pending copies
+just that chunk for the snapshot (TileMap._before_write). The crop index is shared the same
+way, since a crop's growth is a pure function of its planted tick; the NumPy crop field's
+arrays are copied.
+
+A worker thread then encodes the snapshot into the engine.savefile format in a temporary file
+and renames it over the previous save, so a crash mid-write leaves the old save intact. Chunk
+records that haven't changed since the previous save are copied over without re-encoding.
+While the map still reads chunks it hasn't loaded yet from the previous save, the rename is
+left to the main thread (Autosave.poll), which swaps the map over to the new file.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import defaultdict
+
+from .crop import CROP_STAGES
+from .savefile import (HEADER, SaveFile, SaveFormatError, _meta, _replace_save, _write_tail, encode_chunk,
+                       inventory_state)
+from .tilemap import CHUNK_TILES
+
+log = logging.getLogger(__name__)
+
+
+class WorldSnapshot:
+    """
+    WorldSnapshot(tilemap, inventory=None, player=None)
+    The state of tilemap (plus inventory slots and player position) at the current tick, cheap
+    to take and safe to read from another thread while the game keeps running. Exposes the
+    chunk_bounds/chunk_arrays/crop_states interface engine.savefile.encode_chunk reads.
+    """
+    def __init__(self, tilemap, inventory=None, player=None):
+        self.tick = tilemap.tick
+        self.cols, self.rows = tilemap.cols, tilemap.rows
+        self.tile_w, self.tile_h = tilemap.tile_w, tilemap.tile_h
+        self.chunk_cols, self.chunk_rows = tilemap.chunk_cols, tilemap.chunk_rows
+        self.palette_names = [tile.name for tile in tilemap.palette.tiles]
+        self.inventory = inventory_state(inventory)
+        self.player_pos = tuple(player.rect.topleft) if player is not None else None
+
+        # shared with the map until TileMap._before_write asks for a private copy
+        self.grid = tilemap.grid
+        self.flags = tilemap.flags
+        self._preserved = {}
+        self._lock = threading.Lock()
+
+        self.source = tilemap.save_path
+        self.unloaded = frozenset(tilemap._unloaded)
+        # the map starts a fresh dirty set; a failed save hands these back
+        self.dirty = tilemap.save_dirty
+        tilemap.save_dirty = set()
+        self.prev_growing = tilemap.save_growing
+
+        if tilemap.crop_field is not None:
+            # field arrays are a few contiguous buffers, and swap-removal moves crops between
+            # chunks, so they are copied outright
+            from .cropfield import CROP_TYPES
+            field = tilemap.crop_field
+            n = field.count
+            self._crop_types = list(CROP_TYPES)
+            self._field = (field.col[:n].copy(), field.row[:n].copy(), field.type_id[:n].copy(),
+                           field.stage[:n].copy(), field.growth[:n].copy())
+            self._crop_index = None
+        else:
+            # shared like the grid; a crop's growth is a pure function of its planted tick
+            self._field = None
+            self._crop_index = tilemap.crop_index
+        self._by_chunk = None
+
+        self.growing = None  # chunks with growing crops, filled in by crop_states
+        self.done = threading.Event()
+        self.error = None
+        self.written = 0
+
+    def _chunk_crops(self, cx, cy):
+        # [(col, row, Crop)] of one chunk in the shared crop index; call with the lock held
+        c0, r0, c1, r1 = self.chunk_bounds(cx, cy)
+        get = self._crop_index.get
+        crops = []
+        for r in range(r0, r1):
+            for c in range(c0, c1):
+                crop = get((c, r))
+                if crop is not None:
+                    crops.append((c, r, crop))
+        return crops
+
+    def preserve(self, cx, cy):
+        """Keep a private copy of chunk (cx, cy) before the map changes it."""
+        with self._lock:
+            if (cx, cy) not in self._preserved:
+                c0, r0, c1, r1 = self.chunk_bounds(cx, cy)
+                crops = self._chunk_crops(cx, cy) if self._crop_index is not None else None
+                self._preserved[(cx, cy)] = (self.grid[r0:r1, c0:c1].copy(), self.flags[r0:r1, c0:c1].copy(), crops)
+
+    def chunk_bounds(self, cx, cy):
+        c0, r0 = cx * CHUNK_TILES, cy * CHUNK_TILES
+        return c0, r0, min(self.cols, c0 + CHUNK_TILES), min(self.rows, r0 + CHUNK_TILES)
+
+    def chunk_arrays(self, cx, cy):
+        with self._lock:
+            preserved = self._preserved.get((cx, cy))
+            if preserved is not None:
+                return preserved[:2]
+            c0, r0, c1, r1 = self.chunk_bounds(cx, cy)
+            return self.grid[r0:r1, c0:c1].copy(), self.flags[r0:r1, c0:c1].copy()
+
+    def _bucket_crops(self):
+        # (cx, cy) -> [(col, row, crop_type, stage, progress), ...] as of self.tick
+        by_chunk = defaultdict(list)
+        growing = set()
+        ripe = CROP_STAGES - 1
+        if self._field is not None:
+            col, row, type_id, stage, growth = self._field
+            for c, r, tid, st, g in zip(col.tolist(), row.tolist(), type_id.tolist(), stage.tolist(), growth.tolist()):
+                key = (c // CHUNK_TILES, r // CHUNK_TILES)
+                if st < ripe:
+                    growing.add(key)
+                by_chunk[key].append((c, r, self._crop_types[tid], st, 0 if st >= ripe else g))
+        else:
+            tick = self.tick
+            for cy in range(self.chunk_rows):
+                for cx in range(self.chunk_cols):
+                    if (cx, cy) in self.unloaded:
+                        continue
+                    with self._lock:
+                        preserved = self._preserved.get((cx, cy))
+                        crops = preserved[2] if preserved is not None else self._chunk_crops(cx, cy)
+                    for c, r, crop in crops:
+                        stage = crop.stage_at(tick)
+                        if stage < len(crop.frames) - 1:
+                            growing.add((cx, cy))
+                            progress = max(0, tick - crop.planted_tick - stage * crop.growth_speed)
+                        else:
+                            progress = 0
+                        by_chunk[(cx, cy)].append((c, r, crop.crop_type, stage, progress))
+        self._by_chunk = by_chunk
+        self.growing = growing
+
+    def crop_states(self, c0, r0, c1, r1):
+        """Crop states of the chunk whose bounds are (c0, r0, c1, r1)."""
+        if self._by_chunk is None:
+            self._bucket_crops()
+        return self._by_chunk.get((c0 // CHUNK_TILES, r0 // CHUNK_TILES), [])
+
+    def write(self, path, replace=True):
+        """
+        Write the snapshot to path through a temporary file and an atomic rename (left to the
+        caller with replace=False). If the map was last saved to (or loaded from) path, records
+        of chunks unchanged since then are copied from that file. Returns the number of chunk
+        records encoded.
+        """
+        if self._by_chunk is None:
+            self._bucket_crops()
+        previous = None
+        if self.source == path and os.path.exists(path):
+            try:
+                previous = SaveFile(path)
+            except (OSError, SaveFormatError):
+                previous = None
+            if previous is not None and not previous.compatible(self, self.palette_names):
+                previous.close()
+                previous = None
+        if previous is None and self.unloaded:
+            raise SaveFormatError("%s: chunks not loaded yet and no previous save to copy them from" % path)
+
+        stale = self.dirty | self.growing | self.prev_growing
+        crop_types = {}
+        if previous is not None:
+            crop_types = {name: i for i, name in enumerate(previous.meta['crop_types'])}
+        index = {}
+        encoded = 0
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(b'\0' * HEADER.size)
+                for cy in range(self.chunk_rows):
+                    for cx in range(self.chunk_cols):
+                        key = (cx, cy)
+                        if previous is not None and key in previous.index and (key in self.unloaded or key not in stale):
+                            record, crc = previous.record(cx, cy)
+                        else:
+                            record = encode_chunk(self, cx, cy, crop_types)
+                            crc = zlib.crc32(record)
+                            encoded += 1
+                        index[key] = (f.tell(), len(record), crc)
+                        f.write(record)
+                meta = _meta(self.palette_names, crop_types, self.tick, self.inventory, self.player_pos)
+                _write_tail(f, index, meta, self)
+        finally:
+            if previous is not None:
+                previous.close()
+        if replace:
+            os.replace(tmp_path, path)
+        self.written = encoded
+        return encoded
+
+
+class Autosave:
+    """
+    Autosave(path, tilemap, inventory=None, player=None, interval=120.0)
+    Saves the world to path every `interval` simulated seconds (0 disables the timer) and
+    whenever request() is called, without blocking the game: register update() as a
+    simulation system. Only one save is in flight at a time.
+    """
+    def __init__(self, path, tilemap, inventory=None, player=None, interval=120.0):
+        self.path = path
+        self.tilemap = tilemap
+        self.inventory = inventory
+        self.player = player
+        self.interval = float(interval)
+        self.elapsed = 0.0
+        self.requested = False
+
+        self.pending = None
+        self.saves = 0
+        self.last_snapshot_ms = None
+        self.last_write_ms = None
+        self.last_error = None
+
+        self._jobs = queue.Queue()
+        self._thread = None
+
+    def request(self):
+        """Save at the next tick boundary."""
+        self.requested = True
+
+    def busy(self):
+        return self.pending is not None
+
+    def update(self, dt):
+        self.poll()
+        self.elapsed += dt
+        if self.pending is None and (self.requested or (self.interval > 0 and self.elapsed >= self.interval)):
+            self.start()
+
+    def start(self):
+        """Snapshot the world now and hand it to the worker thread."""
+        tilemap = self.tilemap
+        start = time.perf_counter()
+        if tilemap._unloaded and tilemap.save_path != self.path:
+            # chunks still on disk can only be copied from the file they were loaded from
+            tilemap.load_all_chunks()
+        if tilemap.save_file is not None and not tilemap._unloaded:
+            tilemap.save_file.close()
+            tilemap.save_file = None
+        snapshot = WorldSnapshot(tilemap, self.inventory, self.player)
+        tilemap.snapshots = tilemap.snapshots + (snapshot,)
+        self.last_snapshot_ms = (time.perf_counter() - start) * 1000.0
+
+        self.pending = snapshot
+        self.elapsed = 0.0
+        self.requested = False
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+            self._thread.start()
+        self._jobs.put(snapshot)
+        return snapshot
+
+    def _run(self):
+        while True:
+            snapshot = self._jobs.get()
+            if snapshot is None:
+                return
+            start = time.perf_counter()
+            try:
+                # the map may still be reading pending chunks from the file at path
+                snapshot.write(self.path, replace=not snapshot.unloaded)
+            except Exception as e:
+                snapshot.error = e
+            self.last_write_ms = (time.perf_counter() - start) * 1000.0
+            snapshot.done.set()
+
+    def poll(self):
+        """Finish up a save the worker has completed; returns True if one did."""
+        snapshot = self.pending
+        if snapshot is None or not snapshot.done.is_set():
+            return False
+        self.pending = None
+        tilemap = self.tilemap
+        tilemap.snapshots = tuple(s for s in tilemap.snapshots if s is not snapshot)
+        if snapshot.error is None and snapshot.unloaded:
+            try:
+                _replace_save(self.path + '.tmp', self.path, tilemap)
+            except OSError as e:
+                snapshot.error = e
+        if snapshot.error is not None:
+            self.last_error = snapshot.error
+            # nothing was written: those chunks still need saving
+            tilemap.save_dirty |= snapshot.dirty
+            log.warning("Autosave to %s failed: %s", self.path, snapshot.error)
+            return True
+        self.saves += 1
+        self.last_error = None
+        tilemap.save_path = self.path
+        tilemap.save_growing = snapshot.growing
+        return True
+
+    def wait(self, timeout=None):
+        """Block until the in-flight save (if any) has finished."""
+        snapshot = self.pending
+        if snapshot is not None:
+            snapshot.done.wait(timeout)
+        self.poll()
+
+    def save_now(self):
+        """Blocking save, e.g. on quit."""
+        self.wait()
+        self.start()
+        self.wait()
+
+    def close(self):
+        self.wait()
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,58 @@
+"""
+Autotiling: grass next to tilled soil is drawn with the grass-edge sprite that matches its
+neighbours, so tilled patches get proper borders instead of hard square edges.
+
+A grass tile's 8 neighbours form a bitmask (one bit per neighbour that is soil), and a lookup
+table built once from variant_name() maps each of the 256 masks straight to the palette id to
+draw. The map keeps the resolved ids in a grid of their own next to its tile ids; edits only
+re-resolve the 3x3 block around the changed tile, and drawing just reads the cached ids.
+"""
+import numpy as np
+
+# neighbour bits of the mask
+N, NE, E, SE, S, SW, W, NW = (1 << i for i in range(8))
+# (bit, row offset, col offset)
+NEIGHBOURS = ((N, -1, 0), (NE, -1, 1), (E, 0, 1), (SE, 1, 1), (S, 1, 0), (SW, 1, -1), (W, 0, -1), (NW, -1, -1))
+
+
+def variant_name(mask):
+    """Name of the tile drawn for a grass cell whose soil neighbours are mask."""
+    vertical = 'up' if mask & N and not mask & S else 'down' if mask & S and not mask & N else None
+    horizontal = 'left' if mask & W and not mask & E else 'right' if mask & E and not mask & W else None
+    if vertical and horizontal:
+        return vertical + '_' + horizontal  # outer corner: soil on two sides
+    if vertical or horizontal:
+        return vertical or horizontal
+    if mask & (N | E | S | W):
+        return 'grass'  # soil on opposite sides; there is no sprite for a one-tile strip
+    # soil only diagonally: inner corner
+    for bit, name in ((NW, 'corner_northwest'), (NE, 'corner_northeast'),
+                      (SW, 'corner_south_west'), (SE, 'corner_southeast')):
+        if mask & bit:
+            return name
+    return 'grass'
+
+
+class Autotiler:
+    """
+    Autotiler(palette, base='grass', soil='dirt')
+    Resolves which tile to draw for each base (grass) cell from the soil cells around it.
+    Cells of any other kind are drawn as they are.
+    """
+    def __init__(self, palette, base='grass', soil='dirt'):
+        self.base_id = palette.id_of(base)
+        self.soil_id = palette.id_of(soil)
+        self.lut = np.array([palette.id_of(variant_name(mask)) for mask in range(256)], dtype=np.uint16)
+
+    def resolve(self, padded):
+        """
+        Drawn tile ids for a block of tile ids given with a one-tile ring of neighbours around
+        it (padded is (h + 2) x (w + 2); pad cells outside the world with base_id).
+        """
+        soil = padded == self.soil_id
+        h, w = padded.shape[0] - 2, padded.shape[1] - 2
+        mask = np.zeros((h, w), dtype=np.uint8)
+        for bit, dr, dc in NEIGHBOURS:
+            mask[soil[1 + dr:1 + dr + h, 1 + dc:1 + dc + w]] |= bit
+        inner = padded[1:-1, 1:-1]
+        return np.where(inner == self.base_id, self.lut[mask], inner).astype(padded.dtype)
@@ -1,17 +1,35 @@
+import math
+
 import pygame
 
+# zoom eases towards its target at this rate (1/s, in log space) and snaps when this close to it
+ZOOM_RATE = 12.0
+ZOOM_SNAP = 0.002
+
+
 class Camera:
     """
-    Camera(screen_w, screen_h, world_w, world_h)
-    Provides apply(rect) -> rect translated to screen coordinates,
+    Camera(screen_w, screen_h, world_w=None, world_h=None, min_zoom=None, max_zoom=2.0)
+    Provides apply(rect) -> rect translated (and scaled) to screen coordinates,
     update(target) centers camera on target and clamps to world bounds.
+    Without world bounds (streaming worlds) the camera follows the target anywhere.
+
+    zoom is screen pixels per world pixel; rect is the world area on screen, so it grows as
+    the camera zooms out. set_zoom/zoom_by set a target the zoom eases to in update(target, dt);
+    overview() fits the whole world on screen. min_zoom defaults to that fit (0.5 unbounded).
     """
-    def __init__(self, screen_w, screen_h, world_w, world_h):
+    def __init__(self, screen_w, screen_h, world_w=None, world_h=None, min_zoom=None, max_zoom=2.0):
         self.screen_w = int(screen_w)
         self.screen_h = int(screen_h)
-        self.world_w = int(world_w)
-        self.world_h = int(world_h)
+        self.world_w = int(world_w) if world_w is not None else None
+        self.world_h = int(world_h) if world_h is not None else None
         self.rect = pygame.Rect(0, 0, self.screen_w, self.screen_h)
+        self.zoom = 1.0
+        self.target_zoom = 1.0
+        if min_zoom is None:
+            min_zoom = min(1.0, self.fit_zoom()) if self.world_w is not None else 0.5
+        self.min_zoom = float(min_zoom)
+        self.max_zoom = float(max_zoom)
 
     @property
     def offset_x(self):
@@ -23,15 +41,44 @@ class Camera:
 
     def apply(self, rect):
         """Return a rect positioned for blitting to the screen."""
-        return rect.move(-self.rect.left, -self.rect.top)
+        if self.zoom == 1.0:
+            return rect.move(-self.rect.left, -self.rect.top)
+        z = self.zoom
+        left = math.floor((rect.left - self.rect.left) * z)
+        top = math.floor((rect.top - self.rect.top) * z)
+        return pygame.Rect(left, top, math.ceil((rect.right - self.rect.left) * z) - left,
+                           math.ceil((rect.bottom - self.rect.top) * z) - top)
+
+    def screen_to_world(self, pos):
+        """World pixel under screen position pos."""
+        return (math.floor(self.rect.left + pos[0] / self.zoom), math.floor(self.rect.top + pos[1] / self.zoom))
 
     def world_view_rect(self):
         return self.rect
 
-    def update(self, target):
+    def fit_zoom(self):
+        """Zoom that shows the whole world (None without world bounds)."""
+        if self.world_w is None or self.world_h is None:
+            return None
+        return min(self.screen_w / self.world_w, self.screen_h / self.world_h)
+
+    def set_zoom(self, zoom, instant=False):
+        self.target_zoom = max(self.min_zoom, min(self.max_zoom, float(zoom)))
+        if instant:
+            self.zoom = self.target_zoom
+
+    def zoom_by(self, factor):
+        self.set_zoom(self.target_zoom * factor)
+
+    def overview(self):
+        """Zoom out to the whole world (unbounded: as far as allowed), or back to 1:1 from there."""
+        self.set_zoom(1.0 if self.target_zoom <= self.min_zoom else self.min_zoom)
+
+    def update(self, target, dt=None):
         """
         Center the camera on the target (sprite or rect-like).
-        Accepts a sprite with .rect or a pygame.Rect.
+        Accepts a sprite with .rect or a pygame.Rect. With dt the zoom eases towards its
+        target; without, it jumps there.
         """
         if hasattr(target, "rect"):
             center = target.rect.center
@@ -40,8 +87,23 @@ class Camera:
         else:
             return
 
+        if self.zoom != self.target_zoom:
+            step = math.log(self.target_zoom / self.zoom)
+            if dt is not None and abs(step) > ZOOM_SNAP:
+                self.zoom *= math.exp(step * min(1.0, dt * ZOOM_RATE))
+            else:
+                self.zoom = self.target_zoom
+        self.rect.size = (round(self.screen_w / self.zoom), round(self.screen_h / self.zoom))
         self.rect.center = center
 
-        # Clamp to world bounds
-        self.rect.left = max(0, min(self.rect.left, self.world_w - self.rect.width))
-        self.rect.top = max(0, min(self.rect.top, self.world_h - self.rect.height))
+        if self.world_w is None or self.world_h is None:
+            return
+        # Clamp to world bounds; a view larger than the world is centered on it
+        if self.rect.width > self.world_w:
+            self.rect.left = (self.world_w - self.rect.width) // 2
+        else:
+            self.rect.left = max(0, min(self.rect.left, self.world_w - self.rect.width))
+        if self.rect.height > self.world_h:
+            self.rect.top = (self.world_h - self.rect.height) // 2
+        else:
+            self.rect.top = max(0, min(self.rect.top, self.world_h - self.rect.height))
@@ -0,0 +1,43 @@
+"""
+Tile collision for boxes moving over a tile map.
+
+The map answers blocked(c0, r0, c1, r1): is any tile in [c0, c1) x [r0, r1) solid. TileMap
+and StreamingTileMap keep a solid bitmap next to their tile ids (from TilePalette.solid) for
+this. A move is resolved one axis at a time, and only the tile columns (then rows) that the
+box's leading edge enters are tested, so a step costs the same on any map size.
+"""
+import math
+
+
+def sweep(tilemap, x, y, w, h, dx, dy):
+    """
+    How far the box (x, y, w, h) (world pixels, floats) can move of (dx, dy) before a solid
+    tile stops it: x first, then y from the new x. Returns the allowed (dx, dy).
+    """
+    tw, th = tilemap.tile_w, tilemap.tile_h
+    if dx:
+        r0, r1 = math.floor(y / th), math.ceil((y + h) / th)
+        if dx > 0:
+            for c in range(math.ceil((x + w) / tw), math.ceil((x + w + dx) / tw)):
+                if tilemap.blocked(c, r0, c + 1, r1):
+                    dx = c * tw - (x + w)
+                    break
+        else:
+            for c in range(math.floor(x / tw) - 1, math.floor((x + dx) / tw) - 1, -1):
+                if tilemap.blocked(c, r0, c + 1, r1):
+                    dx = (c + 1) * tw - x
+                    break
+        x += dx
+    if dy:
+        c0, c1 = math.floor(x / tw), math.ceil((x + w) / tw)
+        if dy > 0:
+            for r in range(math.ceil((y + h) / th), math.ceil((y + h + dy) / th)):
+                if tilemap.blocked(c0, r, c1, r + 1):
+                    dy = r * th - (y + h)
+                    break
+        else:
+            for r in range(math.floor(y / th) - 1, math.floor((y + dy) / th) - 1, -1):
+                if tilemap.blocked(c0, r, c1, r + 1):
+                    dy = (r + 1) * th - y
+                    break
+    return dx, dy
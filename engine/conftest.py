@@ -0,0 +1,16 @@
+import os
+
+# never open a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+import pytest
+
+
+@pytest.fixture
+def display():
+    """A (dummy) 800x600 display, so surfaces can be converted and drawn like in the game."""
+    pygame.display.init()
+    screen = pygame.display.set_mode((800, 600))
+    yield screen
+    pygame.display.quit()
@@ -1,30 +1,24 @@
-import os
 import pygame
+from .assets import get_asset_path, get_assets, is_headless
 
-def get_asset_path(*parts):
-    base_dir = os.path.dirname(os.path.dirname(__file__))  # one level up from engine
-    return os.path.join(base_dir, "assets", *parts)
+CROP_STAGES = 3  # columns in carrot_and_tomato.png
 
-class Crop(pygame.sprite.Sprite):
-    def __init__(self, x, y, crop_type, frame_w=32, frame_h=32):
-        super().__init__()
-        self.crop_type = crop_type
-        self.growth_timer = 0
-        self.stage = 0
-        self.growth_speed = 120  # ticks per stage (simple)
 
+def load_crop_frames(crop_type, frame_w=32, frame_h=32):
+    """
+    Growth-stage frames for crop_type, built once and shared by every crop of that type and size.
+    Headless runs get CROP_STAGES None placeholders so stage logic still works.
+    """
+    if is_headless():
+        return [None] * CROP_STAGES
+
+    def build():
         # Load combined growth sheet: 2 rows (tomato, carrot) x 3 columns (stages)
-        sheet_path = get_asset_path("crop", "carrot_and_tomato.png")
-        sheet = None
-        if os.path.exists(sheet_path):
-            try:
-                sheet = pygame.image.load(sheet_path).convert_alpha()
-            except Exception:
-                sheet = None
+        sheet = get_assets().sheet(get_asset_path("crop", "carrot_and_tomato.png"))
 
         if sheet:
             w, h = sheet.get_size()
-            cols = 3
+            cols = CROP_STAGES
             rows = 2
             cell_w = w // cols
             cell_h = h // rows
@@ -38,19 +32,53 @@ class Crop(pygame.sprite.Sprite):
                 rect = sub.get_rect(center=(surf.get_width()//2, surf.get_height()//2))
                 surf.blit(sub, rect)
                 frames.append(surf)
-            self.frames = frames
-        else:
-            # placeholder green rectangle
-            surf = pygame.Surface((frame_w*2, frame_h*2), pygame.SRCALPHA)
-            surf.fill((0,200,0))
-            self.frames = [surf]
+            return frames
+
+        # placeholder green rectangle
+        surf = pygame.Surface((frame_w*2, frame_h*2), pygame.SRCALPHA)
+        surf.fill((0,200,0))
+        return [surf]
+
+    return get_assets().derived(("crop_frames", crop_type, frame_w, frame_h), build)
+
+
+class Crop(pygame.sprite.Sprite):
+    """
+    Crop(x, y, crop_type, frame_w=32, frame_h=32, planted_tick=0)
+    Growth is a pure function of the tick the crop was planted on, so a crop does no work
+    between stage boundaries. Call update(tick) when next_stage_tick() is reached.
+    """
+    def __init__(self, x, y, crop_type, frame_w=32, frame_h=32, planted_tick=0):
+        super().__init__()
+        self.crop_type = crop_type
+        self.planted_tick = planted_tick
+        self.stage = 0
+        self.growth_speed = 120  # ticks per stage (simple)
+        self.tile = None  # (col, row) once planted on a TileMap
 
+        self.frames = load_crop_frames(crop_type, frame_w, frame_h)
         self.image = self.frames[self.stage]
-        self.rect = self.image.get_rect(topleft=(x, y))
-
-    def update(self):
-        self.growth_timer += 1
-        if self.growth_timer >= self.growth_speed and self.stage < len(self.frames) - 1:
-            self.stage += 1
-            self.image = self.frames[self.stage]
-            self.growth_timer = 0
\ No newline at end of file
+        self.rect = pygame.Rect(x, y, frame_w * 2, frame_h * 2)
+
+    def is_ripe(self):
+        return self.stage >= len(self.frames) - 1
+
+    def stage_at(self, tick):
+        return max(0, min(len(self.frames) - 1, (tick - self.planted_tick) // self.growth_speed))
+
+    def ticks_in_stage(self, tick):
+        """Ticks spent in the current stage as of tick."""
+        return max(0, tick - self.planted_tick - self.stage * self.growth_speed)
+
+    def next_stage_tick(self):
+        """Tick on which the next stage is reached, or None once fully grown."""
+        if self.is_ripe():
+            return None
+        return self.planted_tick + (self.stage + 1) * self.growth_speed
+
+    def update(self, tick):
+        """Bring stage and image up to date for tick."""
+        stage = self.stage_at(tick)
+        if stage != self.stage:
+            self.stage = stage
+            self.image = self.frames[stage]
@@ -0,0 +1,238 @@
+import numpy as np
+import pygame
+from .crop import CROP_STAGES, load_crop_frames
+from .render import RenderQueue
+
+# crop type name <-> compact id stored in the arrays
+CROP_TYPES = ['tomato', 'carrot']
+CROP_IDS = {name: i for i, name in enumerate(CROP_TYPES)}
+# dtype of CropField.type_id; sets how many crop types can be registered
+TYPE_ID_DTYPE = np.uint16
+
+
+def crop_type_id(crop_type):
+    """Return the id for crop_type, registering it if it is new."""
+    tid = CROP_IDS.get(crop_type)
+    if tid is None:
+        tid = len(CROP_TYPES)
+        if tid > np.iinfo(TYPE_ID_DTYPE).max:
+            raise ValueError("can't register crop type %r: all %d crop type ids are taken" % (crop_type, tid))
+        CROP_TYPES.append(crop_type)
+        CROP_IDS[crop_type] = tid
+    return tid
+
+
+class CropView(pygame.sprite.Sprite):
+    """
+    Sprite-compatible view of one crop stored in a CropField.
+    Exposes the same attributes as Crop (crop_type, stage, image, rect, tile, is_ripe)
+    but reads them from the field's arrays, so it never goes stale.
+    """
+    def __init__(self, field, c, r):
+        super().__init__()
+        self.field = field
+        self.tile = (c, r)
+        wx, wy = field.tile_w * c, field.tile_h * r
+        self.rect = pygame.Rect(wx, wy, field.tile_w, field.tile_h)
+
+    @property
+    def _slot(self):
+        return self.field.index[self.tile]
+
+    @property
+    def crop_type(self):
+        return CROP_TYPES[self.field.type_id[self._slot]]
+
+    @property
+    def stage(self):
+        return int(self.field.stage[self._slot])
+
+    @property
+    def growth_timer(self):
+        return int(self.field.growth[self._slot])
+
+    @property
+    def growth_speed(self):
+        return self.field.growth_speed
+
+    @property
+    def frames(self):
+        return self.field.frames_for(self.field.type_id[self._slot])
+
+    @property
+    def image(self):
+        frames = self.frames
+        return frames[min(self.stage, len(frames) - 1)]
+
+    def is_ripe(self):
+        return self.stage >= CROP_STAGES - 1
+
+
+class CropField:
+    """
+    CropField(tile_w, tile_h, growth_speed=120, capacity=256)
+    Structure-of-arrays crop storage: type id, tile position, stage and growth ticks live in
+    NumPy arrays so update() advances every crop with a handful of vectorized operations.
+    Slots [0, count) are always live; removal swaps the last crop into the freed slot.
+    """
+    def __init__(self, tile_w, tile_h, growth_speed=120, capacity=256):
+        self.tile_w = int(tile_w)
+        self.tile_h = int(tile_h)
+        self.growth_speed = int(growth_speed)  # ticks per stage, same as Crop
+        self.count = 0
+        self.index = {}  # (col, row) -> slot
+
+        capacity = max(1, int(capacity))
+        self.type_id = np.zeros(capacity, dtype=TYPE_ID_DTYPE)
+        self.col = np.zeros(capacity, dtype=np.int32)
+        self.row = np.zeros(capacity, dtype=np.int32)
+        self.stage = np.zeros(capacity, dtype=np.uint8)
+        self.growth = np.zeros(capacity, dtype=np.int32)
+
+        self._frames = {}  # type id -> frame list, loaded on first draw
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, tile):
+        return tile in self.index
+
+    def _grow_capacity(self):
+        new_cap = len(self.type_id) * 2
+        for name in ('type_id', 'col', 'row', 'stage', 'growth'):
+            old = getattr(self, name)
+            arr = np.zeros(new_cap, dtype=old.dtype)
+            arr[:len(old)] = old
+            setattr(self, name, arr)
+
+    def plant(self, c, r, crop_type, stage=0, growth=0):
+        if (c, r) in self.index:
+            return False
+        if self.count == len(self.type_id):
+            self._grow_capacity()
+        i = self.count
+        self.type_id[i] = crop_type_id(crop_type)
+        self.col[i] = c
+        self.row[i] = r
+        self.stage[i] = stage
+        self.growth[i] = growth
+        self.index[(c, r)] = i
+        self.count += 1
+        return True
+
+    def plant_many(self, cols, rows, crop_type):
+        """Plant crop_type on every (cols[i], rows[i]) tile; the tiles must be free."""
+        n = len(cols)
+        while self.count + n > len(self.type_id):
+            self._grow_capacity()
+        i, j = self.count, self.count + n
+        self.type_id[i:j] = crop_type_id(crop_type)
+        self.col[i:j] = cols
+        self.row[i:j] = rows
+        self.stage[i:j] = 0
+        self.growth[i:j] = 0
+        self.index.update(zip(zip(self.col[i:j].tolist(), self.row[i:j].tolist()), range(i, j)))
+        self.count = j
+
+    def remove_many(self, slots):
+        """Remove the crops in slots (array of slot indices); returns their type ids."""
+        slots = np.unique(slots)
+        type_ids = self.type_id[slots].copy()
+        for c, r in zip(self.col[slots].tolist(), self.row[slots].tolist()):
+            del self.index[(c, r)]
+        # fill the holes below the new count with the surviving crops past it
+        count = self.count - len(slots)
+        holes = slots[slots < count]
+        tail = np.arange(count, self.count)
+        movers = tail[~np.isin(tail, slots)]
+        for arr in (self.type_id, self.col, self.row, self.stage, self.growth):
+            arr[holes] = arr[movers]
+        for i, c, r in zip(holes.tolist(), self.col[holes].tolist(), self.row[holes].tolist()):
+            self.index[(c, r)] = i
+        self.count = count
+        return type_ids
+
+    def remove(self, c, r):
+        """Remove the crop at (c, r) and return its type, or None if the tile is empty."""
+        i = self.index.pop((c, r), None)
+        if i is None:
+            return None
+        crop_type = CROP_TYPES[self.type_id[i]]
+        last = self.count - 1
+        if i != last:
+            for arr in (self.type_id, self.col, self.row, self.stage, self.growth):
+                arr[i] = arr[last]
+            self.index[(int(self.col[i]), int(self.row[i]))] = i
+        self.count = last
+        return crop_type
+
+    def is_ripe(self, c, r):
+        i = self.index.get((c, r))
+        return i is not None and self.stage[i] >= CROP_STAGES - 1
+
+    def view(self, c, r):
+        if (c, r) not in self.index:
+            return None
+        return CropView(self, c, r)
+
+    def update(self, ticks=1):
+        """Advance every crop by ticks growth ticks; returns the slots whose stage changed."""
+        n = self.count
+        if n == 0:
+            return ()
+        stage = self.stage[:n]
+        growth = self.growth[:n]
+        growing = stage < CROP_STAGES - 1
+
+        total = growth + ticks
+        steps = np.where(growing, total // self.growth_speed, 0)
+        new_stage = np.minimum(stage + steps, CROP_STAGES - 1)
+        advanced = new_stage - stage
+        # keep leftover ticks for crops still growing, like Crop resetting its timer per stage
+        growth[:] = np.where(new_stage < CROP_STAGES - 1, total - advanced * self.growth_speed,
+                             np.where(growing, 0, total))
+        stage[:] = new_stage
+        return np.nonzero(advanced)[0]
+
+    def slots_in_rect(self, rect):
+        """Slot indices of crops whose tile overlaps rect (world pixels)."""
+        n = self.count
+        c0 = rect.left // self.tile_w
+        c1 = (rect.right - 1) // self.tile_w
+        r0 = rect.top // self.tile_h
+        r1 = (rect.bottom - 1) // self.tile_h
+        col = self.col[:n]
+        row = self.row[:n]
+        mask = (col >= c0) & (col <= c1) & (row >= r0) & (row <= r1)
+        return np.nonzero(mask)[0]
+
+    def frames_for(self, tid):
+        frames = self._frames.get(tid)
+        if frames is None:
+            frames = load_crop_frames(CROP_TYPES[tid], self.tile_w // 2, self.tile_h // 2)
+            self._frames[tid] = frames
+        return frames
+
+    def submit(self, queue, area):
+        """Submit the crops overlapping area (world rect) to queue (engine.render.RenderQueue)."""
+        slots = self.slots_in_rect(area)
+        if len(slots) == 0:
+            return
+        images = []
+        frame_of = {}  # (type id, stage) -> image
+        for key in zip(self.type_id[slots].tolist(), self.stage[slots].tolist()):
+            image = frame_of.get(key)
+            if image is None:
+                frames = self.frames_for(key[0])
+                image = frame_of[key] = frames[min(key[1], len(frames) - 1)]
+            images.append(image)
+        w, h = images[0].get_size()  # every crop frame is one tile
+        queue.submit_columns(images, self.col[slots] * self.tile_w, self.row[slots] * self.tile_h,
+                             np.full(len(slots), w), np.full(len(slots), h))
+
+    def draw(self, surface, cam_rect, area=None):
+        """Draw the crops overlapping area (world rect, default cam_rect)."""
+        queue = RenderQueue()
+        queue.begin(cam_rect)
+        self.submit(queue, cam_rect if area is None else area)
+        queue.draw_world(surface)
@@ -0,0 +1,294 @@
+"""
+Batched entities: villagers, livestock and anything else that walks around on its own.
+
+Entities are not sprites. Position, velocity, facing and animation state of every entity live
+in NumPy arrays (one slot per entity) and update() moves and animates all of them in a single
+vectorised pass per tick. Frame tables are shared per sheet (see engine.player.character_frames),
+so an entity costs a few dozen bytes no matter how many frames its sheet has.
+
+A uniform-grid spatial hash, rebuilt lazily after the entities move, answers in_rect() (used by
+draw() to skip everything off screen) and near() (neighbour queries) without looking at every
+entity. Drawing goes through engine.render, sorted by where each entity stands.
+"""
+import numpy as np
+import pygame
+
+from .assets import get_asset_path
+from .player import DIR_DOWN, DIR_LEFT, DIR_RIGHT, DIR_UP, character_frames
+from .render import RenderQueue
+
+# unit velocity for each direction, indexed by DIR_*
+DIR_VECTORS = np.zeros((4, 2), dtype=np.float32)
+DIR_VECTORS[DIR_DOWN] = (0, 1)
+DIR_VECTORS[DIR_LEFT] = (-1, 0)
+DIR_VECTORS[DIR_RIGHT] = (1, 0)
+DIR_VECTORS[DIR_UP] = (0, -1)
+
+
+class EntityKind:
+    """
+    EntityKind(name, idle_path, walk_path, frame_w=64, frame_h=64, speed=60)
+    What a group of entities looks like and how fast it walks; the frame lists are shared.
+    """
+    def __init__(self, name, idle_path, walk_path, frame_w=64, frame_h=64, speed=60):
+        self.id = None  # set by Entities.add_kind
+        self.name = name
+        self.frame_w = int(frame_w)
+        self.frame_h = int(frame_h)
+        self.speed = float(speed)  # pixels per second
+        self.idle_frames, self.walk_frames = character_frames(idle_path, walk_path, frame_w, frame_h)
+
+
+def villager_kind(speed=60):
+    """Entities drawn with the player's character sheets."""
+    return EntityKind('villager', get_asset_path("characters", "character_idle.png"),
+                      get_asset_path("characters", "character_walking.png"), speed=speed)
+
+
+class Entities:
+    """
+    Entities(world_w=None, world_h=None, cell_size=256, capacity=256, anim_speed=0.15, seed=0)
+    Structure-of-arrays store of wandering entities. Slots [0, count) are live; removal swaps
+    the last entity into the freed slot, so slot numbers are not stable across remove().
+    Entities pick a new direction (or stand still) every 1-4 s from a seeded generator, so
+    a run is reproducible. With world bounds they stay inside the world.
+    """
+    def __init__(self, world_w=None, world_h=None, cell_size=256, capacity=256, anim_speed=0.15, seed=0):
+        self.world_w = world_w
+        self.world_h = world_h
+        self.cell_size = int(cell_size)
+        self.anim_speed = float(anim_speed)  # seconds per frame, same as Player
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+        self.kinds = []
+        self._walk_len = np.zeros((0, 4), dtype=np.int16)  # [kind, dir] -> walk frames
+        self._size = np.zeros((0, 2), dtype=np.float32)  # [kind] -> frame w, h
+        self._speed = np.zeros(0, dtype=np.float32)  # [kind] -> pixels per second
+
+        capacity = max(1, int(capacity))
+        self.kind = np.zeros(capacity, dtype=np.uint16)
+        self.x = np.zeros(capacity, dtype=np.float32)  # top-left, world pixels
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.prev_x = np.zeros(capacity, dtype=np.float32)  # before the last update(), for interpolated drawing
+        self.prev_y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.facing = np.zeros(capacity, dtype=np.uint8)
+        self.frame = np.zeros(capacity, dtype=np.uint8)
+        self.anim_time = np.zeros(capacity, dtype=np.float32)
+        self.wander = np.zeros(capacity, dtype=np.float32)  # seconds until the next direction change
+
+        # spatial hash: slots sorted by cell, and cell key -> (start, end) into that order
+        self._order = np.zeros(0, dtype=np.intp)
+        self._cells = {}
+        self._hash_dirty = True
+
+    def __len__(self):
+        return self.count
+
+    _ARRAYS = ('kind', 'x', 'y', 'prev_x', 'prev_y', 'vx', 'vy', 'facing', 'frame', 'anim_time', 'wander')
+
+    def _grow_capacity(self, needed):
+        new_cap = len(self.x)
+        while new_cap < needed:
+            new_cap *= 2
+        for name in self._ARRAYS:
+            old = getattr(self, name)
+            arr = np.zeros(new_cap, dtype=old.dtype)
+            arr[:len(old)] = old
+            setattr(self, name, arr)
+
+    def add_kind(self, kind):
+        """Register kind and return its id."""
+        if kind.id is not None and kind.id < len(self.kinds) and self.kinds[kind.id] is kind:
+            return kind.id
+        kind.id = len(self.kinds)
+        self.kinds.append(kind)
+        walk_len = [[len(frames) for frames in kind.walk_frames]]
+        self._walk_len = np.concatenate([self._walk_len, np.array(walk_len, dtype=np.int16)])
+        self._size = np.concatenate([self._size, np.array([[kind.frame_w, kind.frame_h]], dtype=np.float32)])
+        self._speed = np.append(self._speed, np.float32(kind.speed))
+        return kind.id
+
+    def add(self, kind, x, y):
+        """Add one entity of kind with its top-left at (x, y); returns its slot."""
+        return int(self.add_many(kind, [x], [y])[0])
+
+    def add_many(self, kind, xs, ys):
+        """Add an entity of kind at each (xs[i], ys[i]); returns their slots."""
+        kid = self.add_kind(kind)
+        n = len(xs)
+        if self.count + n > len(self.x):
+            self._grow_capacity(self.count + n)
+        i, j = self.count, self.count + n
+        self.kind[i:j] = kid
+        self.x[i:j] = self.prev_x[i:j] = xs
+        self.y[i:j] = self.prev_y[i:j] = ys
+        self.vx[i:j] = self.vy[i:j] = 0
+        self.facing[i:j] = DIR_DOWN
+        self.frame[i:j] = 0
+        self.anim_time[i:j] = 0
+        self.wander[i:j] = 0  # choose a direction on the first update
+        self.count = j
+        self._hash_dirty = True
+        return np.arange(i, j)
+
+    def remove(self, i):
+        """Remove the entity in slot i; the last entity takes its slot."""
+        last = self.count - 1
+        if i != last:
+            for name in self._ARRAYS:
+                arr = getattr(self, name)
+                arr[i] = arr[last]
+        self.count = last
+        self._hash_dirty = True
+
+    def update(self, dt):
+        """Advance every entity by one tick of dt seconds: wander, move, animate."""
+        n = self.count
+        if n == 0:
+            return
+        x, y, vx, vy = self.x[:n], self.y[:n], self.vx[:n], self.vy[:n]
+        facing, frame, anim_time, wander = self.facing[:n], self.frame[:n], self.anim_time[:n], self.wander[:n]
+        kind = self.kind[:n]
+        self.prev_x[:n] = x
+        self.prev_y[:n] = y
+
+        # entities whose wander timer ran out pick a direction (0-3) or stand still (4, 5)
+        wander -= dt
+        due = np.nonzero(wander <= 0)[0]
+        if len(due):
+            choice = self.rng.integers(0, 6, len(due))
+            walking = choice < 4
+            facing[due[walking]] = choice[walking]
+            speed = self._speed[kind[due]]
+            velocity = DIR_VECTORS[np.minimum(choice, 3)] * (speed * walking)[:, None]
+            vx[due] = velocity[:, 0]
+            vy[due] = velocity[:, 1]
+            wander[due] = self.rng.uniform(1.0, 4.0, len(due))
+
+        x += vx * dt
+        y += vy * dt
+        if self.world_w is not None and self.world_h is not None:
+            # stop at the world edge; the next wander picks another direction
+            size = self._size[kind]
+            max_x = self.world_w - size[:, 0]
+            max_y = self.world_h - size[:, 1]
+            out = (x < 0) | (y < 0) | (x > max_x) | (y > max_y)
+            if out.any():
+                np.clip(x, 0, max_x, out=x)
+                np.clip(y, 0, max_y, out=y)
+                vx[out] = vy[out] = 0
+
+        # same animation rules as Player.update
+        moving = (vx != 0) | (vy != 0)
+        anim_time += dt
+        step = moving & (anim_time >= self.anim_speed)
+        anim_time[step] = 0
+        frame[step] = (frame[step] + 1) % self._walk_len[kind[step], facing[step]]
+        frame[~moving] = 0
+        self._hash_dirty = True
+
+    # Spatial hash
+
+    def _cell_keys(self, cx, cy):
+        # one int64 per cell; works for negative cells (streaming worlds) too
+        return (cx.astype(np.int64) << 32) | (cy.astype(np.int64) & 0xFFFFFFFF)
+
+    def _rebuild_hash(self):
+        n = self.count
+        cs = self.cell_size
+        keys = self._cell_keys(np.floor_divide(self.x[:n], cs), np.floor_divide(self.y[:n], cs))
+        order = np.argsort(keys, kind='stable')
+        cells, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], n)
+        self._order = order
+        self._cells = dict(zip(cells.tolist(), zip(starts.tolist(), ends.tolist())))
+        self._hash_dirty = False
+
+    def _candidates(self, left, top, right, bottom):
+        """Slots of entities whose top-left falls in a cell overlapping [left, right) x [top, bottom)."""
+        if self._hash_dirty:
+            self._rebuild_hash()
+        cs = self.cell_size
+        cells, order = self._cells, self._order
+        parts = []
+        for cy in range(int(top // cs), int((bottom - 1) // cs) + 1):
+            for cx in range(int(left // cs), int((right - 1) // cs) + 1):
+                span = cells.get((cx << 32) | (cy & 0xFFFFFFFF))
+                if span is not None:
+                    parts.append(order[span[0]:span[1]])
+        if not parts:
+            return np.zeros(0, dtype=np.intp)
+        return np.concatenate(parts)
+
+    def in_rect(self, rect):
+        """Slots of entities overlapping rect (world pixels)."""
+        size = self._size
+        # an entity reaches up to its frame size right and down of its top-left
+        max_w = float(size[:, 0].max()) if len(size) else 0.0
+        max_h = float(size[:, 1].max()) if len(size) else 0.0
+        slots = self._candidates(rect.left - max_w, rect.top - max_h, rect.right, rect.bottom)
+        if not len(slots):
+            return slots
+        x, y = self.x[slots], self.y[slots]
+        wh = size[self.kind[slots]]
+        hit = (x < rect.right) & (x + wh[:, 0] > rect.left) & (y < rect.bottom) & (y + wh[:, 1] > rect.top)
+        return slots[hit]
+
+    def near(self, x, y, radius):
+        """Slots of entities whose top-left is within radius pixels of (x, y)."""
+        slots = self._candidates(x - radius, y - radius, x + radius + 1, y + radius + 1)
+        if not len(slots):
+            return slots
+        dx = self.x[slots] - x
+        dy = self.y[slots] - y
+        return slots[dx * dx + dy * dy <= radius * radius]
+
+    # Drawing
+
+    def _positions(self, slots, alpha):
+        """Rounded top-left x, y arrays of slots at interpolation alpha."""
+        x, y = self.x[slots], self.y[slots]
+        if alpha < 1.0:
+            px, py = self.prev_x[slots], self.prev_y[slots]
+            x = px + (x - px) * alpha
+            y = py + (y - py) * alpha
+        return np.rint(x).astype(np.int64), np.rint(y).astype(np.int64)
+
+    def rects(self, view, alpha=1.0):
+        """Screen rects of the entities visible in view (world rect) at interpolation alpha."""
+        slots = self.in_rect(view)
+        xs, ys = self._positions(slots, alpha)
+        size = self._size[self.kind[slots]].astype(np.int64)
+        return [pygame.Rect(x, y, w, h) for x, y, w, h in zip((xs - view.left).tolist(), (ys - view.top).tolist(),
+                                                              size[:, 0].tolist(), size[:, 1].tolist())]
+
+    def submit(self, queue, alpha=1.0, area=None):
+        """Submit the entities overlapping area (world rect, default the queue's view) to queue; returns how many."""
+        slots = self.in_rect(queue.view if area is None else area)
+        if not len(slots):
+            return 0
+        kinds = self.kinds
+        images = []
+        for k, facing, frame, moving in zip(self.kind[slots].tolist(), self.facing[slots].tolist(),
+                                            self.frame[slots].tolist(),
+                                            ((self.vx[slots] != 0) | (self.vy[slots] != 0)).tolist()):
+            kind = kinds[k]
+            if moving:
+                frames = kind.walk_frames[facing]
+                images.append(frames[frame % len(frames)])  # frame may still count another direction's frames
+            else:
+                images.append(kind.idle_frames[facing][0])
+        size = self._size[self.kind[slots]].astype(np.int64)
+        xs, ys = self._positions(slots, alpha)
+        queue.submit_columns(images, xs, ys, size[:, 0], size[:, 1])
+        return len(images)
+
+    def draw(self, surface, view, alpha=1.0, area=None):
+        """Draw the entities overlapping area (world rect, default view), the ones lower on screen in front."""
+        queue = RenderQueue()
+        queue.begin(view)
+        count = self.submit(queue, alpha, area)
+        queue.draw_world(surface)
+        return count
@@ -0,0 +1,134 @@
+"""
+Run many independent headless farms in parallel, one process per CPU core.
+
+    python -m engine.farms farms.json --workers 8 --out results.json
+
+farms.json is a JSON list of farm configs. Each config is a dict; every key is optional:
+    {"name": "carrots_only",            copied into the result
+     "world": [1600, 1600],             world size in pixels
+     "tile": [64, 64],                  tile size
+     "predefined_map": [["grass", "tree", ...], ...],
+                                        rows of tile names, as for TileMap
+     "inventory": {"carrot_seed": 20},  starting items (an Inventory works too from Python)
+     "actions": [...],                  scripted actions, see engine.headless
+     "days": 28,
+     "tick_rate": 60,
+     "crop_field": false}               use the NumPy crop field backend
+
+Farms share nothing, so each one is built and run from scratch inside a worker process by
+HeadlessFarm. Workers import the engine once in headless mode (no window, no images loaded),
+and configs are handed out in batches so per-farm overhead stays small next to the simulation
+itself. Results come back as small dicts in the same order as the configs.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from .assets import is_headless, set_headless
+from .headless import HeadlessFarm
+
+
+def inventory_counts(inventory):
+    """{item name: count} from an Inventory, a dict or None."""
+    if inventory is None or isinstance(inventory, dict):
+        return inventory
+    return inventory.counts()
+
+
+def run_farm(config):
+    """Build and run one farm from config; returns its result summary."""
+    world_w, world_h = config.get('world', (1600, 1600))
+    tile_w, tile_h = config.get('tile', (64, 64))
+    farm = HeadlessFarm(world_w, world_h, tile_w, tile_h, predefined_map=config.get('predefined_map'),
+                        inventory=inventory_counts(config.get('inventory')),
+                        tick_rate=config.get('tick_rate', 60), use_crop_field=config.get('crop_field', False))
+    summary = farm.run(config.get('actions', ()), days=config.get('days', 1.0))
+    return {
+        'name': config.get('name'),
+        'days': summary['days'],
+        'harvests': summary['harvests'],
+        'harvested': summary['stats']['harvested'],
+        'planted': summary['stats']['planted'],
+        'tilled_tiles': summary['tilled_tiles'],
+        'crops': summary['crops'],
+        'ripe_crops': summary['ripe_crops'],
+        'inventory': summary['inventory'],
+        'wall_time': summary['wall_time'],
+    }
+
+
+def _run_indexed(job):
+    i, config = job
+    try:
+        return i, run_farm(config)
+    except Exception as e:
+        # one bad config shouldn't throw away the rest of the batch
+        return i, {'name': config.get('name'), 'error': "%s: %s" % (type(e).__name__, e)}
+
+
+def _init_worker():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    # import everything a farm needs up front so the first farm isn't charged for it
+    from . import inventory, player, tilemap  # noqa: F401
+
+
+def run_farms(configs, workers=None, chunksize=None):
+    """
+    Run every farm in configs (list of dicts, see the module docstring) and return their
+    summaries in the same order. workers defaults to the number of CPU cores; with a single
+    worker (or a single farm) everything runs in this process.
+    """
+    # Inventory objects hold surfaces; only the counts need to cross the process boundary
+    configs = [dict(config, inventory=inventory_counts(config.get('inventory'))) for config in configs]
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(configs))
+
+    results = [None] * len(configs)
+    if workers <= 1:
+        # HeadlessFarm switches the whole process to headless; hand it back the way it was
+        was_headless = is_headless()
+        try:
+            for i, config in enumerate(configs):
+                results[i] = _run_indexed((i, config))[1]
+        finally:
+            set_headless(was_headless)
+        return results
+
+    if chunksize is None:
+        # a few batches per worker: big enough to amortise the pickling, small enough to balance
+        chunksize = max(1, len(configs) // (workers * 4))
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        for i, result in pool.imap_unordered(_run_indexed, enumerate(configs), chunksize):
+            results[i] = result
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many headless farm simulations in parallel.")
+    parser.add_argument('configs', help="JSON file with a list of farm configs")
+    parser.add_argument('--workers', type=int, default=None, help="processes to use (default: all cores)")
+    parser.add_argument('--out', help="write the results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    with open(args.configs) as f:
+        configs = json.load(f)
+    start = time.perf_counter()
+    results = run_farms(configs, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    failed = sum(1 for result in results if 'error' in result)
+    sys.stderr.write("%d farms in %.2f s (%.1f farms/s), %d failed\n"
+                     % (len(results), elapsed, len(results) / elapsed if elapsed > 0 else 0.0, failed))
+
+
+if __name__ == "__main__":
+    main()
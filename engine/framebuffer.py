@@ -0,0 +1,56 @@
+import pygame
+
+
+class GroundLayer:
+    """
+    GroundLayer(width, height)
+    Screen-sized image of the ground (tiles only, no crops or sprites) that follows the camera.
+    When the view moves by (dx, dy) the previous image is scrolled and only the exposed strips
+    are drawn from the map's baked chunks; tiles the map reports as damaged are redrawn in
+    place. Everything is redrawn only on the first frame, after a jump of a whole screen or
+    more, or when the map asks for it (damage_all).
+    """
+    def __init__(self, width, height):
+        self.surface = pygame.Surface((width, height)).convert()
+        self.view = None
+        self.full_redraws = 0
+
+    def invalidate(self):
+        self.view = None
+
+    def update(self, tilemap, view):
+        """
+        Bring the layer up to date for view (world rect). Returns (moved, damage): moved is True
+        if the whole layer changed (scroll or full redraw), damage lists the screen rects of
+        tiles redrawn in place otherwise.
+        """
+        damaged_tiles, damage_all = tilemap.take_damage()
+        w, h = self.surface.get_size()
+        prev = self.view
+        dx = view.left - prev.left if prev is not None else 0
+        dy = view.top - prev.top if prev is not None else 0
+        if prev is None or damage_all or view.size != (w, h) or abs(dx) >= w or abs(dy) >= h:
+            tilemap.draw_ground(self.surface, view)
+            self.view = view.copy()
+            self.full_redraws += 1
+            return True, []
+
+        moved = bool(dx or dy)
+        if moved:
+            self.surface.scroll(-dx, -dy)
+            if dx:
+                strip_x = view.right - dx if dx > 0 else view.left
+                tilemap.draw_ground(self.surface, view, pygame.Rect(strip_x, view.top, abs(dx), h))
+            if dy:
+                strip_y = view.bottom - dy if dy > 0 else view.top
+                tilemap.draw_ground(self.surface, view, pygame.Rect(view.left, strip_y, w, abs(dy)))
+            self.view = view.copy()
+
+        damage = []
+        tile_w, tile_h = tilemap.tile_w, tilemap.tile_h
+        for c, r in set(damaged_tiles):
+            area = pygame.Rect(c * tile_w, r * tile_h, tile_w, tile_h)
+            if area.colliderect(view):
+                tilemap.draw_ground(self.surface, view, area)
+                damage.append(area.move(-view.left, -view.top))
+        return moved, damage
@@ -0,0 +1,217 @@
+"""
+Headless farm simulation: builds the same world objects as main.py without a display,
+applies scripted actions and runs the simulation as fast as the CPU allows.
+
+    python -m engine.headless --days 28 --script actions.json
+
+A script is a JSON list of actions; each has a "do" key plus either "tick" or "day"
+(fractional days are fine). Actions:
+    {"day": 0, "do": "move", "to": [col, row]}        teleport the player onto a tile
+    {"day": 0, "do": "walk", "dir": [dx, dy]}         walk in a direction until the next walk
+    {"day": 0, "do": "till", "tile": [col, row]}      tile defaults to the player's tile
+    {"day": 0, "do": "plant", "tile": [col, row], "item": "carrot_seed"}
+    {"day": 3, "do": "harvest", "tile": [col, row]}
+    {"day": 0, "do": "select", "slot": 1}
+    {"day": 0, "do": "till_rect", "rect": [c0, r0, c1, r1]}   tile rect [c0, c1) x [r0, r1)
+    {"day": 0, "do": "plant_rect", "rect": [c0, r0, c1, r1], "item": "carrot_seed"}
+    {"day": 3, "do": "harvest_rect", "rect": [c0, r0, c1, r1]}
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# never open a window, and keep pygame's banner out of the JSON on stdout
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+from .assets import set_headless
+from .items import get_items
+from .simulation import Simulation
+
+DEFAULT_INVENTORY = {"carrot_seed": 5, "tomato_seed": 5}
+
+
+def seed_crop(item_name):
+    """Crop planted by item_name, or None if it isn't a seed."""
+    if item_name:
+        return get_items().get(item_name).plants
+    return None
+
+
+class HeadlessFarm:
+    def __init__(self, world_w=1600, world_h=1600, tile_w=64, tile_h=64, predefined_map=None,
+                 inventory=None, tick_rate=60, use_crop_field=False):
+        set_headless(True)
+        # imported after set_headless so nothing touches the display
+        from .inventory import Inventory
+        from .player import Player
+        from .tilemap import TileMap
+
+        self.tilemap = TileMap(world_w, world_h, tile_w, tile_h, predefined_map=predefined_map,
+                               use_crop_field=use_crop_field)
+        self.player = Player(100, 100)
+        self.player.collision_map = self.tilemap
+        self.inventory = Inventory(slot_count=8)
+        for name, count in (DEFAULT_INVENTORY if inventory is None else inventory).items():
+            self.inventory.add_item(name, count)
+        self.player.inventory = self.inventory
+
+        self.simulation = Simulation(tick_rate=tick_rate)
+        self.simulation.add_system(self.player.update)
+        self.simulation.add_system(self.tilemap.update)
+
+        self.stats = {'tilled': 0, 'planted': 0, 'harvested': 0}
+        self.harvests = {}  # crop name -> count
+        self.wall_time = 0.0
+
+    def player_tile(self):
+        return self.tilemap.world_to_tile(self.player.rect.centerx, self.player.rect.centery)
+
+    def action_tick(self, action):
+        if 'tick' in action:
+            return int(action['tick'])
+        return int(round(float(action.get('day', 0)) * self.simulation.ticks_per_day))
+
+    def apply(self, action):
+        """Apply one scripted action; returns True if it changed the world."""
+        kind = action.get('do')
+        c, r = action.get('tile') or self.player_tile()
+
+        if kind == 'move':
+            tc, tr = action['to']
+            wx, wy = self.tilemap.tile_to_world(tc, tr)
+            # centred on the tile
+            self.player.set_position(wx + (self.tilemap.tile_w - self.player.rect.width) // 2,
+                                     wy + (self.tilemap.tile_h - self.player.rect.height) // 2)
+            return True
+        if kind == 'walk':
+            dx, dy = action.get('dir', (0, 0))
+            norm = 0.70710678 if dx and dy else 1.0
+            self.player.vx = self.player.speed * dx * norm
+            self.player.vy = self.player.speed * dy * norm
+            return True
+        if kind == 'select':
+            self.inventory.set_selected_index(int(action['slot']))
+            return True
+        if kind == 'till':
+            if self.tilemap.till(c, r):
+                self.stats['tilled'] += 1
+                return True
+            return False
+        if kind == 'plant':
+            item = action.get('item')
+            if item is None:
+                selected = self.inventory.get_selected_item()
+                item = selected.name if selected else None
+            crop = seed_crop(item)
+            if crop and self.tilemap.plant(c, r, crop):
+                self.inventory.remove_item(item, 1)
+                self.stats['planted'] += 1
+                return True
+            return False
+        if kind == 'harvest':
+            crop = self.tilemap.harvest(c, r)
+            if crop:
+                self.inventory.add_item(crop, 1)
+                self.stats['harvested'] += 1
+                self.harvests[crop] = self.harvests.get(crop, 0) + 1
+                return True
+            return False
+        if kind == 'till_rect':
+            tilled = self.tilemap.till_rect(*action['rect'])
+            self.stats['tilled'] += tilled
+            return tilled > 0
+        if kind == 'plant_rect':
+            item = action.get('item')
+            if item is None:
+                selected = self.inventory.get_selected_item()
+                item = selected.name if selected else None
+            crop = seed_crop(item)
+            if not crop:
+                return False
+            planted = self.tilemap.plant_rect(*action['rect'], crop_type=crop, limit=self.inventory.count(item))
+            if planted:
+                self.inventory.remove_item(item, planted)
+                self.stats['planted'] += planted
+            return planted > 0
+        if kind == 'harvest_rect':
+            harvested = self.tilemap.harvest_rect(*action['rect'])
+            for crop, count in harvested.items():
+                self.inventory.add_item(crop, count)
+                self.stats['harvested'] += count
+                self.harvests[crop] = self.harvests.get(crop, 0) + count
+            return bool(harvested)
+        raise ValueError("unknown action: %r" % (kind,))
+
+    def run(self, actions=(), days=None, ticks=None):
+        """Run until all actions are applied and the requested time has passed; returns summary()."""
+        pending = sorted(actions, key=self.action_tick)
+        end_tick = self.simulation.tick_count
+        if ticks is not None:
+            end_tick += int(ticks)
+        if days is not None:
+            end_tick += int(round(days * self.simulation.ticks_per_day))
+        if pending:
+            end_tick = max(end_tick, self.action_tick(pending[-1]))
+
+        start = time.perf_counter()
+        sim = self.simulation
+        i = 0
+        while True:
+            while i < len(pending) and self.action_tick(pending[i]) <= sim.tick_count:
+                self.apply(pending[i])
+                i += 1
+            if sim.tick_count >= end_tick:
+                break
+            # fast-forward straight to the next action (or the end)
+            next_tick = self.action_tick(pending[i]) if i < len(pending) else end_tick
+            sim.run_ticks(min(next_tick, end_tick) - sim.tick_count)
+        self.wall_time = time.perf_counter() - start
+        return self.summary()
+
+    def summary(self):
+        sim = self.simulation
+        tm = self.tilemap
+        world = pygame.Rect(0, 0, tm.cols * tm.tile_w, tm.rows * tm.tile_h)
+        ripe = sum(1 for crop in tm.crops_in_rect(world) if crop.is_ripe())
+        wall = self.wall_time
+        return {
+            'ticks': sim.tick_count,
+            'days': sim.tick_count / sim.ticks_per_day,
+            'wall_time': wall,
+            'ticks_per_second': sim.tick_count / wall if wall > 0 else None,
+            'tilled_tiles': tm.count_tilled(),
+            'crops': tm.crop_count(),
+            'ripe_crops': ripe,
+            'stats': dict(self.stats),
+            'harvests': dict(self.harvests),
+            'inventory': self.inventory.counts(),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a farm simulation without a display.")
+    parser.add_argument('--days', type=float, default=1.0, help="in-game days to simulate")
+    parser.add_argument('--script', help="JSON file with a list of actions")
+    parser.add_argument('--world', default="1600x1600", help="world size in pixels, WxH")
+    parser.add_argument('--tick-rate', type=int, default=60)
+    parser.add_argument('--crop-field', action='store_true', help="use the NumPy crop field backend")
+    args = parser.parse_args(argv)
+
+    actions = []
+    if args.script:
+        with open(args.script) as f:
+            actions = json.load(f)
+    world_w, world_h = (int(v) for v in args.world.lower().split('x'))
+
+    farm = HeadlessFarm(world_w, world_h, tick_rate=args.tick_rate, use_crop_field=args.crop_field)
+    summary = farm.run(actions, days=args.days)
+    json.dump(summary, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
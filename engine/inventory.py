@@ -1,30 +1,69 @@
-import os
+import heapq
 import pygame
+from .assets import get_asset_path, get_assets, is_headless
+from .items import get_items
 
 
-def get_asset_path(*parts):
-    base_dir = os.path.dirname(os.path.dirname(__file__))  # one level up from engine
-    return os.path.join(base_dir, "assets", *parts)
+class ItemStack:
+    """ItemStack(item, count): the contents of one slot, an ItemDef and how many of it."""
+    __slots__ = ('item', 'count')
+
+    def __init__(self, item, count):
+        self.item = item
+        self.count = count
+
+    @property
+    def name(self):
+        return self.item.name
+
+    @property
+    def id(self):
+        return self.item.id
+
+    def __repr__(self):
+        return "ItemStack(%r, %d)" % (self.item.name, self.count)
 
 
 class Inventory:
-    def __init__(self, slot_count=8, slot_size=64):
+    """
+    Inventory(slot_count=8, slot_size=64, registry=None)
+    Slots of ItemStacks (or None). An index from item id to the slots holding it and a heap of
+    empty slots keep lookups independent of the slot count, so large chests stay fast. Adding
+    and removing are all-or-nothing; stacks hold up to their item's max_stack.
+    """
+    def __init__(self, slot_count=8, slot_size=64, registry=None):
         self.slot_count = slot_count
         self.slot_size = slot_size
-        self.items = [None] * slot_count
+        self.registry = registry if registry is not None else get_items()
+        self.items = [None] * slot_count  # read-only outside this class; change slots through the methods
         self.selected_index = 0
+        self._slots = {}  # item id -> ascending slot indices holding it
+        self._free = list(range(slot_count))  # heap of empty slot indices
+        self.version = 0  # bumped on every change
 
-        # load inventory bar background (full bar)
-        bar_path = get_asset_path("ui", "inventory_bar.png")
+        # bar, fallback slot, font and icons, loaded by the first _build_hud
+        self.item_icons = {}
         self.bar_image = None
-        if os.path.exists(bar_path):
-            try:
-                self.bar_image = pygame.image.load(bar_path).convert_alpha()
-            except Exception:
-                self.bar_image = None
+        self.slot_image = None
+        self.font = None
+        self._images_loaded = False
+        # rendered bar and what it was rendered for (see draw)
+        self._hud = None
+        self._hud_pos = None
+        self._hud_cache_key = None
+
+    def _load_images(self):
+        self._images_loaded = True
+        if is_headless():
+            # item bookkeeping only; nothing to draw
+            return
+
+        # load inventory bar background (full bar)
+        assets = get_assets()
+        self.bar_image = assets.sheet(get_asset_path("ui", "inventory_bar.png"))
 
         # per-slot fallback drawing surface if bar is missing
-        self.slot_image = pygame.Surface((slot_size, slot_size), pygame.SRCALPHA)
+        self.slot_image = pygame.Surface((self.slot_size, self.slot_size), pygame.SRCALPHA)
         self.slot_image.fill((200, 200, 200))
 
         # font for item count
@@ -32,54 +71,137 @@ class Inventory:
         self.font = pygame.font.Font(None, 24)
 
         # load item icons from combined crop inventory sprite
-        self.item_icons = {}
-        inv_icon_path = get_asset_path("crop", "carrot_and_tomato_for_inventory.png")
-        if os.path.exists(inv_icon_path):
-            try:
-                sheet = pygame.image.load(inv_icon_path).convert_alpha()
-                w, h = sheet.get_size()
-                # assume two columns: carrot | tomato
-                half = w // 2
-                carrot_icon = sheet.subsurface((0, 0, half, h))
-                tomato_icon = sheet.subsurface((half, 0, half, h))
-                # scale icons to fit inside slot with padding
-                pad = 8
-                icon_w = max(8, self.slot_size - pad)
-                icon_h = max(8, self.slot_size - pad)
-                carrot_icon = pygame.transform.smoothscale(carrot_icon, (icon_w, icon_h))
-                tomato_icon = pygame.transform.smoothscale(tomato_icon, (icon_w, icon_h))
-                self.item_icons['carrot'] = carrot_icon
-                self.item_icons['carrot_seed'] = carrot_icon
-                self.item_icons['tomato'] = tomato_icon
-                self.item_icons['tomato_seed'] = tomato_icon
-            except Exception:
-                pass
+        # scale icons to fit inside slot with padding
+        pad = 8
+        icon_w = max(8, self.slot_size - pad)
+        icon_h = max(8, self.slot_size - pad)
+
+        def build_icons():
+            sheet = assets.sheet(get_asset_path("crop", "carrot_and_tomato_for_inventory.png"))
+            if sheet is None:
+                return []
+            w, h = sheet.get_size()
+            # assume two columns: carrot | tomato
+            half = w // 2
+            carrot_icon = sheet.subsurface((0, 0, half, h))
+            tomato_icon = sheet.subsurface((half, 0, half, h))
+            return [pygame.transform.smoothscale(carrot_icon, (icon_w, icon_h)),
+                    pygame.transform.smoothscale(tomato_icon, (icon_w, icon_h))]
+
+        icons = assets.derived(("inventory_icons", icon_w, icon_h), build_icons)
+        if icons:
+            # keyed by ItemDef.icon
+            carrot_icon, tomato_icon = icons
+            self.item_icons['carrot'] = carrot_icon
+            self.item_icons['tomato'] = tomato_icon
+
+    def _fill(self, i, item, count):
+        # put a new stack into empty slot i (already taken off the free heap)
+        self.items[i] = ItemStack(item, count)
+        slots = self._slots.setdefault(item.id, [])
+        slots.append(i)
+        if len(slots) > 1 and slots[-2] > i:
+            slots.sort()
+
+    def _clear(self, i):
+        stack = self.items[i]
+        self.items[i] = None
+        slots = self._slots[stack.item.id]
+        slots.remove(i)
+        if not slots:
+            del self._slots[stack.item.id]
+        heapq.heappush(self._free, i)
+
+    def count(self, item_name):
+        """Total of item_name over all its stacks."""
+        iid = self.registry.ids.get(item_name)
+        return sum(self.items[i].count for i in self._slots.get(iid, ()))
+
+    def counts(self):
+        """{item name: total count} of everything held."""
+        return {self.registry.name_of(iid): sum(self.items[i].count for i in slots)
+                for iid, slots in self._slots.items()}
+
+    def room_for(self, item_name):
+        """How many more of item_name fit, topping up its stacks and filling empty slots."""
+        item = self.registry.get(item_name)
+        room = sum(item.max_stack - self.items[i].count for i in self._slots.get(item.id, ()))
+        return room + len(self._free) * item.max_stack
 
     def add_item(self, item_name, amount=1):
-        for i, item in enumerate(self.items):
-            if item and item['name'] == item_name:
-                item['count'] += amount
-                return True
-        for i in range(len(self.items)):
-            if self.items[i] is None:
-                self.items[i] = {'name': item_name, 'count': amount}
-                return True
-        return False
+        """Add amount of item_name; returns False (adding nothing) if it doesn't all fit."""
+        if amount <= 0:
+            return amount == 0
+        item = self.registry.get(item_name)
+        if amount > self.room_for(item_name):
+            return False
+        for i in self._slots.get(item.id, ()):
+            stack = self.items[i]
+            take = min(amount, item.max_stack - stack.count)
+            stack.count += take
+            amount -= take
+            if not amount:
+                break
+        while amount:
+            take = min(amount, item.max_stack)
+            self._fill(heapq.heappop(self._free), item, take)
+            amount -= take
+        self.version += 1
+        return True
 
     def remove_item(self, item_name, amount=1):
-        for i, item in enumerate(self.items):
-            if item and item['name'] == item_name:
-                item['count'] -= amount
-                if item['count'] <= 0:
-                    self.items[i] = None
-                return True
-        return False
+        """Remove amount of item_name, last stacks first; returns False (removing nothing) if short."""
+        if amount <= 0:
+            return amount == 0
+        if self.count(item_name) < amount:
+            return False
+        slots = self._slots[self.registry.ids[item_name]]
+        while amount:
+            i = slots[-1]
+            stack = self.items[i]
+            take = min(amount, stack.count)
+            stack.count -= take
+            amount -= take
+            if not stack.count:
+                self._clear(i)
+        self.version += 1
+        return True
 
     def consume_selected(self, amount=1):
+        """Remove amount from the selected stack (or, if it holds fewer, from that item overall)."""
         selected = self.get_selected_item()
-        if selected:
-            return self.remove_item(selected['name'], amount)
-        return False
+        if not selected:
+            return False
+        if selected.count < amount:
+            return self.remove_item(selected.name, amount)
+        selected.count -= amount
+        if not selected.count:
+            self._clear(self.selected_index)
+        self.version += 1
+        return True
+
+    def set_slot(self, index, item_name, count):
+        """Put count of item_name into slot index, replacing what was there (item_name None empties it)."""
+        if self.items[index] is not None:
+            self._clear(index)
+        if item_name is not None and count > 0:
+            self._free.remove(index)
+            heapq.heapify(self._free)
+            self._fill(index, self.registry.get(item_name), count)
+        self.version += 1
+
+    def transfer(self, other, item_name, amount=None):
+        """
+        Move up to amount (default: all) of item_name from this inventory into other, as much as
+        other has room for. Returns how many moved.
+        """
+        moved = min(self.count(item_name), other.room_for(item_name))
+        if amount is not None:
+            moved = min(moved, amount)
+        if moved > 0:
+            self.remove_item(item_name, moved)
+            other.add_item(item_name, moved)
+        return max(0, moved)
 
     def select_next(self):
         self.selected_index = (self.selected_index + 1) % self.slot_count
@@ -100,7 +222,17 @@ class Inventory:
         if 0 <= index < self.slot_count:
             self.selected_index = index
 
-    def draw(self, surface, screen_width, screen_height):
+    def _hud_key(self, screen_width, screen_height):
+        return (screen_width, screen_height, self.slot_size, self.selected_index, self.version)
+
+    def _build_hud(self, screen_width, screen_height):
+        """
+        Lay out the bar and render it into one surface.
+        Returns (surface, screen position), or (None, None) if there is nothing to draw.
+        """
+        if not self._images_loaded:
+            self._load_images()
+        ops = []  # (surface, screen pos) to blit, or (None, highlight rect)
         bar_width_nominal = self.slot_count * self.slot_size
         # y_base will be computed after bar scaling so the bar sits at the bottom
         y_base = screen_height - int(self.slot_size * 1.2)
@@ -120,11 +252,12 @@ class Inventory:
                     scale = target_bar_h / bh
                     scaled_bar_h = max(1, int(bh * scale))
                     scaled_bar_w = max(1, int(bw * scale))
-                    scaled_bar = pygame.transform.smoothscale(self.bar_image, (scaled_bar_w, scaled_bar_h))
+                    scaled_bar = get_assets().image(get_asset_path("ui", "inventory_bar.png"),
+                                                    (scaled_bar_w, scaled_bar_h))
                     start_x = (screen_width - scaled_bar_w) // 2
                     # place bar flush to bottom using its true height with a small margin
                     y_base = screen_height - scaled_bar_h - 6
-                    surface.blit(scaled_bar, (start_x, y_base))
+                    ops.append((scaled_bar, (start_x, y_base)))
             except Exception:
                 scaled_bar = None
 
@@ -149,17 +282,17 @@ class Inventory:
 
             # draw per-slot fallback if no bar background
             if not scaled_bar:
-                surface.blit(self.slot_image, rect)
+                ops.append((self.slot_image, rect.topleft))
 
             # highlight selected
             if i == self.selected_index:
-                pygame.draw.rect(surface, (255, 255, 0), rect, 3)
+                ops.append((None, rect))
 
             # draw item name and count
             if self.items[i]:
-                item_name = self.items[i]['name']
+                item_name = self.items[i].name
                 # draw icon if available, scaling to fit with padding inside actual slot rect
-                icon = self.item_icons.get(item_name)
+                icon = self.item_icons.get(self.items[i].item.icon)
                 if icon:
                     # scale icon to fit comfortably within the slot with padding
                     pad = max(10, slot_side // 10)
@@ -167,9 +300,51 @@ class Inventory:
                     target_h = max(8, slot_side - pad)
                     icon_scaled = pygame.transform.smoothscale(icon, (target_w, target_h))
                     icon_rect = icon_scaled.get_rect(center=(rect.centerx, rect.centery))
-                    surface.blit(icon_scaled, icon_rect)
+                    ops.append((icon_scaled, icon_rect.topleft))
                 else:
                     # fallback first-letter badge
                     name_text = self.font.render(item_name[0].upper(), True, (0, 0, 0))
-                    surface.blit(name_text, (rect.left + 5, rect.top + 5))
+                    ops.append((name_text, (rect.left + 5, rect.top + 5)))
                 # omit numeric count rendering per request
+
+        if not ops:
+            return None, None
+        bounds = [op[1] if op[0] is None else pygame.Rect(op[1], op[0].get_size()) for op in ops]
+        area = bounds[0].unionall(bounds[1:])
+        # layers are composited premultiplied, so one blit of the result looks the same as
+        # blitting each layer onto the screen in turn
+        hud = pygame.Surface(area.size, pygame.SRCALPHA)
+        for (image, where), rect in zip(ops, bounds):
+            if image is None:
+                pygame.draw.rect(hud, (255, 255, 0), rect.move(-area.x, -area.y), 3)
+            elif image.get_flags() & pygame.SRCALPHA:
+                hud.blit(image.convert_alpha().premul_alpha(), (rect.x - area.x, rect.y - area.y),
+                         special_flags=pygame.BLEND_PREMULTIPLIED)
+            else:
+                hud.blit(image, (rect.x - area.x, rect.y - area.y))
+        return hud, area.topleft
+
+    def _update_hud(self, screen_width, screen_height):
+        # the bar is re-rendered only when the screen size, slot size, contents or selection change
+        key = self._hud_key(screen_width, screen_height)
+        if key != self._hud_cache_key:
+            self._hud_cache_key = key
+            self._hud, self._hud_pos = self._build_hud(screen_width, screen_height)
+
+    def hud_rect(self, screen_width, screen_height):
+        """Screen rect draw() covers, or None if it draws nothing."""
+        self._update_hud(screen_width, screen_height)
+        if self._hud is None:
+            return None
+        return pygame.Rect(self._hud_pos, self._hud.get_size())
+
+    def draw(self, surface, screen_width, screen_height):
+        self._update_hud(screen_width, screen_height)
+        if self._hud is not None:
+            surface.blit(self._hud, self._hud_pos, special_flags=pygame.BLEND_PREMULTIPLIED)
+
+    def submit(self, queue, screen_width, screen_height):
+        """Submit the HUD to queue's screen layer (engine.render.RenderQueue)."""
+        self._update_hud(screen_width, screen_height)
+        if self._hud is not None:
+            queue.submit_screen(self._hud, self._hud_pos, pygame.BLEND_PREMULTIPLIED)
@@ -0,0 +1,83 @@
+"""
+Item registry: every item kind gets a small integer id and a static ItemDef (what it plants,
+which icon it uses, how many fit in one slot), so inventories and game code look items up
+instead of parsing their names.
+"""
+
+DEFAULT_MAX_STACK = 999
+
+
+class ItemDef:
+    """
+    ItemDef(name, plants=None, crop=None, icon=None, max_stack=DEFAULT_MAX_STACK)
+    Static properties of one item kind. plants is the crop type a seed grows into, crop the
+    crop type a harvested item came from, icon a name in the inventory icon sheet.
+    """
+    def __init__(self, name, plants=None, crop=None, icon=None, max_stack=DEFAULT_MAX_STACK):
+        self.id = None  # set by ItemRegistry.add
+        self.name = name
+        self.plants = plants
+        self.crop = crop
+        self.icon = icon
+        self.max_stack = int(max_stack)
+
+    def __repr__(self):
+        return "ItemDef(%r)" % self.name
+
+
+def default_items():
+    """The built-in items: seeds and produce of the crops in carrot_and_tomato.png."""
+    items = []
+    for crop in ('carrot', 'tomato'):
+        items.append(ItemDef(crop + '_seed', plants=crop, icon=crop))
+        items.append(ItemDef(crop, crop=crop, icon=crop))
+    return items
+
+
+class ItemRegistry:
+    """
+    ItemRegistry(items=None)
+    Maps item names to interned integer ids and ItemDefs.
+    """
+    def __init__(self, items=None):
+        self.items = []
+        self.ids = {}
+        for item in (default_items() if items is None else items):
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        if item.name in self.ids:
+            return self.ids[item.name]
+        item.id = len(self.items)
+        self.items.append(item)
+        self.ids[item.name] = item.id
+        return item.id
+
+    def id_of(self, name):
+        """Id for name; unknown names are registered, '<crop>_seed' as a seed for <crop>."""
+        iid = self.ids.get(name)
+        if iid is None:
+            plants = name[:-len('_seed')] if name.endswith('_seed') else None
+            iid = self.add(ItemDef(name, plants=plants))
+        return iid
+
+    def get(self, name):
+        """The ItemDef for name (registering it if needed)."""
+        return self.items[self.id_of(name)]
+
+    def name_of(self, iid):
+        return self.items[iid].name
+
+
+_registry = None
+
+
+def get_items():
+    """The shared item registry."""
+    global _registry
+    if _registry is None:
+        _registry = ItemRegistry()
+    return _registry
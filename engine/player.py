@@ -1,34 +1,154 @@
-import os
+import math
 import pygame
+from .assets import get_asset_path, get_assets, is_headless
+from .collision import sweep
 
 # Directions
 DIR_DOWN, DIR_LEFT, DIR_RIGHT, DIR_UP = 0, 1, 2, 3
 
+# part of the 64x64 frame that collides with solid tiles: the feet, (x, y, w, h) from the top-left
+HITBOX = (20, 40, 24, 14)
+
+# (idle path, walk path, frame size) -> (idle frames, walk frames), shared by every character using those sheets
+_frame_tables = {}
+
+
+def character_frames(idle_path, walk_path, frame_w=64, frame_h=64):
+    """
+    Idle and walk frames by direction ([Down, Left, Right, Up] lists) cut from a pair of
+    character sheets. Built once per sheet pair and size; the Player and every entity drawn
+    from the same sheets share the lists. Headless runs get one None frame per direction.
+    """
+    if is_headless():
+        return [[None] for _ in range(4)], [[None] for _ in range(4)]
+    key = (idle_path, walk_path, frame_w, frame_h)
+    tables = _frame_tables.get(key)
+    if tables is None:
+        idle_frames = idle_frames_columns(_load_sheet(idle_path), frame_w, frame_h)
+        walk_frames = walk_frames_columns(_load_sheet(walk_path), frame_w, frame_h, idle_frames)
+        tables = _frame_tables[key] = (idle_frames, walk_frames)
+    return tables
+
+
+def _load_sheet(path):
+    sheet = get_assets().sheet(path)
+    if sheet is not None:
+        return sheet
+    s = pygame.Surface((64, 64), pygame.SRCALPHA)
+    s.fill((255, 0, 255))  # magenta placeholder
+    return s
+
+
+def _sheet_grid(sheet, frame_w, frame_h):
+    """Frames of sheet as grid[row][col], and its (rows, cols)."""
+    sheet_width, sheet_height = sheet.get_size()
+    cols = max(1, sheet_width // frame_w)
+    rows = max(1, sheet_height // frame_h)
+    grid = []
+    for r in range(rows):
+        row_frames = []
+        for c in range(cols):
+            frame = sheet.subsurface(pygame.Rect(c * frame_w, r * frame_h, frame_w, frame_h))
+            row_frames.append(frame)
+        grid.append(row_frames)
+    return grid, rows, cols
+
+
+def walk_frames_columns(sheet, frame_w, frame_h, idle_frames=None):
+    """
+    The walking sheet is arranged as 4 rows x 4 columns where each column is a direction:
+    col0=Up, col1=Right, col2=Down, col3=Left. Rows are animation frames.
+    We must return frames ordered by engine direction indices: [Down, Left, Right, Up].
+    """
+    grid, rows, cols = _sheet_grid(sheet, frame_w, frame_h)
+
+    # Extract columns as directions
+    def column_frames(col_index):
+        return [grid[r][col_index] for r in range(rows) if col_index < len(grid[r])]
+
+    # Map columns to our DIR_* ordering
+    # Given: col0=Up, col1=Right, col2=Down, col3=Left
+    up_frames = column_frames(0)
+    right_frames = column_frames(1)
+    down_frames = column_frames(2)
+    left_frames = column_frames(3)
+
+    frames_by_dir = [
+        down_frames,  # DIR_DOWN = 0
+        left_frames,  # DIR_LEFT = 1
+        right_frames, # DIR_RIGHT = 2
+        up_frames     # DIR_UP = 3
+    ]
+
+    # Ensure there is at least one frame per direction
+    for i in range(len(frames_by_dir)):
+        if not frames_by_dir[i]:
+            frames_by_dir[i] = [idle_frames[i][0] if idle_frames and i < len(idle_frames) else sheet]
+
+    return frames_by_dir
+
+
+def idle_frames_columns(sheet, frame_w, frame_h):
+    """
+    Try to load idle frames as columns-as-directions (Up, Right, Down, Left) like walking.
+    Falls back to row-based if not enough columns, and ensures 4 direction lists.
+    """
+    grid, rows, cols = _sheet_grid(sheet, frame_w, frame_h)
+
+    frames_by_dir = [[], [], [], []]  # Down, Left, Right, Up
+
+    if cols >= 4:
+        # columns are directions: 0=Up,1=Right,2=Down,3=Left
+        def column_frames(ci):
+            return [grid[r][ci] for r in range(rows) if ci < len(grid[r])]
+        up_frames = column_frames(0)
+        right_frames = column_frames(1)
+        down_frames = column_frames(2)
+        left_frames = column_frames(3)
+        frames_by_dir = [down_frames, left_frames, right_frames, up_frames]
+    else:
+        # fallback: use first row as frames for all directions
+        base = grid[0] if rows >= 1 else [sheet]
+        frames_by_dir = [base[:], base[:], base[:], base[:]]
+
+    # Ensure at least one frame per direction
+    for i in range(4):
+        if not frames_by_dir[i]:
+            frames_by_dir[i] = [grid[0][0] if rows and cols else sheet]
+
+    return frames_by_dir
+
+
 class Player(pygame.sprite.Sprite):
     def __init__(self, x, y, speed=150):
         super().__init__()
         self.speed = speed  # pixels per second
 
-        # Load sprite sheets
-        base = os.path.join(os.path.dirname(__file__), "..", "assets", "characters")
-        self.idle_sheet = self.safe_load(os.path.join(base, "character_idle.png"))
-        self.walk_sheet = self.safe_load(os.path.join(base, "character_walking.png"))
-
         # Frame setup
         self.frame_width = 64
         self.frame_height = 64
         self.anim_speed = 0.15  # seconds per frame
 
-        # Extract frames
-        self.idle_frames = self.load_idle_frames_columns(self.idle_sheet)
-        self.walk_frames = self.load_walk_frames_columns(self.walk_sheet)
+        # Frames by direction, shared with every other character cut from the same sheets
+        # (headless: one None placeholder per direction keeps the animation logic working)
+        self.idle_frames, self.walk_frames = character_frames(
+            get_asset_path("characters", "character_idle.png"),
+            get_asset_path("characters", "character_walking.png"), self.frame_width, self.frame_height)
 
         self.image = self.idle_frames[DIR_DOWN][0]
-        self.rect = self.image.get_rect(topleft=(x, y))
+        self.rect = pygame.Rect(x, y, self.frame_width, self.frame_height)
+        # exact position; rect is this rounded down, so moves smaller than a pixel add up
+        self.x = float(x)
+        self.y = float(y)
+        # position before the last update(), for interpolated drawing
+        self.prev_pos = (self.x, self.y)
+        # map whose solid tiles stop the player (see engine.collision); None walks anywhere
+        self.collision_map = None
+        self.hitbox = HITBOX
 
         # Movement and animation state
-        self.vx = 0
-        self.vy = 0
+        self.vx = 0.0  # pixels per second
+        self.vy = 0.0
         self.facing = DIR_DOWN
         self.anim_time = 0
         self.current_frame = 0
@@ -36,118 +156,12 @@ class Player(pygame.sprite.Sprite):
         # Inventory
         self.inventory = None
 
-    def safe_load(self, path):
-        if os.path.exists(path):
-            try:
-                return pygame.image.load(path).convert_alpha()
-            except Exception:
-                pass
-        s = pygame.Surface((64, 64), pygame.SRCALPHA)
-        s.fill((255, 0, 255))  # magenta placeholder
-        return s
-
-    def load_frames(self, sheet):
-        """Split sheet into 4 directions with multiple frames."""
-        frames = []
-        sheet_width, sheet_height = sheet.get_size()
-        cols = sheet_width // self.frame_width
-        rows = sheet_height // self.frame_height
-
-        for r in range(rows):  # Each row = direction
-            row_frames = []
-            for c in range(cols):
-                frame = sheet.subsurface(pygame.Rect(c * self.frame_width, r * self.frame_height,
-                                                    self.frame_width, self.frame_height))
-                row_frames.append(frame)
-            frames.append(row_frames)
-        return frames
-
-    def load_walk_frames_columns(self, sheet):
-        """
-        The walking sheet is arranged as 4 rows x 4 columns where each column is a direction:
-        col0=Up, col1=Right, col2=Down, col3=Left. Rows are animation frames.
-        We must return frames ordered by engine direction indices: [Down, Left, Right, Up].
-        """
-        sheet_width, sheet_height = sheet.get_size()
-        cols = max(1, sheet_width // self.frame_width)
-        rows = max(1, sheet_height // self.frame_height)
-
-        # Build grid [rows][cols]
-        grid = []
-        for r in range(rows):
-            row_frames = []
-            for c in range(cols):
-                frame = sheet.subsurface(pygame.Rect(c * self.frame_width, r * self.frame_height,
-                                                    self.frame_width, self.frame_height))
-                row_frames.append(frame)
-            grid.append(row_frames)
-
-        # Extract columns as directions
-        def column_frames(col_index):
-            return [grid[r][col_index] for r in range(rows) if col_index < len(grid[r])]
-
-        # Map columns to our DIR_* ordering
-        # Given: col0=Up, col1=Right, col2=Down, col3=Left
-        up_frames = column_frames(0)
-        right_frames = column_frames(1)
-        down_frames = column_frames(2)
-        left_frames = column_frames(3)
-
-        frames_by_dir = [
-            down_frames,  # DIR_DOWN = 0
-            left_frames,  # DIR_LEFT = 1
-            right_frames, # DIR_RIGHT = 2
-            up_frames     # DIR_UP = 3
-        ]
-
-        # Ensure there is at least one frame per direction
-        for i in range(len(frames_by_dir)):
-            if not frames_by_dir[i]:
-                frames_by_dir[i] = [self.idle_frames[i][0] if self.idle_frames and i < len(self.idle_frames) else sheet]
-
-        return frames_by_dir
-
-    def load_idle_frames_columns(self, sheet):
-        """
-        Try to load idle frames as columns-as-directions (Up, Right, Down, Left) like walking.
-        Falls back to row-based if not enough columns, and ensures 4 direction lists.
-        """
-        sheet_width, sheet_height = sheet.get_size()
-        cols = max(1, sheet_width // self.frame_width)
-        rows = max(1, sheet_height // self.frame_height)
-
-        # Build grid [rows][cols]
-        grid = []
-        for r in range(rows):
-            row_frames = []
-            for c in range(cols):
-                frame = sheet.subsurface(pygame.Rect(c * self.frame_width, r * self.frame_height,
-                                                    self.frame_width, self.frame_height))
-                row_frames.append(frame)
-            grid.append(row_frames)
-
-        frames_by_dir = [[], [], [], []]  # Down, Left, Right, Up
-
-        if cols >= 4:
-            # columns are directions: 0=Up,1=Right,2=Down,3=Left
-            def column_frames(ci):
-                return [grid[r][ci] for r in range(rows) if ci < len(grid[r])]
-            up_frames = column_frames(0)
-            right_frames = column_frames(1)
-            down_frames = column_frames(2)
-            left_frames = column_frames(3)
-            frames_by_dir = [down_frames, left_frames, right_frames, up_frames]
-        else:
-            # fallback: use first row as frames for all directions
-            base = grid[0] if rows >= 1 else [sheet]
-            frames_by_dir = [base[:], base[:], base[:], base[:]]
-
-        # Ensure at least one frame per direction
-        for i in range(4):
-            if not frames_by_dir[i]:
-                frames_by_dir[i] = [grid[0][0] if rows and cols else sheet]
-
-        return frames_by_dir
+    def set_position(self, x, y):
+        """Put the player's top-left at world (x, y) without moving through what's in between."""
+        self.x = float(x)
+        self.y = float(y)
+        self.rect.topleft = (math.floor(self.x), math.floor(self.y))
+        self.prev_pos = (self.x, self.y)
 
     def handle_input(self, keys, dt):
         vx = 0
@@ -165,18 +179,20 @@ class Player(pygame.sprite.Sprite):
             vy += 1
             self.facing = DIR_DOWN
 
-        if vx != 0 and vy != 0:
-            norm = 0.70710678
-            self.vx = int(self.speed * vx * norm)
-            self.vy = int(self.speed * vy * norm)
-        else:
-            self.vx = int(self.speed * vx)
-            self.vy = int(self.speed * vy)
+        norm = 0.70710678 if vx != 0 and vy != 0 else 1.0
+        self.vx = self.speed * vx * norm
+        self.vy = self.speed * vy * norm
 
     def update(self, dt):
-        # Movement
-        self.rect.x += int(self.vx * dt)
-        self.rect.y += int(self.vy * dt)
+        # Movement, stopped by solid tiles under the hitbox
+        self.prev_pos = (self.x, self.y)
+        dx, dy = self.vx * dt, self.vy * dt
+        if self.collision_map is not None and (dx or dy):
+            hx, hy, hw, hh = self.hitbox
+            dx, dy = sweep(self.collision_map, self.x + hx, self.y + hy, hw, hh, dx, dy)
+        self.x += dx
+        self.y += dy
+        self.rect.topleft = (math.floor(self.x), math.floor(self.y))
 
         # Animation
         moving = self.vx != 0 or self.vy != 0
@@ -190,8 +206,22 @@ class Player(pygame.sprite.Sprite):
             self.current_frame = 0
             self.image = self.idle_frames[self.facing][0]
 
-    def draw(self, surface, camera):
-        surface.blit(self.image, camera.apply(self.rect))
+    def render_rect(self, alpha=1.0):
+        """Rect interpolated between the previous and current update by alpha (0..1)."""
+        if alpha >= 1.0:
+            return self.rect
+        px, py = self.prev_pos
+        x = math.floor(px + (self.x - px) * alpha)
+        y = math.floor(py + (self.y - py) * alpha)
+        return pygame.Rect(x, y, self.rect.width, self.rect.height)
+
+    def draw(self, surface, camera, alpha=1.0):
+        surface.blit(self.image, camera.apply(self.render_rect(alpha)))
+
+    def submit(self, queue, alpha=1.0):
+        """Submit the player to queue (engine.render.RenderQueue) at interpolation alpha."""
+        rect = self.render_rect(alpha)
+        queue.submit(self.image, rect.x, rect.y)
 
     def interact(self, tilemap):
         px = self.rect.centerx
@@ -203,18 +233,12 @@ class Player(pygame.sprite.Sprite):
 
         # Accept seeds or direct crop items
         if selected:
-            name = selected['name'] if isinstance(selected, dict) else str(selected)
-            if name.endswith('_seed'):
-                crop = name.replace('_seed', '')
+            crop = selected.item.plants or selected.item.crop
+            if crop:
                 planted = tilemap.plant(c, r, crop)
                 if planted and self.inventory:
                     self.inventory.consume_selected()
                     return "planted"
-            elif name in ('carrot', 'tomato'):
-                planted = tilemap.plant(c, r, name)
-                if planted and self.inventory:
-                    self.inventory.consume_selected()
-                    return "planted"
         if tilemap.is_tillable(c, r):
             tilled = tilemap.till(c, r)
             return "tilled" if tilled else None
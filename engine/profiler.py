@@ -0,0 +1,181 @@
+import json
+import time
+from collections import deque
+
+import pygame
+
+# Graph colours for the main-loop stages, in frame order; unknown stages get grey
+STAGE_COLORS = {
+    'events': (200, 200, 200),
+    'player.handle_input': (255, 170, 0),
+    'simulation': (80, 160, 255),
+    'camera.update': (160, 100, 255),
+    'ground.update': (30, 130, 60),
+    'render.submit': (255, 230, 60),
+    'render.draw': (60, 220, 90),
+    'profiler.overlay': (90, 90, 90),
+    'display.flip': (0, 220, 220),
+    'dirty.redraw': (255, 140, 200),
+    'display.update': (0, 150, 150),
+}
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+class FrameProfiler:
+    """
+    FrameProfiler(history=240, enabled=False)
+    Per-frame stage timings for the main loop. Call begin_frame(), then mark(name) after each
+    stage (it records the time since the previous mark), then end_frame(). Systems wrapped with
+    timed(name, fn) are recorded as nested spans. The last `history` frames are kept in a ring
+    buffer for the on-screen graph (draw) and for export as Chrome trace events (dump_trace).
+    While disabled, begin_frame/mark/end_frame are bound to a no-op, so the cost is one call each.
+    """
+    def __init__(self, history=240, enabled=False, budget_ms=1000.0 / 60):
+        self.history = int(history)
+        self.frames = deque(maxlen=self.history)  # (frame_start, [(name, start, dur, depth), ...])
+        self.budget_ms = budget_ms
+        self._events = None
+        self._frame_start = 0.0
+        self._last = 0.0
+        self._font = None
+        self.enabled = False
+        self.set_enabled(enabled)
+
+    def set_enabled(self, enabled):
+        self.enabled = bool(enabled)
+        if self.enabled:
+            self.begin_frame = self._begin_frame
+            self.mark = self._mark
+            self.end_frame = self._end_frame
+        else:
+            self.begin_frame = self.mark = self.end_frame = _noop
+            self._events = None
+
+    def toggle(self):
+        self.set_enabled(not self.enabled)
+
+    def _begin_frame(self):
+        now = time.perf_counter()
+        self._frame_start = self._last = now
+        self._events = []
+
+    def _mark(self, name):
+        now = time.perf_counter()
+        if self._events is not None:
+            self._events.append((name, self._last, now - self._last, 0))
+        self._last = now
+
+    def _end_frame(self):
+        if self._events is not None:
+            self.frames.append((self._frame_start, self._events))
+        self._events = None
+
+    def timed(self, name, fn):
+        """Wrap fn so each call is recorded as a nested span while the profiler is on."""
+        def wrapper(*args, **kwargs):
+            if self._events is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._events.append((name, start, time.perf_counter() - start, 1))
+        return wrapper
+
+    def stage_totals(self, frame):
+        """{stage: ms} of the top-level stages of one recorded frame."""
+        totals = {}
+        for name, _, dur, depth in frame[1]:
+            if depth == 0:
+                totals[name] = totals.get(name, 0.0) + dur * 1000.0
+        return totals
+
+    def averages(self, frames=60):
+        """Mean ms per stage (nested spans included) over the last `frames` frames."""
+        recent = list(self.frames)[-frames:]
+        sums = {}
+        for _, events in recent:
+            for name, _, dur, _ in events:
+                sums[name] = sums.get(name, 0.0) + dur * 1000.0
+        return {name: total / len(recent) for name, total in sums.items()} if recent else {}
+
+    def draw(self, surface, x=10, y=10, width=240, height=80):
+        """Draw the stacked frame-time graph and per-stage averages."""
+        if not self.enabled:
+            return
+        if self._font is None:
+            pygame.font.init()
+            self._font = pygame.font.Font(None, 18)
+
+        panel = pygame.Rect(x, y, width, height)
+        surface.fill((20, 20, 20), panel)
+        # scale so twice the frame budget fills the panel; budget line at half height
+        px_per_ms = height / (self.budget_ms * 2)
+        budget_y = panel.bottom - int(self.budget_ms * px_per_ms)
+        pygame.draw.line(surface, (120, 0, 0), (panel.left, budget_y), (panel.right - 1, budget_y))
+
+        frames = list(self.frames)[-width:]
+        for i, frame in enumerate(frames):
+            bx = panel.left + width - len(frames) + i
+            by = panel.bottom
+            for name, ms in self.stage_totals(frame).items():
+                h = int(ms * px_per_ms)
+                if h <= 0:
+                    continue
+                top = max(panel.top, by - h)
+                pygame.draw.line(surface, STAGE_COLORS.get(name, (150, 150, 150)), (bx, by - 1), (bx, top))
+                by = top
+                if by <= panel.top:
+                    break
+
+        ty = panel.bottom + 4
+        for name, ms in sorted(self.averages().items(), key=lambda item: -item[1]):
+            text = self._font.render("%-20s %6.2f ms" % (name, ms), True, STAGE_COLORS.get(name, (220, 220, 220)))
+            surface.blit(text, (x, ty))
+            ty += text.get_height()
+
+    def dump_trace(self, path):
+        """Write the buffered frames as Chrome trace-event JSON (chrome://tracing, Perfetto)."""
+        events = []
+        for frame_start, spans in self.frames:
+            frame_end = frame_start
+            for name, start, dur, depth in spans:
+                events.append({'name': name, 'ph': 'X', 'pid': 1, 'tid': 1,
+                               'ts': start * 1e6, 'dur': dur * 1e6, 'cat': 'stage' if depth == 0 else 'system'})
+                frame_end = max(frame_end, start + dur)
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 0,
+                           'ts': frame_start * 1e6, 'dur': (frame_end - frame_start) * 1e6, 'cat': 'frame'})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+
+class StartupTimer:
+    """
+    StartupTimer(start=None)
+    Wall time of each startup phase: call mark(name) as each phase ends and it records the
+    time since the previous mark (or since start, default now). report() lists the phases.
+    """
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self._last = self.start
+        self.phases = []  # (name, seconds)
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def total(self):
+        return self._last - self.start
+
+    def report(self, assets=None):
+        """Text table of the phases and the total; assets (an AssetManager) adds its loading summary."""
+        lines = ["Startup took %.1f ms" % (self.total() * 1000.0)]
+        lines.extend("  %-14s %7.1f ms" % (name, seconds * 1000.0) for name, seconds in self.phases)
+        if assets is not None:
+            lines.append("  " + assets.summary())
+        return "\n".join(lines)
@@ -0,0 +1,137 @@
+"""
+Render queue: subsystems submit what they want drawn for a frame instead of blitting it.
+
+World sprites (crops, trees, villagers, the player) are culled against the view as they are
+submitted, sorted by their base y (the bottom edge, where they touch the ground) so whatever
+stands lower on screen is drawn in front, and sent to the surface in one Surface.fblits call
+(Surface.blits on pygame versions without it). Screen-space images (the HUD) go in a second
+layer drawn on top in submission order.
+
+A frame's queue can be drawn more than once: draw_world(surface, area) only blits the sprites
+overlapping area, which is how the dirty-rect path redraws each changed rect. Zoomed-out views
+draw it with draw_world_scaled at a power-of-two scale, or draw_world_zoomed at any scale.
+"""
+import math
+from operator import itemgetter
+
+import pygame
+
+_base = itemgetter(0)
+
+
+class RenderQueue:
+    """
+    RenderQueue()
+    Call begin(view) every frame, submit sprites, then draw_world() and draw_screen().
+    """
+    def __init__(self):
+        self.view = pygame.Rect(0, 0, 0, 0)
+        self.world = []  # (base y, left, top, right, bottom, image) in world pixels
+        self.screen = []  # (image, dest, area, special_flags)
+        self._sorted = True
+        self.submitted = 0  # sprites offered this frame, culled or not
+        self.drawn = 0  # blits issued by the last draw_world()
+
+    def begin(self, view):
+        """Start a frame looking at view (world rect, e.g. Camera.rect)."""
+        self.view = view.copy()
+        self.world.clear()
+        self.screen.clear()
+        self._sorted = True
+        self.submitted = 0
+
+    def submit(self, image, x, y, base=None):
+        """Queue image with its top-left at world (x, y); base is its sort y (default its bottom edge)."""
+        self.submitted += 1
+        if image is None:
+            return
+        w, h = image.get_size()
+        view = self.view
+        if x >= view.right or y >= view.bottom or x + w <= view.left or y + h <= view.top:
+            return
+        self.world.append((y + h if base is None else base, x, y, x + w, y + h, image))
+        self._sorted = False
+
+    def submit_many(self, sprites):
+        """Queue (image, x, y, base) tuples the caller has already culled against the view (base may be None)."""
+        world = self.world
+        n = len(world)
+        for image, x, y, base in sprites:
+            w, h = image.get_size()
+            world.append((y + h if base is None else base, x, y, x + w, y + h, image))
+        self.submitted += len(world) - n
+        self._sorted = False
+
+    def submit_columns(self, images, xs, ys, widths, heights, bases=None):
+        """
+        Queue already-culled sprites given column-wise: images is a list, the rest are int
+        arrays (world pixels); bases defaults to ys + heights. Used by the NumPy-backed stores.
+        """
+        rights, bottoms = xs + widths, ys + heights
+        bases = bottoms if bases is None else bases
+        self.world.extend(zip(bases.tolist(), xs.tolist(), ys.tolist(), rights.tolist(), bottoms.tolist(), images))
+        self.submitted += len(images)
+        self._sorted = False
+
+    def submit_screen(self, image, dest, special_flags=0):
+        """Queue image at screen position dest in the layer drawn over the world."""
+        if image is not None:
+            self.screen.append((image, dest, None, special_flags))
+
+    def _sort(self):
+        if not self._sorted:
+            self.world.sort(key=_base)  # stable: equal bases keep submission order
+            self._sorted = True
+
+    @staticmethod
+    def _blit(surface, blits):
+        if hasattr(surface, 'fblits'):
+            surface.fblits(blits)
+        else:
+            surface.blits(blits, doreturn=False)
+
+    def draw_world(self, surface, area=None):
+        """Blit the world sprites overlapping area (world rect, default the whole view), back to front."""
+        self._sort()
+        left, top = self.view.left, self.view.top
+        if area is None:
+            blits = [(image, (x - left, y - top)) for _, x, y, _, _, image in self.world]
+        else:
+            al, at, ar, ab = area.left, area.top, area.right, area.bottom
+            blits = [(image, (x - left, y - top)) for _, x, y, r, b, image in self.world
+                     if x < ar and y < ab and r > al and b > at]
+        self._blit(surface, blits)
+        self.drawn = len(blits)
+
+    def draw_world_scaled(self, surface, shift, images):
+        """
+        draw_world at 1 / 2**shift scale, for zoomed-out views (engine.zoom): each sprite is drawn
+        as images(image, shift) at its world position divided the same way, relative to the view.
+        """
+        self._sort()
+        left, top = self.view.left >> shift, self.view.top >> shift
+        blits = [(images(image, shift), ((x >> shift) - left, (y >> shift) - top)) for _, x, y, _, _, image in self.world]
+        self._blit(surface, blits)
+        self.drawn = len(blits)
+
+    def draw_world_zoomed(self, surface, scale, scaled):
+        """
+        draw_world at any scale (x, y), for engine.zoom: each sprite is drawn as
+        scaled(image, scale) at its world position scaled the same way, relative to the view.
+        """
+        self._sort()
+        sx, sy = scale
+        left, top = math.floor(self.view.left * sx), math.floor(self.view.top * sy)
+        blits = [(scaled(image, scale), (math.floor(x * sx) - left, math.floor(y * sy) - top))
+                 for _, x, y, _, _, image in self.world]
+        self._blit(surface, blits)
+        self.drawn = len(blits)
+
+    def draw_screen(self, surface):
+        """Blit the screen-space layer in submission order."""
+        if self.screen:
+            surface.blits(self.screen, doreturn=False)
+
+    def draw(self, surface):
+        self.draw_world(surface)
+        self.draw_screen(surface)
@@ -0,0 +1,224 @@
+"""
+Input recording and deterministic replay.
+
+    python main.py --record run.sdvr                   play, recording every frame's input
+    python main.py --replay run.sdvr                   play it back, drawing every frame
+    python main.py --replay run.sdvr --no-render       play it back as fast as possible
+    python main.py --replay run.sdvr --report r.json   also write per-frame hashes and timings
+
+A recording is a gzip stream with a small header followed by one record per frame: the frame's
+dt, modifier keys, mouse position, pressed key scancodes and the events main.py handles, plus
+a hash of the game state once the frame's logic has run. A replay feeds the frames back
+through the same code in main.py instead of reading pygame, compares each frame's state hash
+with the recorded one and reports the first frame where they differ, along with how long each
+frame took (so two versions can be compared frame by frame).
+
+Recording and replay both start from a fresh world (no save loaded, autosave off), and the
+streaming world loads chunks on the main thread into memory, so the state depends only on
+the recorded input.
+"""
+import gzip
+import json
+import struct
+import time
+import zlib
+
+import pygame
+
+MAGIC = b'SDVR'
+VERSION = 1
+# version, length of the JSON meta that follows
+HEADER = struct.Struct('<HI')
+# dt, mods, mouse x, mouse y, pressed keys, events, state hash after the frame
+FRAME = struct.Struct('<dHhhHHI')
+
+# event types main.py handles; the code stored is the index in this tuple
+RECORDED_EVENTS = (pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEWHEEL)
+KEY_EVENT = struct.Struct('<iH')  # key, mod
+BUTTON_EVENT = struct.Struct('<Bhh')  # button, x, y
+WHEEL_EVENT = struct.Struct('<hh')  # x, y
+
+
+class FrameInput:
+    """What one frame of main.py reads from pygame: dt, events, key state, modifiers and mouse position."""
+    __slots__ = ('dt', 'events', 'keys', 'mods', 'mouse_pos')
+
+    def __init__(self, dt, events, keys, mods, mouse_pos):
+        self.dt = dt
+        self.events = events
+        self.keys = keys
+        self.mods = mods
+        self.mouse_pos = mouse_pos
+
+
+def _encode_event(event):
+    code = RECORDED_EVENTS.index(event.type)
+    data = bytes((code,))
+    if event.type == pygame.KEYDOWN:
+        data += KEY_EVENT.pack(event.key, event.mod)
+    elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        data += BUTTON_EVENT.pack(event.button, *event.pos)
+    elif event.type == pygame.MOUSEWHEEL:
+        data += WHEEL_EVENT.pack(event.x, event.y)
+    return data
+
+
+def _read_event(f):
+    event_type = RECORDED_EVENTS[f.read(1)[0]]
+    if event_type == pygame.KEYDOWN:
+        key, mod = KEY_EVENT.unpack(f.read(KEY_EVENT.size))
+        return pygame.event.Event(event_type, key=key, mod=mod)
+    if event_type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        button, x, y = BUTTON_EVENT.unpack(f.read(BUTTON_EVENT.size))
+        return pygame.event.Event(event_type, button=button, pos=(x, y))
+    if event_type == pygame.MOUSEWHEEL:
+        x, y = WHEEL_EVENT.unpack(f.read(WHEEL_EVENT.size))
+        return pygame.event.Event(event_type, x=x, y=y)
+    return pygame.event.Event(event_type)
+
+
+class InputRecorder:
+    """InputRecorder(path, meta): writes frames to a recording; meta is a JSON-ready dict (e.g. the game options)."""
+    def __init__(self, path, meta):
+        self.path = path
+        self.frames = 0
+        self._f = gzip.open(path, 'wb', compresslevel=6)
+        meta_bytes = json.dumps(meta).encode('utf-8')
+        self._f.write(MAGIC + HEADER.pack(VERSION, len(meta_bytes)) + meta_bytes)
+
+    def write(self, frame, state_hash):
+        pressed = [i for i, down in enumerate(frame.keys) if down]
+        parts = [FRAME.pack(frame.dt, frame.mods, frame.mouse_pos[0], frame.mouse_pos[1],
+                            len(pressed), len(frame.events), state_hash),
+                 struct.pack('<%dH' % len(pressed), *pressed)]
+        parts.extend(_encode_event(event) for event in frame.events)
+        self._f.write(b''.join(parts))
+        self.frames += 1
+
+    def close(self):
+        self._f.close()
+
+
+def read_recording(path):
+    """(meta, frames) of a recording; frames yields (FrameInput, recorded state hash)."""
+    f = gzip.open(path, 'rb')
+    if f.read(len(MAGIC)) != MAGIC:
+        f.close()
+        raise ValueError("%s is not an input recording" % path)
+    version, meta_len = HEADER.unpack(f.read(HEADER.size))
+    if version != VERSION:
+        f.close()
+        raise ValueError("%s: unsupported recording version %d" % (path, version))
+    meta = json.loads(f.read(meta_len).decode('utf-8'))
+
+    def frames():
+        with f:
+            no_keys = [False] * 512  # length of pygame.key.get_pressed()
+            while True:
+                head = f.read(FRAME.size)
+                if len(head) < FRAME.size:
+                    return
+                dt, mods, mx, my, n_keys, n_events, state_hash = FRAME.unpack(head)
+                keys = list(no_keys)
+                for i in struct.unpack('<%dH' % n_keys, f.read(2 * n_keys)):
+                    keys[i] = True
+                events = [_read_event(f) for _ in range(n_events)]
+                yield FrameInput(dt, events, pygame.key.ScancodeWrapper(keys), mods, (mx, my)), state_hash
+
+    return meta, frames()
+
+
+class LiveInput:
+    """
+    LiveInput(clock, fps=60, recorder=None)
+    Frames read from pygame and paced by clock; each one is written to recorder if given.
+    """
+    def __init__(self, clock, fps=60, recorder=None):
+        self.clock = clock
+        self.fps = fps
+        self.recorder = recorder
+        self.wants_hash = recorder is not None
+        self._frame = None
+
+    def next_frame(self):
+        dt = self.clock.tick(self.fps) / 1000.0
+        events = [event for event in pygame.event.get() if event.type in RECORDED_EVENTS]
+        self._frame = FrameInput(dt, events, pygame.key.get_pressed(), pygame.key.get_mods(),
+                                 pygame.mouse.get_pos())
+        return self._frame
+
+    def end_frame(self, state_hash=None):
+        if self.recorder is not None:
+            self.recorder.write(self._frame, state_hash)
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+class ReplayInput:
+    """
+    ReplayInput(path)
+    Frames from a recording, as fast as the caller runs them. end_frame() checks the state
+    hash against the recorded one; report() summarises hashes, divergence and frame times.
+    """
+    wants_hash = True
+
+    def __init__(self, path):
+        self.path = path
+        self.meta, self._frames = read_recording(path)
+        self.frame_index = -1
+        self.expected = None
+        self.hashes = []
+        self.frame_ms = []
+        self.diverged_at = None  # first frame whose state hash didn't match the recording
+        self._start = None
+
+    def next_frame(self):
+        try:
+            frame, self.expected = next(self._frames)
+        except StopIteration:
+            return None
+        self.frame_index += 1
+        self._start = time.perf_counter()
+        return frame
+
+    def end_frame(self, state_hash=None):
+        self.frame_ms.append((time.perf_counter() - self._start) * 1000.0)
+        self.hashes.append(state_hash)
+        if state_hash != self.expected and self.diverged_at is None:
+            self.diverged_at = self.frame_index
+            print("Replay diverged at frame %d: state hash %08x, recorded %08x"
+                  % (self.frame_index, state_hash, self.expected))
+
+    def report(self):
+        times = sorted(self.frame_ms)
+        n = len(times)
+        return {
+            'recording': self.path,
+            'frames': n,
+            'diverged_at': self.diverged_at,
+            'total_ms': sum(times),
+            'mean_ms': sum(times) / n if n else None,
+            'p50_ms': times[n // 2] if n else None,
+            'p99_ms': times[min(n - 1, int(n * 0.99))] if n else None,
+            'per_frame': [["%08x" % h, round(ms, 4)] for h, ms in zip(self.hashes, self.frame_ms)],
+        }
+
+    def close(self):
+        self._frames.close()
+
+
+def state_hash(tilemap, player, inventory, simulation, camera, entities=None):
+    """CRC32 of everything the game logic depends on; equal hashes mean the runs haven't diverged."""
+    crc = zlib.crc32(struct.pack('<4i4d2idqdi', player.rect.x, player.rect.y, player.rect.width, player.rect.height,
+                                 player.x, player.y, player.vx, player.vy, player.facing, player.current_frame,
+                                 player.anim_time, simulation.tick_count, simulation.accumulator, inventory.selected_index))
+    crc = zlib.crc32(struct.pack('<4i', *camera.rect), crc)
+    slots = [(stack.id, stack.count) if stack else (-1, 0) for stack in inventory.items]
+    crc = zlib.crc32(repr(slots).encode(), crc)
+    if entities is not None:
+        n = entities.count
+        for arr in (entities.kind, entities.x, entities.y, entities.facing, entities.frame):
+            crc = zlib.crc32(arr[:n].tobytes(), crc)
+    return tilemap.state_hash(crc)
@@ -0,0 +1,329 @@
+"""
+Versioned binary save format for world state.
+
+Layout (little endian):
+    header      HEADER, always at offset 0 and rewritten last, so it only ever points at
+                complete data
+    chunks      one zlib-compressed record per CHUNK_TILES x CHUNK_TILES block of tiles:
+                CHUNK_HEAD, tile ids, flag bits, then CROP_REC per crop
+    index       INDEX_ENTRY per chunk: where its record lives and its crc32
+    meta        JSON: tile palette, crop type names, inventory, tick, player position
+
+Loading memory-maps the file and reads only the header, index and meta; chunk records are
+decoded when the TileMap first touches them (or up front for the chunks around the player).
+Saving to the file a map was loaded from re-encodes just the chunks that changed since the last
+save and copies the other records over as they are. Every save goes to a temporary file that is
+then renamed over the old one; a map with chunks still pending switches to reading them from
+the new file, which holds the same records for them.
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from .tilemap import CHUNK_TILES, TileMap
+from .tiles import TilePalette
+
+MAGIC = b'SDVS'
+VERSION = 1
+
+# magic, version, chunk_tiles, tile_w, tile_h, cols, rows, grid itemsize, reserved,
+# index offset, index entry count, meta offset, meta length
+HEADER = struct.Struct('<4sHHIIIIHHQIQI')
+# chunk col, chunk row, record offset, record length, crc32 of the record
+INDEX_ENTRY = struct.Struct('<HHQII')
+# width, height (tiles), crop count
+CHUNK_HEAD = struct.Struct('<HHI')
+# local col, local row, crop type index, stage, ticks into stage
+CROP_REC = struct.Struct('<BBBBI')
+
+
+class SaveFormatError(Exception):
+    pass
+
+
+def encode_chunk(tilemap, cx, cy, crop_types):
+    """
+    Compressed record for one chunk; crop_types is a name -> index dict, extended as needed.
+    tilemap may be anything with TileMap's chunk_bounds, chunk_arrays and crop_states
+    (engine.autosave encodes from a WorldSnapshot).
+    """
+    c0, r0, c1, r1 = tilemap.chunk_bounds(cx, cy)
+    grid, flags = tilemap.chunk_arrays(cx, cy)
+    crops = tilemap.crop_states(c0, r0, c1, r1)
+    parts = [CHUNK_HEAD.pack(c1 - c0, r1 - r0, len(crops)),
+             np.ascontiguousarray(grid).tobytes(),
+             np.ascontiguousarray(flags).tobytes()]
+    for c, r, crop_type, stage, progress in crops:
+        type_index = crop_types.setdefault(crop_type, len(crop_types))
+        parts.append(CROP_REC.pack(c - c0, r - r0, type_index, stage, progress))
+    return zlib.compress(b''.join(parts))
+
+
+def decode_chunk(record, itemsize):
+    """(tile ids, flags, [(local col, local row, type index, stage, progress), ...]) of a record."""
+    data = zlib.decompress(record)
+    w, h, crop_count = CHUNK_HEAD.unpack_from(data, 0)
+    pos = CHUNK_HEAD.size
+    dtype = np.uint8 if itemsize == 1 else np.uint16
+    grid = np.frombuffer(data, dtype=dtype, count=w * h, offset=pos).reshape(h, w)
+    pos += w * h * itemsize
+    flags = np.frombuffer(data, dtype=np.uint8, count=w * h, offset=pos).reshape(h, w)
+    pos += w * h
+    crops = [CROP_REC.unpack_from(data, pos + i * CROP_REC.size) for i in range(crop_count)]
+    return grid, flags, crops
+
+
+class SaveFile:
+    """
+    SaveFile(path)
+    Read side of a save: memory-maps the file and exposes the header, meta and per-chunk records.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SaveFormatError("%s is empty" % path)
+
+        if len(self._mm) < HEADER.size:
+            self.close()
+            raise SaveFormatError("%s is too short to be a save" % path)
+        (magic, version, self.chunk_tiles, self.tile_w, self.tile_h, self.cols, self.rows,
+         self.itemsize, _, index_offset, index_count, meta_offset, meta_len) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise SaveFormatError("%s is not a save file" % path)
+        if version > VERSION:
+            self.close()
+            raise SaveFormatError("%s is save version %d, newer than supported (%d)" % (path, version, VERSION))
+
+        self.index = {}
+        for i in range(index_count):
+            cx, cy, offset, length, crc = INDEX_ENTRY.unpack_from(self._mm, index_offset + i * INDEX_ENTRY.size)
+            self.index[(cx, cy)] = (offset, length, crc)
+        self.meta = json.loads(bytes(self._mm[meta_offset:meta_offset + meta_len]).decode('utf-8'))
+        self.file_size = len(self._mm)
+
+    def close(self):
+        if getattr(self, '_mm', None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def compatible(self, tilemap, palette_names):
+        """True if records of this file can be reused for tilemap (same layout, same palette ids)."""
+        saved = self.meta['palette']
+        return ((self.cols, self.rows, self.tile_w, self.tile_h, self.chunk_tiles, self.itemsize)
+                == (tilemap.cols, tilemap.rows, tilemap.tile_w, tilemap.tile_h, CHUNK_TILES, tilemap.grid.dtype.itemsize)
+                and saved == list(palette_names[:len(saved)]))
+
+    def record(self, cx, cy):
+        """Raw (still compressed) record of a chunk and its crc32, for copying into another file."""
+        offset, length, crc = self.index[(cx, cy)]
+        return self._mm[offset:offset + length], crc
+
+    def chunk(self, cx, cy):
+        offset, length, crc = self.index[(cx, cy)]
+        record = self._mm[offset:offset + length]
+        if zlib.crc32(record) != crc:
+            raise SaveFormatError("chunk %d,%d of %s is corrupt" % (cx, cy, self.path))
+        return decode_chunk(record, self.itemsize)
+
+    def load_chunk_into(self, tilemap, cx, cy):
+        """Copy one chunk's tiles, flags and crops into tilemap (used as its chunk_loader)."""
+        if (cx, cy) not in self.index:
+            return
+        grid, flags, crops = self.chunk(cx, cy)
+        c0, r0, c1, r1 = tilemap.chunk_bounds(cx, cy)
+        tilemap.grid[r0:r1, c0:c1] = grid
+        tilemap.solid[r0:r1, c0:c1] = tilemap.palette.solid[grid]
+        tilemap.flags[r0:r1, c0:c1] = flags
+        crop_types = self.meta['crop_types']
+        for lc, lr, type_index, stage, progress in crops:
+            tilemap.restore_crop(c0 + lc, r0 + lr, crop_types[type_index], stage, progress)
+        # loading isn't a change: nothing to write back for this chunk
+        tilemap.save_dirty.discard((cx, cy))
+        tilemap.invalidate_tile(c0, r0)
+        # edges along neighbouring chunks that are already loaded may change too
+        tilemap.autotile(c0 - 1, r0 - 1, c1 + 1, r1 + 1)
+
+
+def inventory_state(inventory):
+    """JSON-ready copy of an inventory's slots, as stored in the save meta."""
+    if inventory is None:
+        return None
+    return {'slots': [{'name': stack.name, 'count': stack.count} if stack else None for stack in inventory.items],
+            'selected': inventory.selected_index}
+
+
+def _meta(palette_names, crop_types, tick, inventory, player_pos):
+    meta = {
+        'palette': list(palette_names),
+        'crop_types': sorted(crop_types, key=crop_types.get),
+        'tick': tick,
+        'inventory': inventory,
+        'player': list(player_pos) if player_pos is not None else None,
+    }
+    return json.dumps(meta, separators=(',', ':')).encode('utf-8')
+
+
+def _tilemap_meta(tilemap, crop_types, inventory, player):
+    return _meta([tile.name for tile in tilemap.palette.tiles], crop_types, tilemap.tick,
+                 inventory_state(inventory), player.rect.topleft if player is not None else None)
+
+
+def _write_tail(f, index, meta_bytes, tilemap):
+    """Append index and meta at the end of f, then point the header at them."""
+    f.seek(0, os.SEEK_END)
+    index_offset = f.tell()
+    for (cx, cy), (offset, length, crc) in sorted(index.items()):
+        f.write(INDEX_ENTRY.pack(cx, cy, offset, length, crc))
+    meta_offset = f.tell()
+    f.write(meta_bytes)
+    f.flush()
+    os.fsync(f.fileno())
+    # header last: until it lands the previous index and meta stay authoritative
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, VERSION, CHUNK_TILES, tilemap.tile_w, tilemap.tile_h, tilemap.cols,
+                        tilemap.rows, tilemap.grid.dtype.itemsize, 0, index_offset, len(index),
+                        meta_offset, len(meta_bytes)))
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _write(path, tilemap, inventory, player, existing=None, changed=()):
+    """
+    Write tilemap to path through a temporary file and an atomic rename. Records of chunks that
+    existing (an open SaveFile of the same map) holds and that aren't in changed are copied
+    from it. Returns the number of chunk records encoded.
+    """
+    if existing is None:
+        tilemap.load_all_chunks()
+        crop_types = {}
+    else:
+        crop_types = {name: i for i, name in enumerate(existing.meta['crop_types'])}
+    index = {}
+    encoded = 0
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\0' * HEADER.size)
+        for cy in range(tilemap.chunk_rows):
+            for cx in range(tilemap.chunk_cols):
+                if existing is not None and (cx, cy) in existing.index and (cx, cy) not in changed:
+                    record, crc = existing.record(cx, cy)
+                else:
+                    record = encode_chunk(tilemap, cx, cy, crop_types)
+                    crc = zlib.crc32(record)
+                    encoded += 1
+                index[(cx, cy)] = (f.tell(), len(record), crc)
+                f.write(record)
+        _write_tail(f, index, _tilemap_meta(tilemap, crop_types, inventory, player), tilemap)
+    if existing is not None:
+        existing.close()
+    _replace_save(tmp_path, path, tilemap)
+    return encoded
+
+
+def _replace_save(tmp_path, path, tilemap):
+    """
+    Rename tmp_path over path. A mapping tilemap still has of path is closed first (Windows
+    won't rename over a mapped file); if chunks are still pending, the new file, which holds
+    the same records for them, is mapped in its place.
+    """
+    save_file = tilemap.save_file
+    mapped = save_file is not None and os.path.abspath(save_file.path) == os.path.abspath(path)
+    if mapped:
+        save_file.close()
+        tilemap.save_file = None
+    try:
+        os.replace(tmp_path, path)
+    finally:
+        if mapped and tilemap._unloaded:
+            # the new file if the rename went through, else the old one again
+            tilemap.save_file = SaveFile(path)
+            tilemap.chunk_loader = tilemap.save_file.load_chunk_into
+
+
+def save_world(path, tilemap, inventory=None, player=None):
+    """
+    Save tilemap (and optionally inventory and player position) to path. If path already holds
+    a compatible save of this map, only chunks changed since the last save are encoded again.
+    Returns the number of chunk records encoded.
+    """
+    growing = tilemap.growing_chunks()
+    existing = None
+    if tilemap.save_path == path and os.path.exists(path):
+        try:
+            existing = SaveFile(path)
+        except (OSError, SaveFormatError):
+            existing = None
+        if existing is not None and not existing.compatible(tilemap, [t.name for t in tilemap.palette.tiles]):
+            existing.close()
+            existing = None
+
+    if existing is None:
+        written = _write(path, tilemap, inventory, player)
+    else:
+        # growing crops change their saved stage/progress every tick, including the ones that
+        # finished growing since the last save
+        changed = (tilemap.save_dirty | growing | tilemap.save_growing) - tilemap._unloaded
+        try:
+            written = _write(path, tilemap, inventory, player, existing, changed)
+        finally:
+            existing.close()
+
+    tilemap.save_path = path
+    tilemap.save_dirty.clear()
+    tilemap.save_growing = growing
+    if tilemap.save_file is not None and not tilemap._unloaded:
+        # every chunk has been read; the mapping of the loaded file is no longer needed
+        tilemap.save_file.close()
+        tilemap.save_file = None
+    return written
+
+
+def load_world(path, center=None, radius=1, use_crop_field=False):
+    """
+    Open a save and build its TileMap. Only chunks within radius chunks of center (a tile
+    (col, row); defaults to the saved player's tile) are decoded now; the rest load when
+    first touched. Returns (tilemap, meta); meta holds 'inventory', 'player' and 'tick'.
+    """
+    save = SaveFile(path)
+    meta = save.meta
+    tilemap = TileMap(save.cols * save.tile_w, save.rows * save.tile_h, save.tile_w, save.tile_h,
+                      use_crop_field=use_crop_field, palette=TilePalette.from_names(meta['palette']))
+    if save.itemsize != tilemap.grid.dtype.itemsize:
+        tilemap.grid = tilemap.grid.astype(np.uint8 if save.itemsize == 1 else np.uint16)
+        # the drawn variants were resolved from the old grid; redo them at its new width
+        tilemap.variants = tilemap.autotiler.resolve(tilemap._padded_grid(0, 0, tilemap.cols, tilemap.rows))
+    tilemap.tick = meta.get('tick', 0)
+    tilemap.save_path = path
+    tilemap.save_file = save  # keeps the mapping alive while chunks are pending
+
+    tilemap.defer_chunks(save.load_chunk_into, save.index.keys())
+    if center is None and meta.get('player'):
+        center = tilemap.world_to_tile(*meta['player'])
+    if center is not None:
+        ccx, ccy = center[0] // CHUNK_TILES, center[1] // CHUNK_TILES
+        for cy in range(ccy - radius, ccy + radius + 1):
+            for cx in range(ccx - radius, ccx + radius + 1):
+                tilemap._ensure_chunk(cx, cy)
+    return tilemap, meta
+
+
+def restore_inventory(inventory, meta):
+    """Copy saved inventory slots (from load_world's meta) into inventory."""
+    saved = meta.get('inventory')
+    if not saved:
+        return
+    slots = saved['slots']
+    for i in range(inventory.slot_count):
+        item = slots[i] if i < len(slots) else None
+        inventory.set_slot(i, item['name'] if item else None, item['count'] if item else 0)
+    inventory.set_selected_index(saved.get('selected', 0))
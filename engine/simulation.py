@@ -0,0 +1,59 @@
+# Seconds of game time in one in-game day
+DAY_LENGTH = 600.0
+
+
+class Simulation:
+    """
+    Simulation(tick_rate=60, max_frame_time=0.25)
+    Fixed-timestep world update. advance(dt) feeds real frame time into an accumulator and
+    runs every registered system once per whole tick; the leftover fraction is returned as
+    alpha so rendering can interpolate between the last two ticks.
+    Systems are callables taking the tick length in seconds, e.g. player.update.
+    """
+    def __init__(self, tick_rate=60, max_frame_time=0.25):
+        self.tick_rate = int(tick_rate)
+        self.tick_dt = 1.0 / self.tick_rate
+        # cap on frame time fed in at once so a long hitch can't snowball into a spiral of ticks
+        self.max_frame_time = float(max_frame_time)
+        self.accumulator = 0.0
+        self.tick_count = 0
+        self.alpha = 0.0
+        self.systems = []
+
+    def add_system(self, system):
+        self.systems.append(system)
+        return system
+
+    def remove_system(self, system):
+        if system in self.systems:
+            self.systems.remove(system)
+
+    @property
+    def ticks_per_day(self):
+        return int(round(DAY_LENGTH * self.tick_rate))
+
+    @property
+    def time(self):
+        """Simulated seconds since start."""
+        return self.tick_count * self.tick_dt
+
+    def step(self):
+        """Run exactly one tick."""
+        dt = self.tick_dt
+        for system in self.systems:
+            system(dt)
+        self.tick_count += 1
+
+    def run_ticks(self, ticks):
+        """Run ticks ticks back to back, with no rendering or frame pacing."""
+        for _ in range(int(ticks)):
+            self.step()
+
+    def advance(self, frame_dt):
+        """Consume frame_dt seconds of real time; returns alpha in [0, 1) for interpolation."""
+        self.accumulator += min(max(0.0, frame_dt), self.max_frame_time)
+        while self.accumulator >= self.tick_dt:
+            self.step()
+            self.accumulator -= self.tick_dt
+        self.alpha = self.accumulator / self.tick_dt
+        return self.alpha
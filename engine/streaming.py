@@ -0,0 +1,702 @@
+"""
+Streaming world: an unbounded TileMap made of chunks that are paged in around the camera.
+
+Chunks (CHUNK_TILES x CHUNK_TILES tiles, same as TileMap's baked chunks) are generated from
+the world seed, or read back from a ChunkStore if they were changed before, by a background
+worker thread. draw() never waits for the worker: a chunk that isn't ready yet is drawn as
+plain ground for a frame or two, and chunks within `prefetch` pixels of the view are requested
+and baked ahead of time. Loaded chunks are kept in LRU order and the least recently drawn ones
+are evicted once their estimated size exceeds `memory_budget`. Evicted chunks that were
+changed are written to the store; untouched ones are simply regenerated next time.
+
+Crops keep growing while their chunk is paged out: the store remembers the tick a chunk was
+written on and the elapsed ticks are added back when it is loaded.
+"""
+import heapq
+import itertools
+import json
+import os
+import queue
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from .assets import LazyImages
+from .autotile import Autotiler
+from .crop import Crop
+from .render import RenderQueue
+from .savefile import decode_chunk, encode_chunk
+from .tilemap import CHUNK_TILES, FLAG_TILLED, GROUND_FILL, TileMap
+from .tiles import TilePalette
+
+# tick the chunk was stored on, grid itemsize; followed by a savefile chunk record
+STORE_HEAD = struct.Struct('<qB')
+
+# rough per-crop cost for the memory budget (sprite, rect, dict entry)
+CROP_BYTES = 600
+
+TREE_DENSITY = 0.012
+FLOWER_DENSITY = 0.03
+
+
+class ChunkStore:
+    """
+    ChunkStore(directory=None)
+    Changed chunks of a streaming world, one file per chunk plus meta.json (seed, tick,
+    palette, crop type names). Without a directory records are only kept in memory.
+    Records are handed over with put() and written by the streaming worker.
+    """
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.meta = {}
+        self._records = {}  # (cx, cy) -> bytes not yet written (or kept, without a directory)
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            meta_path = os.path.join(directory, 'meta.json')
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    self.meta = json.load(f)
+
+    def _path(self, cx, cy):
+        return os.path.join(self.directory, "%d_%d.chunk" % (cx, cy))
+
+    def put(self, cx, cy, data):
+        with self._lock:
+            self._records[(cx, cy)] = data
+
+    def get(self, cx, cy):
+        """Stored bytes of a chunk, or None if it was never changed."""
+        with self._lock:
+            data = self._records.get((cx, cy))
+        if data is not None or not self.directory:
+            return data
+        try:
+            with open(self._path(cx, cy), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def flush(self, cx, cy):
+        """Write a pending record to disk (worker thread)."""
+        if not self.directory:
+            return
+        with self._lock:
+            data = self._records.get((cx, cy))
+        if data is None:
+            return
+        path = self._path(cx, cy)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        with self._lock:
+            # a newer record may have arrived while this one was written
+            if self._records.get((cx, cy)) is data:
+                del self._records[(cx, cy)]
+
+    def save_meta(self, meta):
+        self.meta = meta
+        if self.directory:
+            path = os.path.join(self.directory, 'meta.json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(meta, f)
+            os.replace(path + '.tmp', path)
+
+
+class WorldChunk:
+    """One loaded chunk: tile ids, flags, solid tiles, crops by tile and the baked ground surface."""
+    def __init__(self, world, cx, cy, grid, flags):
+        self.world = world
+        self.cx, self.cy = cx, cy
+        self.c0, self.r0 = cx * CHUNK_TILES, cy * CHUNK_TILES
+        self.grid = grid
+        self.flags = flags
+        self.solid = world.palette.solid[grid]  # for engine.collision
+        self.variants = grid.copy()  # drawn tile ids, see engine.autotile; filled in by _install
+        self.crops = {}  # (col, row) -> Crop
+        self.surface = None
+        self.baked_rows = 0  # tile rows of surface drawn so far; chunks are baked a few rows at a time
+        self.modified = False  # differs from what the seed (or the store) would give
+
+    def nbytes(self):
+        size = (self.grid.nbytes + self.variants.nbytes + self.flags.nbytes + self.solid.nbytes
+                + CROP_BYTES * len(self.crops))
+        if self.surface is not None:
+            size += self.surface.get_bytesize() * self.surface.get_width() * self.surface.get_height()
+        return size
+
+    # chunk_bounds/chunk_arrays/crop_states, as engine.savefile.encode_chunk expects
+
+    def chunk_bounds(self, cx, cy):
+        return self.c0, self.r0, self.c0 + CHUNK_TILES, self.r0 + CHUNK_TILES
+
+    def chunk_arrays(self, cx, cy):
+        return self.grid, self.flags
+
+    def crop_states(self, c0, r0, c1, r1):
+        tick = self.world.tick
+        return [(c, r, crop.crop_type, crop.stage, 0 if crop.is_ripe() else crop.ticks_in_stage(tick))
+                for (c, r), crop in self.crops.items()]
+
+
+class StreamingTileMap:
+    """
+    StreamingTileMap(tile_w=64, tile_h=64, seed=0, store_dir=None, memory_budget=96 MiB,
+                     prefetch=256, palette=None, threaded=True)
+    TileMap-compatible world with no edges (tile coordinates may be negative). Whole-map
+    queries (crop_count, count_tilled) only see the chunks currently loaded.
+    """
+    def __init__(self, tile_w=64, tile_h=64, seed=0, store_dir=None, memory_budget=96 * 1024 * 1024,
+                 prefetch=256, palette=None, threaded=True):
+        self.tile_w = int(tile_w)
+        self.tile_h = int(tile_h)
+        self.store = ChunkStore(store_dir)
+        meta = self.store.meta
+        self.seed = int(meta.get('seed', seed))
+        self.tick = int(meta.get('tick', 0))
+        if palette is None:
+            palette = TilePalette.from_names(meta['palette']) if 'palette' in meta else TilePalette()
+        self.palette = palette
+        self.crop_types = list(meta.get('crop_types', []))
+        self.memory_budget = int(memory_budget)
+        self.prefetch = int(prefetch)
+
+        self.tile_surfaces = {}
+        self._surfaces_by_id = LazyImages(self._load_tile_surface)
+        self._grass_id = self.palette.id_of('grass')
+        self._tree_id = self.palette.id_of('tree')
+        self._flower_ids = [tid for tid, tile in enumerate(self.palette.tiles) if tile.name.startswith('flower_')]
+        self.autotiler = Autotiler(self.palette)
+
+        self.chunks = OrderedDict()  # (cx, cy) -> WorldChunk, least recently used first
+        # changed tiles for engine.framebuffer, and chunks drawn as plain ground while loading
+        self.damaged_tiles = []
+        self.damage_all = False
+        self._placeholders = set()
+        self.chunk_stamps = {}  # see TileMap.chunk_stamp
+        self.ground_epoch = 0
+        self._zoom_layer = None
+        self._growth_queue = []
+        self._growth_seq = itertools.count()
+
+        # worker: ('load', key, token) and ('write', key, None) jobs in, (token, chunk data) out.
+        # A result only counts if its token is still the one in _requested, so a late result
+        # can't replace a chunk that was meanwhile loaded on the main thread, changed and evicted.
+        self._jobs = queue.Queue()
+        self._ready = queue.Queue()
+        self._requested = {}  # (cx, cy) -> token
+        self._tokens = itertools.count()
+        self._thread = None
+        if threaded:
+            self._thread = threading.Thread(target=self._run, name="chunk-streaming", daemon=True)
+            self._thread.start()
+
+    # shared with TileMap
+    _load_tile_surface = TileMap._load_tile_surface
+    _soil_surface = TileMap._soil_surface
+    _draw_tile = TileMap._draw_tile
+    _schedule_growth = TileMap._schedule_growth
+    damage = TileMap.damage
+    take_damage = TileMap.take_damage
+    chunk_stamp = TileMap.chunk_stamp
+    _touch_chunks = TileMap._touch_chunks
+    _tile_layers = TileMap._tile_layers
+    bake_level = TileMap.bake_level
+    draw_zoomed = TileMap.draw_zoomed
+    highlight_rect = TileMap.highlight_rect
+    _submit_upright = TileMap._submit_upright
+
+    def tile_to_world(self, c, r):
+        return c * self.tile_w, r * self.tile_h
+
+    def world_to_tile(self, x, y):
+        return int(x // self.tile_w), int(y // self.tile_h)
+
+    def chunk_of(self, c, r):
+        return c // CHUNK_TILES, r // CHUNK_TILES
+
+    # Producing chunk data (worker thread, or the main thread when a tile is needed right away)
+
+    def generate(self, cx, cy):
+        """Tile ids and flags of an untouched chunk; a pure function of the seed and position."""
+        rng = np.random.default_rng([self.seed & 0xffffffff, cx & 0xffffffff, cy & 0xffffffff])
+        roll = rng.random((CHUNK_TILES, CHUNK_TILES))
+        grid = np.full((CHUNK_TILES, CHUNK_TILES), self._grass_id, dtype=self.palette.dtype())
+        grid[roll < TREE_DENSITY] = self._tree_id
+        if self._flower_ids:
+            flowers = (roll >= TREE_DENSITY) & (roll < TREE_DENSITY + FLOWER_DENSITY)
+            grid[flowers] = rng.choice(self._flower_ids, size=int(flowers.sum()))
+        if (cx, cy) == (0, 0):
+            grid[:4, :4] = self._grass_id  # keep the spawn point clear
+        return grid, np.zeros((CHUNK_TILES, CHUNK_TILES), dtype=np.uint8)
+
+    def _produce(self, key):
+        data = self.store.get(*key)
+        if data is None:
+            grid, flags = self.generate(*key)
+            return key, grid, flags, [], self.tick
+        stored_tick, itemsize = STORE_HEAD.unpack_from(data, 0)
+        grid, flags, crops = decode_chunk(data[STORE_HEAD.size:], itemsize)
+        return key, grid.astype(self.palette.dtype()), flags.copy(), crops, stored_tick
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            kind, key, token = job
+            if kind == 'write':
+                self.store.flush(*key)
+            else:
+                self._ready.put((token, self._produce(key)))
+
+    def _install(self, key, grid, flags, crops, stored_tick):
+        if key in self.chunks:
+            return self.chunks[key]  # already loaded synchronously
+        chunk = WorldChunk(self, key[0], key[1], grid, flags)
+        self.chunks[key] = chunk
+        self._touch_chunks((key,))
+        # this chunk's variants, and the edges of loaded neighbours that touch it
+        self.autotile(chunk.c0 - 1, chunk.r0 - 1, chunk.c0 + CHUNK_TILES + 1, chunk.r0 + CHUNK_TILES + 1)
+        if key in self._placeholders:
+            self._placeholders.discard(key)
+            self.damage_all = True
+        # crops grew while the chunk was stored
+        elapsed = max(0, self.tick - stored_tick)
+        for lc, lr, type_index, stage, progress in crops:
+            self._add_crop(chunk, chunk.c0 + lc, chunk.r0 + lr, self.crop_types[type_index], stage, progress + elapsed)
+        return chunk
+
+    def _integrate(self):
+        """Install chunks the worker has finished."""
+        while True:
+            try:
+                token, result = self._ready.get_nowait()
+            except queue.Empty:
+                return
+            key = result[0]
+            if self._requested.get(key) == token:
+                del self._requested[key]
+                self._install(*result)
+
+    def request_rect(self, rect):
+        """Queue every chunk overlapping rect (world pixels) that isn't loaded yet."""
+        for key in self.chunk_keys(rect):
+            if key not in self.chunks and key not in self._requested:
+                token = self._requested[key] = next(self._tokens)
+                if self._thread is None:
+                    self._ready.put((token, self._produce(key)))
+                else:
+                    self._jobs.put(('load', key, token))
+
+    def chunk_keys(self, rect):
+        """(cx, cy) of the chunks overlapping rect (world pixels), loaded or not."""
+        chunk_w = CHUNK_TILES * self.tile_w
+        chunk_h = CHUNK_TILES * self.tile_h
+        for cy in range(rect.top // chunk_h, (rect.bottom - 1) // chunk_h + 1):
+            for cx in range(rect.left // chunk_w, (rect.right - 1) // chunk_w + 1):
+                yield cx, cy
+
+    def chunk(self, cx, cy):
+        """The chunk (cx, cy), loaded on this thread if the worker hasn't delivered it yet."""
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            self._integrate()
+            chunk = self.chunks.get((cx, cy))
+            if chunk is None:
+                self._requested.pop((cx, cy), None)  # whatever the worker returns is stale now
+                chunk = self._install(*self._produce((cx, cy)))
+        return chunk
+
+    # Paging out
+
+    def memory_used(self):
+        """Estimated bytes held by loaded chunks."""
+        return sum(chunk.nbytes() for chunk in self.chunks.values())
+
+    def _evict(self, keep):
+        used = self.memory_used()
+        for key in list(self.chunks):
+            if used <= self.memory_budget:
+                return
+            if key not in keep:
+                used -= self.chunks[key].nbytes()
+                self.unload(*key)
+
+    def _store_chunk(self, chunk):
+        crop_types = {name: i for i, name in enumerate(self.crop_types)}
+        record = encode_chunk(chunk, chunk.cx, chunk.cy, crop_types)
+        if len(crop_types) > len(self.crop_types):
+            self.crop_types = sorted(crop_types, key=crop_types.get)
+        self.store.put(chunk.cx, chunk.cy, STORE_HEAD.pack(self.tick, chunk.grid.itemsize) + record)
+        if self._thread is None:
+            self.store.flush(chunk.cx, chunk.cy)
+        else:
+            self._jobs.put(('write', (chunk.cx, chunk.cy), None))
+
+    def unload(self, cx, cy):
+        """Drop a loaded chunk, storing it first if it was changed."""
+        chunk = self.chunks.pop((cx, cy), None)
+        if chunk is None:
+            return
+        if chunk.modified:
+            self._store_chunk(chunk)
+
+    def flush(self):
+        """Store every changed chunk and the world meta (e.g. on quit); chunks stay loaded."""
+        for chunk in self.chunks.values():
+            if chunk.modified:
+                self._store_chunk(chunk)
+                chunk.modified = False
+        self.store.save_meta({'seed': self.seed, 'tick': self.tick,
+                              'palette': [tile.name for tile in self.palette.tiles],
+                              'crop_types': self.crop_types})
+
+    def close(self):
+        """Flush and stop the worker once its queued writes are done."""
+        self.flush()
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join()
+            self._thread = None
+
+    # Simulation and drawing
+
+    def update(self, dt):
+        """Advance crop growth by one tick and pick up chunks the worker has finished."""
+        self.tick += 1
+        self._integrate()
+        queue_ = self._growth_queue
+        while queue_ and queue_[0][0] <= self.tick:
+            _, _, crop = heapq.heappop(queue_)
+            chunk = self.chunks.get(self.chunk_of(*crop.tile))
+            if chunk is None or chunk.crops.get(crop.tile) is not crop:
+                continue  # harvested, or paged out since it was scheduled
+            crop.update(self.tick)
+            self.damage(*crop.tile)
+            self._schedule_growth(crop)
+
+    def _bake(self, chunk, rows=CHUNK_TILES):
+        """Draw up to rows more tile rows of chunk's ground surface; returns the rows drawn."""
+        if chunk.surface is None:
+            chunk.surface = pygame.Surface((CHUNK_TILES * self.tile_w, CHUNK_TILES * self.tile_h)).convert()
+        start = chunk.baked_rows
+        end = min(CHUNK_TILES, start + rows)
+        chunk.surface.fill(GROUND_FILL, (0, start * self.tile_h, CHUNK_TILES * self.tile_w, (end - start) * self.tile_h))
+        soil = self._soil_surface
+        rows = zip(chunk.grid[start:end].tolist(), chunk.variants[start:end].tolist())
+        for r, (row, drawn) in enumerate(rows, start):
+            for c, (tid, vid) in enumerate(zip(row, drawn)):
+                self._draw_tile(chunk.surface, vid, (c * self.tile_w, r * self.tile_h), soil if vid != tid else None)
+        chunk.baked_rows = end
+        return end - start
+
+    def _chunk_tiles(self, cx, cy):
+        # for bake_level: only chunks already loaded, zooming out doesn't page more in
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            return None
+        return chunk.grid, chunk.variants, chunk.c0, chunk.r0
+
+    def _redraw_tile(self, chunk, lr, lc):
+        if lr < chunk.baked_rows:  # rows not baked yet will pick it up
+            dest = (lc * self.tile_w, lr * self.tile_h)
+            chunk.surface.fill(GROUND_FILL, pygame.Rect(dest, (self.tile_w, self.tile_h)))
+            tid, vid = chunk.grid[lr, lc], chunk.variants[lr, lc]
+            self._draw_tile(chunk.surface, vid, dest, self._soil_surface if vid != tid else None)
+
+    def _overlaps(self, c0, r0, c1, r1):
+        # (chunk, rows, cols of the tile rect, rows, cols of the chunk) for loaded chunks in the rect
+        for cy in range(r0 // CHUNK_TILES, (r1 - 1) // CHUNK_TILES + 1):
+            for cx in range(c0 // CHUNK_TILES, (c1 - 1) // CHUNK_TILES + 1):
+                chunk = self.chunks.get((cx, cy))
+                if chunk is not None:
+                    tr0, tr1 = max(r0, chunk.r0), min(r1, chunk.r0 + CHUNK_TILES)
+                    tc0, tc1 = max(c0, chunk.c0), min(c1, chunk.c0 + CHUNK_TILES)
+                    yield (chunk, slice(tr0 - r0, tr1 - r0), slice(tc0 - c0, tc1 - c0),
+                           slice(tr0 - chunk.r0, tr1 - chunk.r0), slice(tc0 - chunk.c0, tc1 - chunk.c0))
+
+    def autotile(self, c0, r0, c1, r1):
+        """
+        Re-resolve the drawn variants of loaded tiles in [c0, c1) x [r0, r1); chunks that aren't
+        loaded count as grass. Returns the (col, row) tiles whose variant changed.
+        """
+        padded = np.full((r1 - r0 + 2, c1 - c0 + 2), self.autotiler.base_id, dtype=self.palette.dtype())
+        for chunk, rows, cols, lrows, lcols in self._overlaps(c0 - 1, r0 - 1, c1 + 1, r1 + 1):
+            padded[rows, cols] = chunk.grid[lrows, lcols]
+        resolved = self.autotiler.resolve(padded)
+        changed = []
+        for chunk, rows, cols, lrows, lcols in self._overlaps(c0, r0, c1, r1):
+            drawn = chunk.variants[lrows, lcols]
+            for lr, lc in zip(*np.nonzero(resolved[rows, cols] != drawn)):
+                lr, lc = int(lr) + lrows.start, int(lc) + lcols.start
+                chunk.variants[lr, lc] = resolved[chunk.r0 + lr - r0, chunk.c0 + lc - c0]
+                self._redraw_tile(chunk, lr, lc)
+                self.damage(chunk.c0 + lc, chunk.r0 + lr)
+                changed.append((chunk.c0 + lc, chunk.r0 + lr))
+        return changed
+
+    def stream(self, view, bake_rows=4):
+        """
+        Per-frame paging around view (world rect): request the chunks near it, install the
+        ones the worker finished, pre-bake those about to scroll in (nearest first, bake_rows
+        tile rows per call) and evict past the memory budget. draw() calls this; callers that
+        draw through draw_ground/draw_objects call it once per frame themselves.
+        """
+        ahead = view.inflate(self.prefetch * 2, self.prefetch * 2)
+        self.request_rect(ahead)
+        self._integrate()
+
+        chunk_w = CHUNK_TILES * self.tile_w
+        chunk_h = CHUNK_TILES * self.tile_h
+        keep = set(self.chunk_keys(ahead))
+        cx, cy = view.center
+        pending = [self.chunks[key] for key in keep
+                   if key in self.chunks and self.chunks[key].baked_rows < CHUNK_TILES]
+        pending.sort(key=lambda ch: abs((ch.cx + 0.5) * chunk_w - cx) + abs((ch.cy + 0.5) * chunk_h - cy))
+        for chunk in pending:
+            if bake_rows <= 0:
+                break
+            bake_rows -= self._bake(chunk, bake_rows)
+            self.chunks.move_to_end((chunk.cx, chunk.cy))
+        self._evict(keep)
+
+    def draw(self, surface, camera, highlight_pos=None):
+        view = camera.world_view_rect()
+        self.stream(view)
+        if getattr(camera, 'zoom', 1.0) != 1.0:
+            self.draw_zoomed(surface, camera, highlight_pos)
+            return
+        self.draw_ground(surface, view)
+        self.draw_objects(surface, view, highlight_pos)
+
+    def draw_ground(self, surface, cam_rect, area=None, fallback=None):
+        """
+        Blit the ground under area (world rect, default the view). Chunks the worker hasn't
+        delivered yet are drawn as plain ground and damaged once they arrive; for ones not
+        fully baked yet fallback(cx, cy) is asked first, as in TileMap.draw_ground.
+        """
+        area = cam_rect if area is None else area
+        chunk_w = CHUNK_TILES * self.tile_w
+        chunk_h = CHUNK_TILES * self.tile_h
+        clip = surface.get_clip()
+        surface.set_clip(area.move(-cam_rect.left, -cam_rect.top).clip(clip))
+        for key in self.chunk_keys(area):
+            dest = (key[0] * chunk_w - cam_rect.left, key[1] * chunk_h - cam_rect.top)
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                surface.fill(GROUND_FILL, pygame.Rect(dest, (chunk_w, chunk_h)))
+                self._placeholders.add(key)
+                continue
+            self.chunks.move_to_end(key)
+            if chunk.baked_rows < CHUNK_TILES:
+                stand_in = fallback(*key) if fallback is not None else None
+                if stand_in is not None:
+                    surface.blit(stand_in, dest)
+                    continue
+                self._bake(chunk)  # in view already: prefetch didn't get to it in time
+            surface.blit(chunk.surface, dest)
+        surface.set_clip(clip)
+
+    def draw_objects(self, surface, cam_rect, highlight_pos=None, area=None):
+        """Draw crops and trees overlapping area (world rect, default the view) and the tile highlight."""
+        queue = RenderQueue()
+        queue.begin(cam_rect)
+        self.submit_objects(queue, area)
+        queue.draw_world(surface, area)
+        self.draw_highlight(surface, cam_rect, highlight_pos)
+
+    def submit_objects(self, queue, area=None):
+        """Submit the crops and upright tiles (trees) of loaded chunks overlapping area (default the queue's view)."""
+        area = queue.view if area is None else area
+        queue.submit_many((crop.image, crop.rect.x, crop.rect.y, None) for crop in self.crops_in_rect(area))
+        c0, r0 = area.left // self.tile_w, area.top // self.tile_h
+        c1, r1 = (area.right - 1) // self.tile_w + 1, (area.bottom - 1) // self.tile_h + 1
+        for chunk, _, _, lrows, lcols in self._overlaps(c0, r0, c1, r1):
+            self._submit_upright(queue, chunk.grid[lrows, lcols], chunk.c0 + lcols.start, chunk.r0 + lrows.start)
+
+    def blocked(self, c0, r0, c1, r1):
+        """True if any loaded tile in [c0, c1) x [r0, r1) is solid (the world has no edge)."""
+        for chunk, _, _, lrows, lcols in self._overlaps(c0, r0, c1, r1):
+            if chunk.solid[lrows, lcols].any():
+                return True
+        return False
+
+    def draw_highlight(self, surface, cam_rect, highlight_pos):
+        if highlight_pos:
+            pygame.draw.rect(surface, (255, 255, 0), self.highlight_rect(highlight_pos, cam_rect), 3)
+
+    # Tile and crop API, as on TileMap
+
+    def _cell(self, c, r):
+        chunk = self.chunk(c // CHUNK_TILES, r // CHUNK_TILES)
+        return chunk, r - chunk.r0, c - chunk.c0
+
+    def tile_name(self, c, r):
+        chunk, lr, lc = self._cell(c, r)
+        return self.palette.name_of(chunk.grid[lr, lc])
+
+    def set_tile(self, c, r, tile_type):
+        chunk, lr, lc = self._cell(c, r)
+        if isinstance(tile_type, str):
+            tile_type = self.palette.id_of(tile_type)
+            if chunk.grid.dtype != self.palette.dtype():
+                for loaded in self.chunks.values():
+                    loaded.grid = loaded.grid.astype(self.palette.dtype())
+                    loaded.variants = loaded.variants.astype(self.palette.dtype())
+        chunk.grid[lr, lc] = tile_type
+        chunk.solid[lr, lc] = self.palette.solid[tile_type]
+        chunk.modified = True
+        # redraws just the tiles whose look changed, this one included
+        if (c, r) not in self.autotile(c - 1, r - 1, c + 2, r + 2):
+            self._redraw_tile(chunk, lr, lc)
+            self.damage(c, r)
+        return True
+
+    def is_tillable(self, c, r):
+        chunk, lr, lc = self._cell(c, r)
+        return bool(self.palette.tillable[chunk.grid[lr, lc]])
+
+    def is_tilled(self, c, r):
+        chunk, lr, lc = self._cell(c, r)
+        return bool(chunk.flags[lr, lc] & FLAG_TILLED)
+
+    def till(self, c, r):
+        if self.is_tillable(c, r):
+            self.set_tile(c, r, self.palette.id_of('dirt'))
+            chunk, lr, lc = self._cell(c, r)
+            chunk.flags[lr, lc] |= FLAG_TILLED
+            return True
+        return False
+
+    def count_tilled(self):
+        return sum(int(np.count_nonzero(chunk.flags & FLAG_TILLED)) for chunk in self.chunks.values())
+
+    def crop_at(self, c, r):
+        return self.chunk(c // CHUNK_TILES, r // CHUNK_TILES).crops.get((c, r))
+
+    def crop_count(self):
+        return sum(len(chunk.crops) for chunk in self.chunks.values())
+
+    def crops_in_rect(self, rect):
+        found = []
+        for key in self.chunk_keys(rect):
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                found.extend(crop for crop in chunk.crops.values() if crop.rect.colliderect(rect))
+        return found
+
+    def state_hash(self, crc=0):
+        """CRC32 of the loaded chunks (tiles, flags, crops) and the tick chained onto crc; see engine.replay."""
+        for key in sorted(self.chunks):
+            chunk = self.chunks[key]
+            crc = zlib.crc32(struct.pack('<ii', *key), crc)
+            crc = zlib.crc32(chunk.grid.tobytes(), crc)
+            crc = zlib.crc32(chunk.flags.tobytes(), crc)
+            crops = sorted((c, r, crop.crop_type, crop.planted_tick, crop.stage)
+                           for (c, r), crop in chunk.crops.items())
+            crc = zlib.crc32(repr(crops).encode(), crc)
+        return zlib.crc32(str(self.tick).encode(), crc)
+
+    def _add_crop(self, chunk, c, r, crop_type, stage, progress):
+        wx, wy = self.tile_to_world(c, r)
+        crop = Crop(wx, wy, crop_type, frame_w=self.tile_w // 2, frame_h=self.tile_h // 2)
+        crop.planted_tick = self.tick - stage * crop.growth_speed - progress
+        crop.update(self.tick)
+        crop.tile = (c, r)
+        chunk.crops[(c, r)] = crop
+        self._schedule_growth(crop)
+        return crop
+
+    def plant(self, c, r, crop_type):
+        return self.is_tilled(c, r) and self.restore_crop(c, r, crop_type)
+
+    def restore_crop(self, c, r, crop_type, stage=0, progress=0):
+        chunk = self.chunk(c // CHUNK_TILES, r // CHUNK_TILES)
+        if (c, r) in chunk.crops:
+            return False
+        self._add_crop(chunk, c, r, crop_type, stage, progress)
+        chunk.modified = True
+        self.damage(c, r)
+        return True
+
+    def remove_crop(self, c, r):
+        chunk = self.chunk(c // CHUNK_TILES, r // CHUNK_TILES)
+        crop = chunk.crops.pop((c, r), None)
+        if crop is None:
+            return None
+        chunk.modified = True
+        self.damage(c, r)
+        return crop.crop_type
+
+    def harvest(self, c, r):
+        crop = self.crop_at(c, r)
+        if crop is None or not crop.is_ripe():
+            return None
+        return self.remove_crop(c, r)
+
+    # Area operations, as on TileMap
+
+    def _rect_chunks(self, c0, r0, c1, r1):
+        # overlaps of the tile rect with its chunks, loading them here if need be
+        for cy in range(r0 // CHUNK_TILES, (r1 - 1) // CHUNK_TILES + 1):
+            for cx in range(c0 // CHUNK_TILES, (c1 - 1) // CHUNK_TILES + 1):
+                self.chunk(cx, cy)
+        return list(self._overlaps(c0, r0, c1, r1))
+
+    def till_rect(self, c0, r0, c1, r1):
+        if c1 <= c0 or r1 <= r0:
+            return 0
+        dirt = self.palette.id_of('dirt')
+        tilled = 0
+        for chunk, _, _, lrows, lcols in self._rect_chunks(c0, r0, c1, r1):
+            mask = self.palette.tillable[chunk.grid[lrows, lcols]]
+            n = int(np.count_nonzero(mask))
+            if n:
+                chunk.grid[lrows, lcols][mask] = dirt
+                chunk.solid[lrows, lcols][mask] = self.palette.solid[dirt]
+                chunk.flags[lrows, lcols][mask] |= FLAG_TILLED
+                chunk.modified = True
+                # re-bake from the first changed row instead of redrawing tile by tile
+                chunk.baked_rows = min(chunk.baked_rows, lrows.start)
+                tilled += n
+        if tilled:
+            self.autotile(c0 - 1, r0 - 1, c1 + 1, r1 + 1)  # also damages the tilled tiles
+        return tilled
+
+    def plant_rect(self, c0, r0, c1, r1, crop_type, limit=None):
+        if c1 <= c0 or r1 <= r0:
+            return 0
+        free = []
+        for chunk, _, _, lrows, lcols in self._rect_chunks(c0, r0, c1, r1):
+            rows, cols = np.nonzero(chunk.flags[lrows, lcols] & FLAG_TILLED)
+            rows = (rows + chunk.r0 + lrows.start).tolist()
+            cols = (cols + chunk.c0 + lcols.start).tolist()
+            free.extend((r, c, chunk) for r, c in zip(rows, cols) if (c, r) not in chunk.crops)
+        free.sort(key=lambda tile: tile[:2])  # row by row across chunks, like TileMap
+        if limit is not None:
+            free = free[:max(0, int(limit))]
+        for r, c, chunk in free:
+            self._add_crop(chunk, c, r, crop_type, 0, 0)
+            chunk.modified = True
+            self.damage(c, r)
+        return len(free)
+
+    def harvest_rect(self, c0, r0, c1, r1):
+        if c1 <= c0 or r1 <= r0:
+            return {}
+        harvested = {}
+        for chunk, _, _, _, _ in self._rect_chunks(c0, r0, c1, r1):
+            ripe = [tile for tile, crop in chunk.crops.items()
+                    if c0 <= tile[0] < c1 and r0 <= tile[1] < r1 and crop.is_ripe()]
+            for tile in ripe:
+                crop_type = chunk.crops.pop(tile).crop_type
+                harvested[crop_type] = harvested.get(crop_type, 0) + 1
+                self.damage(*tile)
+            if ripe:
+                chunk.modified = True
+        return harvested
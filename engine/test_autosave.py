@@ -0,0 +1,121 @@
+import os
+
+import pytest
+
+from . import autosave as autosave_module
+from .autosave import Autosave, WorldSnapshot
+from .savefile import load_world, save_world
+from .tilemap import TileMap
+
+
+def _farm(use_crop_field=False):
+    tilemap = TileMap(40 * 64, 40 * 64, use_crop_field=use_crop_field)
+    for c in range(5, 15):
+        tilemap.till(c, 5)
+        tilemap.plant(c, 5, 'carrot')
+    for _ in range(200):
+        tilemap.update(1 / 60)
+    return tilemap
+
+
+def _state(tilemap):
+    tilemap.load_all_chunks()
+    return (tilemap.map, sorted(tilemap.tilled), sorted(tilemap.crop_states(0, 0, tilemap.cols, tilemap.rows)))
+
+
+@pytest.mark.parametrize("use_crop_field", [False, True])
+def test_snapshot_keeps_the_state_it_was_taken_at(tmp_path, display, use_crop_field):
+    tilemap = _farm(use_crop_field)
+    expected = _state(tilemap)
+    snapshot = WorldSnapshot(tilemap)
+    tilemap.snapshots = tilemap.snapshots + (snapshot,)
+
+    # the game keeps going while the snapshot waits to be written
+    tilemap.set_tile(20, 20, 'tree')
+    tilemap.till(6, 6)
+    tilemap.remove_crop(5, 5)
+    tilemap.plant(6, 6, 'tomato')
+    for _ in range(200):
+        tilemap.update(1 / 60)
+
+    path = str(tmp_path / "farm.sdv")
+    snapshot.write(path)
+    loaded, meta = load_world(path)
+    assert meta['tick'] == 200
+    assert _state(loaded) == expected
+
+
+def test_autosave_in_the_background_while_the_map_changes(tmp_path, display):
+    tilemap = _farm()
+    path = str(tmp_path / "farm.sdv")
+    autosave = Autosave(path, tilemap, interval=0)
+    autosave.request()
+    autosave.update(1 / 60)
+    expected = _state(tilemap)
+    assert autosave.busy()
+    for c in range(5, 15):
+        tilemap.harvest(c, 5)
+        tilemap.till(c, 8)
+    autosave.close()
+
+    assert autosave.saves == 1 and autosave.last_error is None
+    assert tilemap.snapshots == ()
+    assert tilemap.save_path == path
+    loaded, _ = load_world(path)
+    assert _state(loaded) == expected
+
+
+def test_autosave_over_the_file_pending_chunks_are_read_from(tmp_path, display):
+    tilemap = _farm()
+    path = str(tmp_path / "farm.sdv")
+    save_world(path, tilemap)
+    loaded, _ = load_world(path, center=(0, 0), radius=0)
+    old_file = loaded.save_file
+    loaded.till(3, 10)
+
+    autosave = Autosave(path, loaded, interval=0)
+    autosave.save_now()
+    autosave.close()
+    assert autosave.last_error is None
+    assert loaded._unloaded  # nothing was loaded just to be able to save
+    # the old mapping is closed before the rename; pending chunks now come from the new file
+    assert loaded.save_file is not old_file and old_file._mm is None
+    assert not os.path.exists(path + '.tmp')
+    tilemap.till(3, 10)
+    assert _state(loaded) == _state(tilemap)
+    assert _state(load_world(path)[0]) == _state(tilemap)
+
+
+def test_failed_write_leaves_the_previous_save(tmp_path, display, monkeypatch, caplog):
+    tilemap = _farm()
+    path = str(tmp_path / "farm.sdv")
+    autosave = Autosave(path, tilemap, interval=0)
+    autosave.save_now()
+    with open(path, 'rb') as f:
+        before = f.read()
+
+    tilemap.set_tile(20, 20, 'tree')
+    written = []
+
+    def failing_encode(*args):
+        if written:
+            raise OSError("disk full")
+        written.append(args)
+        return encode_chunk(*args)
+
+    encode_chunk = autosave_module.encode_chunk
+    monkeypatch.setattr(autosave_module, 'encode_chunk', failing_encode)
+    autosave.save_now()
+    assert isinstance(autosave.last_error, OSError)
+    assert "disk full" in caplog.text
+    with open(path, 'rb') as f:
+        assert f.read() == before
+    # the changed chunk is saved again next time
+    assert tilemap.chunk_of(20, 20) in tilemap.save_dirty
+
+    monkeypatch.setattr(autosave_module, 'encode_chunk', encode_chunk)
+    autosave.save_now()
+    autosave.close()
+    assert autosave.last_error is None
+    loaded, _ = load_world(path)
+    assert loaded.tile_name(20, 20) == 'tree'
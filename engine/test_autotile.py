@@ -0,0 +1,43 @@
+import random
+
+import numpy as np
+
+from .autotile import NEIGHBOURS, Autotiler, variant_name
+from .tiles import TilePalette
+
+
+def test_lookup_table_matches_variant_name():
+    palette = TilePalette()
+    autotiler = Autotiler(palette)
+    for mask in range(256):
+        assert autotiler.lut[mask] == palette.id_of(variant_name(mask))
+
+
+def test_resolve_matches_a_cell_by_cell_lookup():
+    palette = TilePalette()
+    autotiler = Autotiler(palette)
+    grass, dirt, tree = palette.id_of('grass'), palette.id_of('dirt'), palette.id_of('tree')
+    rng = random.Random(3)
+    padded = np.array([[rng.choice((grass, grass, dirt, tree)) for _ in range(22)] for _ in range(18)],
+                      dtype=palette.dtype())
+
+    resolved = autotiler.resolve(padded)
+    assert resolved.shape == (16, 20)
+    for r in range(16):
+        for c in range(20):
+            tid = padded[r + 1, c + 1]
+            if tid != grass:
+                assert resolved[r, c] == tid
+                continue
+            mask = 0
+            for bit, dr, dc in NEIGHBOURS:
+                if padded[r + 1 + dr, c + 1 + dc] == dirt:
+                    mask |= bit
+            assert resolved[r, c] == palette.id_of(variant_name(mask))
+
+
+def test_variant_names_for_single_soil_neighbours():
+    assert variant_name(0) == 'grass'
+    assert variant_name(1 << 4) == 'down'
+    assert variant_name(1 << 0) == 'up'
+    assert variant_name(1 << 7) == 'corner_northwest'
@@ -0,0 +1,38 @@
+import math
+import random
+
+from .collision import sweep
+from .tilemap import TileMap
+
+
+def _overlapped(tilemap, left, top, right, bottom):
+    # tile rect (c0, r0, c1, r1) touched by the box spanning [left, right) x [top, bottom)
+    tw, th = tilemap.tile_w, tilemap.tile_h
+    return math.floor(left / tw), math.floor(top / th), math.ceil(right / tw), math.ceil(bottom / th)
+
+
+def test_random_sweeps_never_pass_through_solid_tiles(display):
+    rng = random.Random(7)
+    tilemap = TileMap(30 * 64, 30 * 64)
+    for _ in range(120):
+        tilemap.set_tile(rng.randrange(1, 29), rng.randrange(1, 29), 'tree')
+    w, h = 24, 14
+
+    checked = 0
+    while checked < 2000:
+        x, y = rng.uniform(0, 29 * 64), rng.uniform(0, 29 * 64)
+        if tilemap.blocked(*_overlapped(tilemap, x, y, x + w, y + h)):
+            continue
+        dx, dy = sweep(tilemap, x, y, w, h, rng.uniform(-200, 200), rng.uniform(-200, 200))
+        # x first, then y from the new x: neither leg may cross a solid tile
+        assert not tilemap.blocked(*_overlapped(tilemap, min(x, x + dx), y, max(x, x + dx) + w, y + h))
+        x += dx
+        assert not tilemap.blocked(*_overlapped(tilemap, x, min(y, y + dy), x + w, max(y, y + dy) + h))
+        checked += 1
+
+
+def test_sweep_stops_flush_against_a_wall(display):
+    tilemap = TileMap(10 * 64, 10 * 64)
+    tilemap.set_tile(5, 2, 'tree')
+    dx, dy = sweep(tilemap, 200.5, 140.0, 24, 14, 300.0, 0.0)
+    assert (dx, dy) == (5 * 64 - (200.5 + 24), 0.0)
@@ -0,0 +1,90 @@
+import numpy as np
+import pygame
+import pytest
+
+from .cropfield import CROP_STAGES, CropField
+from .tilemap import TileMap
+
+
+def test_update_advances_stages_and_stops_when_ripe():
+    field = CropField(64, 64, growth_speed=10)
+    field.plant(1, 1, 'carrot')
+    field.plant(2, 1, 'tomato', stage=1, growth=5)
+    stages = []
+    for _ in range(30):
+        field.update()
+        stages.append((field.view(1, 1).stage, field.view(2, 1).stage))
+    assert stages[3] == (0, 1)
+    assert stages[4] == (0, 2)  # 5 ticks left in the second crop's stage
+    assert stages[9] == (1, 2)
+    assert stages[19] == (2, 2)
+    assert stages[-1] == (CROP_STAGES - 1, CROP_STAGES - 1)
+    assert field.is_ripe(1, 1) and field.is_ripe(2, 1)
+
+
+def test_update_by_several_ticks_matches_single_ticks():
+    stepped = CropField(64, 64, growth_speed=10)
+    jumped = CropField(64, 64, growth_speed=10)
+    for field in (stepped, jumped):
+        for c in range(5):
+            field.plant(c, 0, 'carrot', growth=c)
+    for _ in range(12):
+        stepped.update()
+    jumped.update(12)
+    n = stepped.count
+    assert stepped.stage[:n].tolist() == jumped.stage[:n].tolist()
+    assert stepped.growth[:n].tolist() == jumped.growth[:n].tolist()
+
+
+def test_remove_moves_the_last_crop_into_the_hole():
+    field = CropField(64, 64, capacity=2)
+    for c in range(5):
+        assert field.plant(c, 3, 'carrot' if c % 2 else 'tomato', stage=c % CROP_STAGES)
+    assert not field.plant(2, 3, 'carrot')
+    assert len(field) == 5
+
+    assert field.remove(1, 3) == 'carrot'
+    assert field.remove(1, 3) is None
+    assert len(field) == 4 and (1, 3) not in field
+    for c in (0, 2, 3, 4):
+        view = field.view(c, 3)
+        assert view.tile == (c, 3)
+        assert view.crop_type == ('carrot' if c % 2 else 'tomato')
+        assert view.stage == c % CROP_STAGES
+        i = field.index[(c, 3)]
+        assert (field.col[i], field.row[i]) == (c, 3)
+
+
+def test_slots_in_rect_culls_to_the_rect():
+    field = CropField(64, 64)
+    for c in range(10):
+        field.plant(c, c, 'carrot')
+    slots = field.slots_in_rect(pygame.Rect(2 * 64 + 10, 0, 3 * 64, 10 * 64))
+    assert sorted(int(field.col[i]) for i in slots) == [2, 3, 4, 5]
+
+
+def test_tilemap_crop_field_plants_only_on_tilled_tiles(display):
+    tilemap = TileMap(10 * 64, 10 * 64, use_crop_field=True)
+    assert not tilemap.plant(5, 5, 'carrot')
+    assert tilemap.till(5, 5)
+    assert tilemap.plant(5, 5, 'carrot')
+    assert not tilemap.plant(5, 5, 'tomato')
+    assert tilemap.crop_at(5, 5).crop_type == 'carrot'
+    assert [crop.tile for crop in tilemap.crops_in_rect(pygame.Rect(0, 0, 640, 640))] == [(5, 5)]
+    assert tilemap.remove_crop(5, 5) == 'carrot'
+    assert tilemap.crop_at(5, 5) is None
+
+
+def test_crop_types_past_255_keep_their_ids(monkeypatch):
+    from . import cropfield
+    monkeypatch.setattr(cropfield, 'CROP_TYPES', list(cropfield.CROP_TYPES))
+    monkeypatch.setattr(cropfield, 'CROP_IDS', dict(cropfield.CROP_IDS))
+    field = CropField(64, 64)
+    for i in range(300):
+        field.plant(i, 0, 'crop_%d' % i)
+    assert field.view(299, 0).crop_type == 'crop_299'
+    assert field.remove(260, 0) == 'crop_260'
+
+    monkeypatch.setattr(cropfield, 'TYPE_ID_DTYPE', np.uint8)
+    with pytest.raises(ValueError):
+        cropfield.crop_type_id('one_too_many')
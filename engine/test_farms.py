@@ -0,0 +1,16 @@
+from .assets import is_headless
+from .farms import run_farms
+
+ACTIONS = [
+    {"tick": 0, "do": "till_rect", "rect": [5, 5, 9, 7]},
+    {"tick": 0, "do": "plant_rect", "rect": [5, 5, 9, 7], "item": "carrot_seed"},
+]
+
+
+def test_in_process_farms_leave_the_headless_flag_as_it_was():
+    assert not is_headless()
+    results = run_farms([{"name": "a", "world": [640, 640], "actions": ACTIONS, "days": 0.1},
+                         {"name": "b", "world": [640, 640], "predefined_map": [[1, 2]]}], workers=1)
+    assert not is_headless()
+    assert results[0]['name'] == "a" and results[0]['tilled_tiles'] == 8 and results[0]['planted'] == 5
+    assert results[1]['name'] == "b" and 'error' in results[1]
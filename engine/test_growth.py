@@ -0,0 +1,62 @@
+from .tilemap import TileMap
+
+
+def _planted(tiles, crop_type='carrot'):
+    tilemap = TileMap(20 * 64, 20 * 64)
+    for c, r in tiles:
+        assert tilemap.till(c, r)
+        assert tilemap.plant(c, r, crop_type)
+    return tilemap
+
+
+def test_stages_change_on_the_boundary_ticks(display):
+    tilemap = _planted([(5, 5)])
+    crop = tilemap.crop_at(5, 5)
+    for _ in range(50):
+        tilemap.update(1 / 60)
+    assert tilemap.plant(6, 5, 'tomato') is False  # not tilled
+    tilemap.till(6, 5)
+    tilemap.plant(6, 5, 'tomato')
+    late = tilemap.crop_at(6, 5)
+
+    seen = []
+    for _ in range(400):
+        tilemap.update(1 / 60)
+        seen.append((tilemap.tick, crop.stage, late.stage))
+    speed = crop.growth_speed
+    ripe = len(crop.frames) - 1
+    for tick, stage, late_stage in seen:
+        assert stage == min(ripe, tick // speed)
+        assert late_stage == min(ripe, (tick - 50) // speed)
+    assert crop.is_ripe() and late.is_ripe()
+    assert crop.next_stage_tick() is None
+
+
+def test_only_due_crops_are_woken(display, monkeypatch):
+    tilemap = _planted([(c, 5) for c in range(5, 15)])
+    woken = []
+    for crop in tilemap.crops:
+        original = crop.update
+        monkeypatch.setattr(crop, 'update', lambda tick, crop=crop, original=original: (woken.append(tick), original(tick)))
+
+    for _ in range(500):
+        tilemap.update(1 / 60)
+    speed = next(iter(tilemap.crops)).growth_speed
+    # each crop is woken once per stage change and never again once ripe
+    assert sorted(woken) == sorted([speed] * 10 + [2 * speed] * 10)
+    assert tilemap._growth_queue == []
+
+
+def test_removed_crops_are_dropped_from_the_queue(display):
+    tilemap = _planted([(5, 5), (6, 5)])
+    removed = tilemap.crop_at(5, 5)
+    assert tilemap.remove_crop(5, 5) == 'carrot'
+    # a new crop on the same tile must not inherit the old schedule
+    for _ in range(60):
+        tilemap.update(1 / 60)
+    tilemap.plant(5, 5, 'tomato')
+    replanted = tilemap.crop_at(5, 5)
+    for _ in range(200):
+        tilemap.update(1 / 60)
+    assert removed.stage == 0
+    assert replanted.stage == 1 and tilemap.crop_at(6, 5).stage == 2
@@ -0,0 +1,99 @@
+import random
+
+import pygame
+
+from .camera import Camera
+from .inventory import Inventory
+from .player import Player
+from .replay import FrameInput, InputRecorder, ReplayInput, state_hash
+from .simulation import Simulation
+from .tilemap import TileMap
+
+FRAMES = 400
+
+
+class _Game:
+    """The parts of main.py's loop the state hash covers, driven by FrameInput."""
+    def __init__(self):
+        self.tilemap = TileMap(1600, 1600)
+        self.player = Player(100, 100)
+        self.player.collision_map = self.tilemap
+        self.inventory = Inventory(slot_count=8)
+        self.inventory.add_item("carrot_seed", 5)
+        self.camera = Camera(800, 600, 1600, 1600)
+        self.simulation = Simulation(tick_rate=60)
+        self.simulation.add_system(self.player.update)
+        self.simulation.add_system(self.tilemap.update)
+
+    def frame(self, frame):
+        for event in frame.events:
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                self.tilemap.till(*self.tilemap.world_to_tile(*self.player.rect.center))
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                if self.tilemap.plant(*self.tilemap.world_to_tile(*self.player.rect.center), 'carrot'):
+                    self.inventory.consume_selected(1)
+        self.player.handle_input(frame.keys, frame.dt)
+        alpha = self.simulation.advance(frame.dt)
+        self.camera.update(self.player.render_rect(alpha))
+        return state_hash(self.tilemap, self.player, self.inventory, self.simulation, self.camera)
+
+
+def _scripted_frames():
+    rng = random.Random(5)
+    arrows = (pygame.KSCAN_RIGHT, pygame.KSCAN_DOWN, pygame.KSCAN_LEFT, pygame.KSCAN_UP)
+    held = None
+    for i in range(FRAMES):
+        if i % 40 == 0:
+            held = rng.choice(arrows)
+        keys = [False] * 512
+        keys[held] = True
+        events = []
+        if i % 25 == 10:
+            events.append(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE, mod=0))
+        if i % 25 == 11:
+            events.append(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_p, mod=0))
+        # uneven frame times, as from a real clock
+        yield FrameInput(rng.uniform(0.010, 0.030), events, pygame.key.ScancodeWrapper(keys), 0, (400, 300))
+
+
+def test_replay_matches_the_recorded_hash_on_every_frame(tmp_path, display):
+    path = str(tmp_path / "run.sdvr")
+    recorder = InputRecorder(path, {'stream': False})
+    game = _Game()
+    for frame in _scripted_frames():
+        recorder.write(frame, game.frame(frame))
+    recorder.close()
+    assert recorder.frames == FRAMES
+    assert game.tilemap.count_tilled() > 0
+
+    replay = ReplayInput(path)
+    game = _Game()
+    while True:
+        frame = replay.next_frame()
+        if frame is None:
+            break
+        replay.end_frame(game.frame(frame))
+    replay.close()
+    assert replay.meta == {'stream': False}
+    assert len(replay.hashes) == FRAMES
+    assert replay.diverged_at is None
+
+
+def test_replay_reports_where_a_run_diverges(tmp_path, display):
+    path = str(tmp_path / "run.sdvr")
+    recorder = InputRecorder(path, {})
+    game = _Game()
+    for frame in _scripted_frames():
+        recorder.write(frame, game.frame(frame))
+    recorder.close()
+
+    replay = ReplayInput(path)
+    game = _Game()
+    game.player.speed *= 2  # a behaviour change the recording didn't have
+    while True:
+        frame = replay.next_frame()
+        if frame is None:
+            break
+        replay.end_frame(game.frame(frame))
+    replay.close()
+    assert replay.diverged_at is not None
@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pygame
+
+from .camera import Camera
+from .inventory import Inventory
+from .savefile import load_world, restore_inventory, save_world
+from .tilemap import TileMap
+
+
+def _farm():
+    tilemap = TileMap(40 * 64, 40 * 64)
+    for r in range(5, 20):
+        for c in range(5, 20):
+            tilemap.till(c, r)
+    for r in range(6, 12):
+        for c in range(6, 12):
+            tilemap.plant(c, r, 'carrot')
+    for r in range(6, 10):
+        for c in range(14, 18):
+            tilemap.plant(c, r, 'tomato')
+    for _ in range(900):
+        tilemap.update(1 / 60)
+    return tilemap
+
+
+def test_round_trip_keeps_tiles_crops_and_inventory(tmp_path, display):
+    tilemap = _farm()
+    inventory = Inventory(slot_count=8)
+    inventory.add_item("carrot_seed", 3)
+    path = str(tmp_path / "farm.sdv")
+    save_world(path, tilemap, inventory)
+
+    loaded, meta = load_world(path)
+    loaded.load_all_chunks()
+    assert loaded.count_tilled() == tilemap.count_tilled()
+    assert loaded.crop_count() == tilemap.crop_count()
+    assert loaded.tilled == tilemap.tilled
+    assert sorted(loaded.crop_states(0, 0, loaded.cols, loaded.rows)) == \
+        sorted(tilemap.crop_states(0, 0, tilemap.cols, tilemap.rows))
+    assert loaded.map == tilemap.map
+    restored = Inventory(slot_count=8)
+    restore_inventory(restored, meta)
+    assert restored.count("carrot_seed") == 3
+
+
+def test_saving_a_partly_loaded_world_over_its_own_file(tmp_path, display):
+    tilemap = _farm()
+    path = str(tmp_path / "farm.sdv")
+    save_world(path, tilemap)
+
+    loaded, _ = load_world(path, center=(10, 10), radius=0)
+    loaded.till(12, 12)
+    loaded.plant(12, 12, 'tomato')
+    save_world(path, loaded)  # chunks never touched are still only in the file being written
+    tilemap.till(12, 12)
+    tilemap.plant(12, 12, 'tomato')
+
+    reloaded, _ = load_world(path)
+    reloaded.load_all_chunks()
+    assert reloaded.tilled == tilemap.tilled
+    assert reloaded.map == tilemap.map
+    assert sorted(reloaded.crop_states(0, 0, 40, 40)) == sorted(tilemap.crop_states(0, 0, 40, 40))
+
+
+def test_resaving_encodes_only_the_changed_chunks(tmp_path, display):
+    tilemap = _farm()
+    for _ in range(300):
+        tilemap.update(1 / 60)  # everything ripe, nothing left growing
+    path = str(tmp_path / "farm.sdv")
+    assert save_world(path, tilemap) == tilemap.chunk_cols * tilemap.chunk_rows
+    assert save_world(path, tilemap) == 0
+
+    loaded, _ = load_world(path, center=(2, 2), radius=0)
+    loaded.till(30, 30)
+    assert save_world(path, loaded) == 1
+    assert not os.path.exists(path + '.tmp')
+    # chunks still pending are now read from the new file
+    loaded.load_all_chunks()
+    tilemap.till(30, 30)
+    assert loaded.tilled == tilemap.tilled
+    assert sorted(loaded.crop_states(0, 0, 40, 40)) == sorted(tilemap.crop_states(0, 0, 40, 40))
+
+
+def test_loaded_world_draws_like_the_saved_one(tmp_path, display):
+    tilemap = _farm()
+    path = str(tmp_path / "farm.sdv")
+    save_world(path, tilemap)
+    loaded, _ = load_world(path, center=(10, 10))
+
+    frames = []
+    for world in (tilemap, loaded):
+        camera = Camera(800, 600, world.cols * world.tile_w, world.rows * world.tile_h)
+        camera.update(pygame.Rect(12 * 64, 12 * 64, 64, 64))
+        surface = pygame.Surface((800, 600)).convert()
+        world.draw(surface, camera)
+        frames.append(pygame.image.tobytes(surface, 'RGB'))
+    assert frames[0] == frames[1]
+
+
+def test_wider_saved_grid_rebuilds_variants(tmp_path, display):
+    tilemap = _farm()
+    # a save written from a 16-bit grid loads into a palette that fits in 8 bits
+    tilemap.grid = tilemap.grid.astype(np.uint16)
+    tilemap.variants = tilemap.variants.astype(np.uint16)
+    path = str(tmp_path / "farm.sdv")
+    save_world(path, tilemap)
+
+    loaded, _ = load_world(path)
+    loaded.load_all_chunks()
+    assert loaded.variants.dtype == loaded.grid.dtype
+    assert np.array_equal(loaded.variants, tilemap.variants)
@@ -0,0 +1,68 @@
+import pygame
+
+from .camera import Camera
+from .streaming import StreamingTileMap
+from .tilemap import CHUNK_TILES
+
+CHUNK_PX = CHUNK_TILES * 64
+
+
+def _world(tmp_path, **kwargs):
+    return StreamingTileMap(seed=3, store_dir=str(tmp_path / "world"), threaded=False, prefetch=0, **kwargs)
+
+
+def _look_at(world, camera, surface, cx, cy):
+    camera.update(pygame.Rect(cx * CHUNK_PX + CHUNK_PX // 2, cy * CHUNK_PX + CHUNK_PX // 2, 1, 1))
+    world.draw(surface, camera)
+    world.draw(surface, camera)  # the first draw only requests the chunks
+
+
+def test_least_recently_drawn_chunks_are_evicted_first(tmp_path, display):
+    world = _world(tmp_path)
+    camera = Camera(CHUNK_PX // 2, CHUNK_PX // 2)
+    surface = pygame.Surface((CHUNK_PX // 2, CHUNK_PX // 2)).convert()
+    _look_at(world, camera, surface, 0, 0)
+    world.memory_budget = world.memory_used() * 3  # room for three chunks
+
+    for cx in range(1, 6):
+        _look_at(world, camera, surface, cx, 0)
+        assert world.memory_used() <= world.memory_budget
+    assert list(world.chunks) == [(3, 0), (4, 0), (5, 0)]
+
+    _look_at(world, camera, surface, 3, 0)  # drawing a chunk makes it the most recent
+    _look_at(world, camera, surface, 6, 0)
+    assert list(world.chunks) == [(5, 0), (3, 0), (6, 0)]
+
+
+def test_chunks_in_view_are_kept_over_budget(tmp_path, display):
+    world = _world(tmp_path, memory_budget=0)
+    camera = Camera(800, 600)
+    surface = pygame.Surface((800, 600)).convert()
+    camera.update(pygame.Rect(0, 0, 1, 1))  # a chunk corner in the middle of the view
+    world.draw(surface, camera)
+    world.draw(surface, camera)
+    assert set(world.chunks) == {(-1, -1), (0, -1), (-1, 0), (0, 0)}
+
+
+def test_evicted_chunks_come_back_as_they_were_left(tmp_path, display):
+    world = _world(tmp_path)
+    untouched = world.chunk(2, 2).grid.copy()
+    world.till(1, 1)
+    world.plant(1, 1, 'carrot')
+    world.set_tile(20, 3, 'tree')
+    world.unload(0, 0)
+    world.unload(1, 0)
+    world.unload(2, 2)
+    assert not world.chunks
+
+    for _ in range(130):
+        world.update(1 / 60)  # the paged-out crop keeps growing
+    assert world.is_tilled(1, 1)
+    assert world.tile_name(20, 3) == 'tree'
+    assert world.crop_at(1, 1).stage == 1
+    assert (world.chunk(2, 2).grid == untouched).all()
+
+    world.close()
+    reopened = StreamingTileMap(store_dir=str(tmp_path / "world"), threaded=False)
+    assert reopened.seed == 3
+    assert reopened.is_tilled(1, 1) and reopened.crop_at(1, 1).crop_type == 'carrot'
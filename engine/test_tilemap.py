@@ -0,0 +1,38 @@
+import pygame
+
+from .tilemap import CHUNK_TILES, TileMap
+
+CHUNK_BYTES = (CHUNK_TILES * 64) ** 2 * 4
+
+
+def _ground(tilemap, view):
+    surface = pygame.Surface(view.size).convert()
+    tilemap.draw_ground(surface, view)
+    return pygame.image.tobytes(surface, 'RGB')
+
+
+def test_baked_chunks_stay_within_the_memory_budget(display):
+    capped = TileMap(96 * 64, 96 * 64, memory_budget=5 * CHUNK_BYTES)
+    uncapped = TileMap(96 * 64, 96 * 64, memory_budget=1 << 40)
+    for tilemap in (capped, uncapped):
+        tilemap.till(40, 40)
+        tilemap.set_tile(70, 10, 'tree')
+
+    for step in range(40):
+        view = pygame.Rect(step * 130, (step * 97) % (80 * 64), 800, 600)
+        assert _ground(capped, view) == _ground(uncapped, view)
+        assert capped.chunk_memory <= max(capped.memory_budget, 4 * CHUNK_BYTES)
+        in_view = {(cx, cy) for cx in range(view.left // 1024, min(6, (view.right - 1) // 1024 + 1))
+                   for cy in range(view.top // 1024, min(6, (view.bottom - 1) // 1024 + 1))}
+        assert in_view <= set(capped._chunks)
+    assert len(uncapped._chunks) > len(capped._chunks)
+
+
+def test_least_recently_drawn_chunks_go_first(display):
+    tilemap = TileMap(64 * 64, 64 * 64, memory_budget=3 * CHUNK_BYTES)
+    for cx in range(4):
+        _ground(tilemap, pygame.Rect(cx * 1024 + 100, 100, 800, 600))
+    assert list(tilemap._chunks) == [(1, 0), (2, 0), (3, 0)]
+    _ground(tilemap, pygame.Rect(1024 + 100, 100, 800, 600))
+    _ground(tilemap, pygame.Rect(100, 100, 800, 600))
+    assert list(tilemap._chunks) == [(3, 0), (1, 0), (0, 0)]
@@ -0,0 +1,117 @@
+import pygame
+
+from .camera import Camera
+from .render import RenderQueue
+from .streaming import StreamingTileMap
+from .tilemap import TileMap
+from .zoom import ZoomLayer
+
+VIEW_16 = pygame.Rect(0, 0, 800 * 16, 600 * 16)  # a 200x150 tile view seen at 1/16
+
+
+def _map():
+    tilemap = TileMap(128 * 64, 96 * 64)
+    for c in range(0, 128, 9):
+        tilemap.till(c, (c * 7) % 96)
+    return tilemap
+
+
+def _frame(layer, tilemap, view, zoom):
+    surface = pygame.Surface((800, 600)).convert()
+    queue = RenderQueue()
+    queue.begin(view)
+    layer.draw(surface, tilemap, view, zoom, queue)
+    return surface
+
+
+def _pixels(layer, tilemap, view, zoom):
+    return pygame.image.tobytes(_frame(layer, tilemap, view, zoom), 'RGB')
+
+
+def _count_bakes(tilemap):
+    bakes = []
+    bake_level = tilemap.bake_level
+
+    def counting(cx, cy, shift, images):
+        bakes.append((cx, cy, shift))
+        return bake_level(cx, cy, shift, images)
+    tilemap.bake_level = counting
+    return bakes
+
+
+def test_builds_are_capped_per_frame_and_catch_up(display):
+    tilemap = _map()
+    capped = ZoomLayer(build_ms=1e6, max_builds=3)
+    uncapped = ZoomLayer(build_ms=1e6, max_builds=1 << 30)
+    expected = _pixels(uncapped, tilemap, VIEW_16, 1 / 16)
+    assert uncapped.pending == 0 and uncapped.built == 48
+
+    frames = 0
+    while True:
+        frame = _pixels(capped, tilemap, VIEW_16, 1 / 16)
+        frames += 1
+        assert capped.built <= 3
+        if not capped.pending:
+            break
+    assert frames == 16
+    assert frame == expected
+
+
+def test_stale_levels_are_drawn_until_refreshed_a_few_a_frame(display):
+    tilemap = _map()
+    layer = ZoomLayer(build_ms=1e6, max_builds=2)
+    while layer.pending or not layer.levels:
+        _frame(layer, tilemap, VIEW_16, 1 / 16)
+    before = _pixels(layer, tilemap, VIEW_16, 1 / 16)
+
+    for cx in range(8):
+        tilemap.damage(cx * 16, 0)  # new stamps, same look
+    bakes = _count_bakes(tilemap)
+    assert _pixels(layer, tilemap, VIEW_16, 1 / 16) == before
+    assert layer.built == 2 and layer.pending == 6
+    while layer.pending:
+        _frame(layer, tilemap, VIEW_16, 1 / 16)
+    assert len(bakes) == 8
+
+
+def test_zooming_out_halves_the_finer_level_instead_of_baking(display):
+    tilemap = _map()
+    layer = ZoomLayer(build_ms=1e6, max_builds=1 << 30)
+    _frame(layer, tilemap, pygame.Rect(0, 0, 800 * 8, 600 * 8), 1 / 8)
+    bakes = _count_bakes(tilemap)
+    _frame(layer, tilemap, VIEW_16, 1 / 16)
+    # only chunks that were out of the 1/8 view are baked from tiles
+    assert sorted(bakes) == sorted((cx, cy, 4) for cy in range(6) for cx in range(8) if cx >= 7 or cy >= 5)
+
+
+def test_missing_chunks_stand_in_from_other_levels(display):
+    tilemap = _map()
+    layer = ZoomLayer(build_ms=1e6, max_builds=1 << 30)
+    _frame(layer, tilemap, VIEW_16, 1 / 16)
+    coarse = layer.levels[(2, 2, 4)][1]
+
+    layer.max_builds = 0
+    view = pygame.Rect(0, 0, 800 * 8, 600 * 8)
+    frame = _frame(layer, tilemap, view, 1 / 8)
+    assert layer.pending == 35 and (2, 2, 3) not in layer.levels
+    assert frame.get_at((256 + 5, 256 + 5)) == coarse.get_at((2, 2))  # chunk (2, 2), stretched x2
+
+    # near 1:1 the map's full-size chunks wait their turn the same way
+    _frame(layer, tilemap, pygame.Rect(0, 0, 1000, 750), 0.8)
+    assert layer.shift == 0 and layer.pending == 1 and not tilemap.chunk_baked(0, 0)
+    layer.max_builds = 1
+    _frame(layer, tilemap, pygame.Rect(0, 0, 1000, 750), 0.8)
+    assert layer.built == 1 and tilemap.chunk_baked(0, 0)
+
+
+def test_streaming_world_zooms_out_and_back(tmp_path, display):
+    world = StreamingTileMap(seed=3, store_dir=str(tmp_path / "world"), threaded=False, prefetch=0)
+    camera = Camera(800, 600, min_zoom=0.25)
+    surface = pygame.Surface((800, 600)).convert()
+    for zoom, shift in ((0.5, 1), (0.25, 2), (0.8, 0), (0.5, 1)):
+        camera.set_zoom(zoom, instant=True)
+        camera.update(pygame.Rect(5000, 5000, 1, 1))
+        for _ in range(3):  # the first draw only requests the chunks
+            world.draw(surface, camera)
+        assert world._zoom_layer.shift == shift
+    assert surface.get_at((400, 300)) != pygame.Color(0, 0, 0)
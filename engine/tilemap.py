@@ -1,14 +1,30 @@
-import os
+import heapq
+import itertools
+import zlib
+from collections import OrderedDict
+import numpy as np
 import pygame
+from .assets import LazyImages, get_asset_path, get_assets
+from .autotile import Autotiler
 from .crop import Crop
+from .render import RenderQueue
+from .tiles import TilePalette
 
-def get_asset_path(*parts):
-    base_dir = os.path.dirname(os.path.dirname(__file__))  # one level up from engine
-    return os.path.join(base_dir, "assets", *parts)
+# Ground is pre-rendered into square chunks of CHUNK_TILES x CHUNK_TILES tiles
+CHUNK_TILES = 16
+# Chunks are opaque; transparent parts of edge tiles show this colour (matches main.py's screen fill)
+GROUND_FILL = (50, 150, 50)
+
+# bits in TileMap.flags
+FLAG_TILLED = 1
+
+# past this many changed tiles between draws, a full redraw is cheaper than tracking them
+MAX_DAMAGED_TILES = 256
 
 
 class TileMap:
-    def __init__(self, world_w, world_h, tile_w=64, tile_h=64, predefined_map=None):
+    def __init__(self, world_w, world_h, tile_w=64, tile_h=64, predefined_map=None, use_crop_field=False,
+                 palette=None, memory_budget=64 * 1024 * 1024):
         self.world_w = int(world_w)
         self.world_h = int(world_h)
         self.tile_w = int(tile_w)
@@ -17,77 +33,87 @@ class TileMap:
         self.cols = max(1, self.world_w // self.tile_w)
         self.rows = max(1, self.world_h // self.tile_h)
 
-        def safe_load(path):
-            if os.path.exists(path):
-                try:
-                    surf = pygame.image.load(path).convert_alpha()
-                    return pygame.transform.smoothscale(surf, (self.tile_w, self.tile_h))
-                except Exception:
-                    pass
-            # fallback (pink placeholder)
-            s = pygame.Surface((self.tile_w, self.tile_h), pygame.SRCALPHA)
-            s.fill((255, 0, 255))
-            return s
-
-        # load tile surfaces
-        grass_dir = get_asset_path("environment", "grass")
-        env_dir = get_asset_path("environment")
-        flowers_dir = get_asset_path("environment", "flowers")
-
-        self.tile_surfaces = {}
-        self.tile_surfaces['grass'] = safe_load(os.path.join(grass_dir, "grass.png"))
-        mapping = {
-            'up': "up.png",
-            'down': "down.png",
-            'left': "left.png",
-            'right': "right.png",
-            'up_left': "up_left.png",
-            'up_right': "up_right.png",
-            'down_left': "down_left.png",
-            'down_right': "down_right.png",
-            'corner_northeast': "corner_northeast.png",
-            'corner_northwest': "corner_northwest.png",
-            'corner_southeast': "corner_southeast.png",
-            'corner_south_west': "corner_south_west.png",
-        }
-        for k, fn in mapping.items():
-            self.tile_surfaces[k] = safe_load(os.path.join(grass_dir, fn))
-
-        # use dirt_tile.png as the visual for dirt (tilled soil)
-        self.tile_surfaces['dirt'] = safe_load(os.path.join(env_dir, "dirt_tile.png"))
-        self.tile_surfaces['tree'] = safe_load(os.path.join(env_dir, "tree.png"))
-
-        if os.path.exists(flowers_dir):
-            for fname in os.listdir(flowers_dir):
-                key = "flower_" + os.path.splitext(fname)[0]
-                self.tile_surfaces[key] = safe_load(os.path.join(flowers_dir, fname))
-
-        # Create map
+        # tile kinds, and their surfaces by tile id (each loaded the first time it is drawn)
+        self.palette = palette if palette is not None else TilePalette()
+        self.tile_surfaces = {}  # tile name -> surface, for the tiles loaded so far
+        self._surfaces_by_id = LazyImages(self._load_tile_surface)
+
+        # Create map: one tile id per cell, plus a per-cell flag bitmask (FLAG_TILLED, ...)
+        grass = self._grass_id = self.palette.id_of('grass')
+        self.variants = None
+        self.grid = np.full((self.rows, self.cols), grass, dtype=self.palette.dtype())
+        self.flags = np.zeros((self.rows, self.cols), dtype=np.uint8)
         if predefined_map:
-            self.map = [list(row) for row in predefined_map]
+            for r, row in enumerate(predefined_map[:self.rows]):
+                ids = [self.palette.id_of(name) for name in list(row)[:self.cols]]
+                self._ensure_dtype()
+                self.grid[r, :len(ids)] = ids
         else:
             # Base grass only; no earth patches. Player can till tiles with Space.
-            self.map = [['grass' for _ in range(self.cols)] for _ in range(self.rows)]
-
             # Border setup using grass-edge tiles
-            for c in range(self.cols):
-                self.map[0][c] = 'up'
-                self.map[self.rows - 1][c] = 'down'
-            for r in range(self.rows):
-                self.map[r][0] = 'left'
-                self.map[r][self.cols - 1] = 'right'
-            self.map[0][0] = 'corner_northwest'
-            self.map[0][self.cols - 1] = 'corner_northeast'
-            self.map[self.rows - 1][0] = 'corner_south_west'
-            self.map[self.rows - 1][self.cols - 1] = 'corner_southeast'
+            ids = self.palette.id_of
+            self.grid[0, :] = ids('up')
+            self.grid[self.rows - 1, :] = ids('down')
+            self.grid[:, 0] = ids('left')
+            self.grid[:, self.cols - 1] = ids('right')
+            self.grid[0, 0] = ids('corner_northwest')
+            self.grid[0, self.cols - 1] = ids('corner_northeast')
+            self.grid[self.rows - 1, 0] = ids('corner_south_west')
+            self.grid[self.rows - 1, self.cols - 1] = ids('corner_southeast')
 
             # A couple of trees at fixed positions for scenery
             if self.rows > 6 and self.cols > 6:
-                self.map[3][3] = 'tree'
-                self.map[3][self.cols - 4] = 'tree'
+                self.grid[3, 3] = ids('tree')
+                self.grid[3, self.cols - 4] = ids('tree')
+
+        # the tile id actually drawn for each cell: grass next to tilled soil gets an edge sprite
+        self.autotiler = Autotiler(self.palette)
+        self.variants = self.autotiler.resolve(self._padded_grid(0, 0, self.cols, self.rows))
+        # solid tiles (trees), kept in step with grid, for engine.collision
+        self.solid = self.palette.solid[self.grid]
 
-        self.tilled = set()
         self.crops = pygame.sprite.Group()
+        # (col, row) -> Crop; kept in sync with self.crops by plant/harvest/remove_crop
+        self.crop_index = {}
+        # simulation tick counter and (due_tick, seq, crop) heap of pending stage changes
+        self.tick = 0
+        self._growth_queue = []
+        self._growth_seq = itertools.count()
+
+        # optional NumPy-backed crop storage for very large farms; replaces crops/crop_index
+        self.crop_field = None
+        if use_crop_field:
+            from .cropfield import CropField
+            self.crop_field = CropField(self.tile_w, self.tile_h)
+
+        # baked ground chunks, keyed by (chunk_col, chunk_row), least recently drawn first; once
+        # their surfaces take more than memory_budget bytes the oldest ones out of view are dropped
+        self.chunk_cols = (self.cols + CHUNK_TILES - 1) // CHUNK_TILES
+        self.chunk_rows = (self.rows + CHUNK_TILES - 1) // CHUNK_TILES
+        self._chunks = OrderedDict()
+        self._dirty_chunks = set()
+        self.memory_budget = int(memory_budget)
+        self.chunk_memory = 0
+        # tiles whose ground or crop changed since a GroundLayer last looked (engine.framebuffer)
+        self.damaged_tiles = []
+        self.damage_all = False
+        # bumped on every change to a chunk's look (and the epoch on all of them), so copies
+        # scaled for zooming out (engine.zoom) can tell they are stale; see chunk_stamp
+        self.chunk_stamps = {}
+        self.ground_epoch = 0
+        self._zoom_layer = None  # engine.zoom.ZoomLayer, made by the first draw_zoomed
+
+        # chunks changed since the last save, and chunks still waiting to be read from a save
+        # file (chunk_loader(tilemap, cx, cy) fills them in on first access)
+        self.save_dirty = set()
+        self.save_growing = set()  # chunks with growing crops as of the last save
+        self.chunk_loader = None
+        self._unloaded = set()
+        self.save_path = None  # file this map was last saved to / loaded from (see engine.savefile)
+        self.save_file = None
+        # autosave snapshots still sharing grid, flags and crop_index with the map; each gets a
+        # private copy of a chunk just before its first change (see engine.autosave)
+        self.snapshots = ()
 
     def tile_to_world(self, c, r):
         return c * self.tile_w, r * self.tile_h
@@ -95,61 +121,720 @@ class TileMap:
     def world_to_tile(self, x, y):
         return int(x // self.tile_w), int(y // self.tile_h)
 
+    def _load_tile_surface(self, tid):
+        """Surface of palette tile tid at tile size (None if it has no image); see _surfaces_by_id."""
+        tile = self.palette.tiles[tid]
+        surf = None
+        if tile.path:
+            surf = get_assets().image(get_asset_path(*tile.path), (self.tile_w, self.tile_h))
+            self.tile_surfaces[tile.name] = surf
+        return surf
+
+    @property
+    def _soil_surface(self):
+        # drawn under grass-edge variants
+        dirt = self.palette.ids.get('dirt')
+        return None if dirt is None else self._surfaces_by_id[dirt]
+
+    def _ensure_dtype(self):
+        # palettes past 256 entries need a wider grid
+        if self.grid.dtype != self.palette.dtype():
+            self.grid = self.grid.astype(self.palette.dtype())
+            if self.variants is not None:
+                self.variants = self.variants.astype(self.palette.dtype())
+
+    @property
+    def map(self):
+        """Tile names as a list of rows (a copy; edit tiles through set_tile)."""
+        self.load_all_chunks()
+        names = [tile.name for tile in self.palette.tiles]
+        return [[names[tid] for tid in row] for row in self.grid.tolist()]
+
+    @property
+    def tilled(self):
+        """Set of tilled (col, row) tiles (a copy; use is_tilled/count_tilled in hot paths)."""
+        self.load_all_chunks()
+        rows, cols = np.nonzero(self.flags & FLAG_TILLED)
+        return set(zip(cols.tolist(), rows.tolist()))
+
+    def tile_name(self, c, r):
+        if self._unloaded:
+            self._ensure_chunk(c // CHUNK_TILES, r // CHUNK_TILES)
+        return self.palette.name_of(self.grid[r, c])
+
+    def chunk_bounds(self, cx, cy):
+        """Tile rect (c0, r0, c1, r1) covered by chunk (cx, cy)."""
+        c0, r0 = cx * CHUNK_TILES, cy * CHUNK_TILES
+        return c0, r0, min(self.cols, c0 + CHUNK_TILES), min(self.rows, r0 + CHUNK_TILES)
+
+    def defer_chunks(self, loader, chunks):
+        """Leave chunks unloaded until first touched; loader(tilemap, cx, cy) then fills them in."""
+        self.chunk_loader = loader
+        self._unloaded.update(chunks)
+
+    def _ensure_chunk(self, cx, cy):
+        if (cx, cy) in self._unloaded:
+            self._unloaded.discard((cx, cy))
+            self.chunk_loader(self, cx, cy)
+
+    def _ensure_rect(self, c0, r0, c1, r1):
+        if self._unloaded:
+            for cy in range(max(0, r0) // CHUNK_TILES, (min(self.rows, r1) - 1) // CHUNK_TILES + 1):
+                for cx in range(max(0, c0) // CHUNK_TILES, (min(self.cols, c1) - 1) // CHUNK_TILES + 1):
+                    self._ensure_chunk(cx, cy)
+
+    def load_all_chunks(self):
+        for key in list(self._unloaded):
+            self._ensure_chunk(*key)
+
+    def chunk_arrays(self, cx, cy):
+        """(tile ids, flags) views of one chunk."""
+        self._ensure_chunk(cx, cy)
+        c0, r0, c1, r1 = self.chunk_bounds(cx, cy)
+        return self.grid[r0:r1, c0:c1], self.flags[r0:r1, c0:c1]
+
+    def _before_write(self, cx, cy):
+        # copy-on-write for snapshots being saved in the background
+        for snapshot in self.snapshots:
+            snapshot.preserve(cx, cy)
+
+    def _draw_tile(self, surface, tid, dest, under=None):
+        surfaces = self._surfaces_by_id
+        grass = surfaces[self._grass_id]
+
+        # grass-edge variants from the autotiler show soil through their ragged side
+        if under is not None:
+            surface.blit(under, dest)
+        # If this is a decorative overlay (tree/flower), draw grass first;
+        # upright ones (trees) are drawn as sprites by submit_objects
+        if self.palette.overlay[tid]:
+            if grass:
+                surface.blit(grass, dest)
+            overlay = surfaces[tid]
+            if overlay and not self.palette.upright[tid]:
+                surface.blit(overlay, dest)
+        else:
+            surface.blit(surfaces[tid] or grass, dest)
+
+    def chunk_of(self, c, r):
+        return c // CHUNK_TILES, r // CHUNK_TILES
+
+    def invalidate_tile(self, c, r):
+        """Mark the chunk holding tile (c, r) for re-baking on the next draw."""
+        key = self.chunk_of(c, r)
+        if key in self._chunks:
+            self._dirty_chunks.add(key)
+
+    def invalidate_all(self):
+        self._chunks.clear()
+        self._dirty_chunks.clear()
+        self.chunk_memory = 0
+        self.damage_all = True
+        self.ground_epoch += 1
+
+    def chunk_stamp(self, cx, cy):
+        """Changes whenever chunk (cx, cy) comes to look different."""
+        return self.ground_epoch, self.chunk_stamps.get((cx, cy), 0)
+
+    def _touch_chunks(self, keys):
+        stamps = self.chunk_stamps
+        for key in keys:
+            stamps[key] = stamps.get(key, 0) + 1
+
+    def damage(self, c, r):
+        """Note that tile (c, r) looks different now (tile or crop changed)."""
+        key = (c // CHUNK_TILES, r // CHUNK_TILES)
+        self.chunk_stamps[key] = self.chunk_stamps.get(key, 0) + 1
+        if not self.damage_all:
+            self.damaged_tiles.append((c, r))
+            if len(self.damaged_tiles) > MAX_DAMAGED_TILES:
+                self.damage_all = True
+                self.damaged_tiles = []
+
+    def take_damage(self):
+        """(damaged tiles, everything damaged) since the last call; resets both."""
+        damage = self.damaged_tiles, self.damage_all
+        self.damaged_tiles = []
+        self.damage_all = False
+        return damage
+
+    def _bake_chunk(self, cx, cy):
+        """Render the ground tiles of one chunk into a cached surface."""
+        self._ensure_chunk(cx, cy)
+        c0, r0, c1, r1 = self.chunk_bounds(cx, cy)
+
+        surf = self._chunks.get((cx, cy))
+        if surf is None:
+            surf = pygame.Surface(((c1 - c0) * self.tile_w, (r1 - r0) * self.tile_h)).convert()
+            self._chunks[(cx, cy)] = surf
+            self.chunk_memory += surf.get_bytesize() * surf.get_width() * surf.get_height()
+        surf.fill(GROUND_FILL)
+
+        soil = self._soil_surface
+        ids = self.grid[r0:r1, c0:c1].tolist()
+        for r, (row, drawn) in enumerate(zip(ids, self.variants[r0:r1, c0:c1].tolist())):
+            for c, (tid, vid) in enumerate(zip(row, drawn)):
+                self._draw_tile(surf, vid, (c * self.tile_w, r * self.tile_h), soil if vid != tid else None)
+        self._dirty_chunks.discard((cx, cy))
+        return surf
+
+    def chunk_keys(self, rect):
+        """(cx, cy) of the map's chunks overlapping rect (world pixels)."""
+        chunk_w = CHUNK_TILES * self.tile_w
+        chunk_h = CHUNK_TILES * self.tile_h
+        for cy in range(max(0, rect.top // chunk_h), min(self.chunk_rows, (rect.bottom - 1) // chunk_h + 1)):
+            for cx in range(max(0, rect.left // chunk_w), min(self.chunk_cols, (rect.right - 1) // chunk_w + 1)):
+                yield cx, cy
+
+    def chunk_baked(self, cx, cy):
+        """Whether get_chunk(cx, cy) has a clean baked surface to hand back (no baking needed)."""
+        return (cx, cy) in self._chunks and (cx, cy) not in self._dirty_chunks
+
+    def get_chunk(self, cx, cy):
+        surf = self._chunks.get((cx, cy))
+        if surf is None or (cx, cy) in self._dirty_chunks:
+            surf = self._bake_chunk(cx, cy)
+        else:
+            self._chunks.move_to_end((cx, cy))
+        return surf
+
+    def _evict_chunks(self, keep):
+        # drop the least recently drawn baked chunks outside keep until back under the budget
+        for key in list(self._chunks):
+            if self.chunk_memory <= self.memory_budget:
+                return
+            if key not in keep:
+                surf = self._chunks.pop(key)
+                self._dirty_chunks.discard(key)
+                self.chunk_memory -= surf.get_bytesize() * surf.get_width() * surf.get_height()
+
+    def _tile_layers(self, tid, vid):
+        # what _draw_tile blits for a cell holding tid drawn as vid, bottom first
+        surfaces = self._surfaces_by_id
+        grass = surfaces[self._grass_id]
+        layers = [self._soil_surface] if vid != tid else []
+        if self.palette.overlay[vid]:
+            layers.append(grass)
+            if not self.palette.upright[vid]:
+                layers.append(surfaces[vid])
+        else:
+            layers.append(surfaces[vid] or grass)
+        return [layer for layer in layers if layer is not None]
+
+    def _chunk_tiles(self, cx, cy):
+        # (tile ids, drawn variants, first col, first row) of a chunk, for bake_level
+        if not (0 <= cx < self.chunk_cols and 0 <= cy < self.chunk_rows):
+            return None
+        self._ensure_chunk(cx, cy)
+        c0, r0, c1, r1 = self.chunk_bounds(cx, cy)
+        return self.grid[r0:r1, c0:c1], self.variants[r0:r1, c0:c1], c0, r0
+
+    def bake_level(self, cx, cy, shift, images):
+        """
+        Chunk (cx, cy) with its crops and trees drawn at 1 / 2**shift scale straight from scaled
+        tile images (images(surface, shift) scales one; see engine.zoom), without baking it at
+        full size first. Returns None if the chunk isn't available.
+        """
+        tiles = self._chunk_tiles(cx, cy)
+        if tiles is None:
+            return None
+        ids, drawn, c0, r0 = tiles
+        tw, th = self.tile_w >> shift, self.tile_h >> shift
+        rows, cols = ids.shape
+        surf = pygame.Surface((cols * tw, rows * th)).convert()
+        keys = list(zip(ids.ravel().tolist(), drawn.ravel().tolist()))
+        flat = {}  # (tid, vid) -> its scaled layers flattened over GROUND_FILL, like the chunk itself
+        for key in set(keys):
+            tile = flat[key] = pygame.Surface((tw, th)).convert()
+            tile.fill(GROUND_FILL)
+            tile.blits([(images(layer, shift), (0, 0)) for layer in self._tile_layers(*key)], doreturn=False)
+        surf.blits([(flat[key], ((i % cols) * tw, (i // cols) * th)) for i, key in enumerate(keys)], doreturn=False)
+
+        queue = RenderQueue()
+        area = pygame.Rect(c0 * self.tile_w, r0 * self.tile_h, cols * self.tile_w, rows * self.tile_h)
+        queue.begin(area)
+        self.submit_objects(queue)
+        queue.draw_world_scaled(surf, shift, images)
+        return surf
+
+    def update(self, dt):
+        """Advance world logic (crop growth) by one simulation tick."""
+        self.tick += 1
+        if self.crop_field is not None:
+            advanced = self.crop_field.update()
+            field = self.crop_field
+            if self.damage_all or len(advanced) > MAX_DAMAGED_TILES:
+                self.damage_all = True
+                keys = np.unique((field.col[advanced] // CHUNK_TILES).astype(np.int64) << 32
+                                 | (field.row[advanced] // CHUNK_TILES).astype(np.int64))
+                self._touch_chunks(zip((keys >> 32).tolist(), (keys & 0xFFFFFFFF).tolist()))
+            else:
+                for c, r in zip(field.col[advanced].tolist(), field.row[advanced].tolist()):
+                    self.damage(c, r)
+            return
+
+        # only crops due for a stage change are touched
+        queue = self._growth_queue
+        while queue and queue[0][0] <= self.tick:
+            _, _, crop = heapq.heappop(queue)
+            if self.crop_index.get(crop.tile) is not crop:
+                continue  # harvested or removed since it was scheduled
+            crop.update(self.tick)
+            self.damage(*crop.tile)
+            self._schedule_growth(crop)
+
+    def _schedule_growth(self, crop):
+        due = crop.next_stage_tick()
+        if due is not None:
+            heapq.heappush(self._growth_queue, (due, next(self._growth_seq), crop))
+
     def draw(self, surface, camera, highlight_pos=None):
+        if getattr(camera, 'zoom', 1.0) != 1.0:
+            self.draw_zoomed(surface, camera, highlight_pos)
+            return
         cam_rect = camera.world_view_rect()
-        start_col = max(0, cam_rect.left // self.tile_w)
-        end_col = min(self.cols, (cam_rect.right // self.tile_w) + 1)
-        start_row = max(0, cam_rect.top // self.tile_h)
-        end_row = min(self.rows, (cam_rect.bottom // self.tile_h) + 1)
+        self.draw_ground(surface, cam_rect)
+        self.draw_objects(surface, cam_rect, highlight_pos)
 
-        for r in range(start_row, end_row):
-            for c in range(start_col, end_col):
-                wx, wy = self.tile_to_world(c, r)
-                dest = pygame.Rect(wx - cam_rect.left, wy - cam_rect.top, self.tile_w, self.tile_h)
-                tile_type = self.map[r][c]
-
-                # If this is a decorative overlay (tree/flower), draw grass first
-                if tile_type == 'tree' or (isinstance(tile_type, str) and tile_type.startswith('flower_')):
-                    base_grass = self.tile_surfaces.get('grass')
-                    if base_grass:
-                        surface.blit(base_grass, dest)
-                    overlay = self.tile_surfaces.get(tile_type)
-                    if overlay:
-                        surface.blit(overlay, dest)
-                else:
-                    surf = self.tile_surfaces.get(tile_type, self.tile_surfaces.get('grass'))
-                    surface.blit(surf, dest)
-
-        # update and draw crops
-        for crop in self.crops:
-            crop.update()
-            dest_rect = crop.rect.move(-cam_rect.left, -cam_rect.top)
-            surface.blit(crop.image, dest_rect)
-
-        # draw highlight
+    def draw_zoomed(self, surface, camera, highlight_pos=None, queue=None):
+        """
+        Draw the map as seen through a zoomed camera (engine.zoom), with the world sprites in
+        queue (begun on the camera's view; crops and trees are added here) and the tile highlight.
+        """
+        if self._zoom_layer is None:
+            from .zoom import ZoomLayer
+            self._zoom_layer = ZoomLayer()
+        view = camera.world_view_rect()
+        if queue is None:
+            queue = RenderQueue()
+            queue.begin(view)
+        self._zoom_layer.draw(surface, self, view, camera.zoom, queue)
+        if highlight_pos:
+            tile = pygame.Rect(self.tile_to_world(*highlight_pos), (self.tile_w, self.tile_h))
+            pygame.draw.rect(surface, (255, 255, 0), camera.apply(tile), 3)
+
+    def draw_ground(self, surface, cam_rect, area=None, fallback=None):
+        """
+        Blit the baked ground under area (world rect, default the whole view) onto surface.
+        fallback(cx, cy), if given, is asked about each chunk that would have to be baked first:
+        a surface it returns is drawn in the chunk's place instead, None bakes it as usual.
+        """
+        area = cam_rect if area is None else area
+        chunk_w = CHUNK_TILES * self.tile_w
+        chunk_h = CHUNK_TILES * self.tile_h
+        start_cx = max(0, area.left // chunk_w)
+        end_cx = min(self.chunk_cols, (area.right - 1) // chunk_w + 1)
+        start_cy = max(0, area.top // chunk_h)
+        end_cy = min(self.chunk_rows, (area.bottom - 1) // chunk_h + 1)
+
+        screen_area = area.move(-cam_rect.left, -cam_rect.top)
+        clip = surface.get_clip()
+        surface.set_clip(screen_area.clip(clip))
+        if not pygame.Rect(0, 0, self.cols * self.tile_w, self.rows * self.tile_h).contains(area):
+            surface.fill(GROUND_FILL, screen_area)
+        for cy in range(start_cy, end_cy):
+            for cx in range(start_cx, end_cx):
+                chunk = None
+                if fallback is not None and not self.chunk_baked(cx, cy):
+                    chunk = fallback(cx, cy)
+                if chunk is None:
+                    chunk = self.get_chunk(cx, cy)
+                surface.blit(chunk, (cx * chunk_w - cam_rect.left, cy * chunk_h - cam_rect.top))
+        surface.set_clip(clip)
+        if self.chunk_memory > self.memory_budget:
+            self._evict_chunks({(cx, cy) for cy in range(cam_rect.top // chunk_h, (cam_rect.bottom - 1) // chunk_h + 1)
+                                for cx in range(cam_rect.left // chunk_w, (cam_rect.right - 1) // chunk_w + 1)})
+
+    def draw_objects(self, surface, cam_rect, highlight_pos=None, area=None):
+        """Draw crops and trees overlapping area (world rect, default the view) and the tile highlight."""
+        queue = RenderQueue()
+        queue.begin(cam_rect)
+        self.submit_objects(queue, area)
+        queue.draw_world(surface, area)
+        self.draw_highlight(surface, cam_rect, highlight_pos)
+
+    def submit_objects(self, queue, area=None):
+        """Submit the crops and upright tiles (trees) overlapping area (world rect, default the queue's view)."""
+        area = queue.view if area is None else area
+        # growth happens in update()
+        if self.crop_field is not None:
+            self.crop_field.submit(queue, area)
+        else:
+            queue.submit_many((crop.image, crop.rect.x, crop.rect.y, None) for crop in self.crops_in_rect(area))
+
+        c0, r0 = max(0, area.left // self.tile_w), max(0, area.top // self.tile_h)
+        c1 = min(self.cols, (area.right - 1) // self.tile_w + 1)
+        r1 = min(self.rows, (area.bottom - 1) // self.tile_h + 1)
+        if c1 > c0 and r1 > r0:
+            self._ensure_rect(c0, r0, c1, r1)
+            self._submit_upright(queue, self.grid[r0:r1, c0:c1], c0, r0)
+
+    def _submit_upright(self, queue, block, c0, r0):
+        """Submit the upright tiles of block (tile ids with top-left tile (c0, r0)), standing on their tile."""
+        rows, cols = np.nonzero(self.palette.upright[block])
+        surfaces = self._surfaces_by_id
+        for r, c, tid in zip((rows + r0).tolist(), (cols + c0).tolist(), block[rows, cols].tolist()):
+            image = surfaces[tid]
+            if image is not None:
+                bottom = (r + 1) * self.tile_h
+                queue.submit(image, c * self.tile_w, bottom - image.get_height(), bottom)
+
+    def blocked(self, c0, r0, c1, r1):
+        """True if any tile in [c0, c1) x [r0, r1) is solid; off the map counts as solid."""
+        if c0 < 0 or r0 < 0 or c1 > self.cols or r1 > self.rows:
+            return True
+        if self._unloaded:
+            self._ensure_rect(c0, r0, c1, r1)
+        return bool(self.solid[r0:r1, c0:c1].any())
+
+    def draw_highlight(self, surface, cam_rect, highlight_pos):
+        """Outline the tile at highlight_pos (col, row), if it is on the map."""
         if highlight_pos:
             hc, hr = highlight_pos
             if 0 <= hr < self.rows and 0 <= hc < self.cols:
-                hx, hy = self.tile_to_world(hc, hr)
-                rect = pygame.Rect(hx - cam_rect.left, hy - cam_rect.top, self.tile_w, self.tile_h)
-                pygame.draw.rect(surface, (255, 255, 0), rect, 3)
+                pygame.draw.rect(surface, (255, 255, 0), self.highlight_rect(highlight_pos, cam_rect), 3)
+
+    def highlight_rect(self, highlight_pos, cam_rect):
+        """Screen rect of the tile highlight drawn for highlight_pos."""
+        hx, hy = self.tile_to_world(*highlight_pos)
+        return pygame.Rect(hx - cam_rect.left, hy - cam_rect.top, self.tile_w, self.tile_h)
+
+    def set_tile(self, c, r, tile_type):
+        """Change a tile and re-bake its chunk. tile_type is a tile name or palette id."""
+        if 0 <= r < self.rows and 0 <= c < self.cols:
+            if self._unloaded:
+                self._ensure_chunk(c // CHUNK_TILES, r // CHUNK_TILES)
+            if isinstance(tile_type, str):
+                tile_type = self.palette.id_of(tile_type)
+                self._ensure_dtype()
+            if self.snapshots:
+                self._before_write(c // CHUNK_TILES, r // CHUNK_TILES)
+            self.grid[r, c] = tile_type
+            self.solid[r, c] = self.palette.solid[tile_type]
+            self.invalidate_tile(c, r)
+            self.damage(c, r)
+            self.save_dirty.add(self.chunk_of(c, r))
+            self.autotile(c - 1, r - 1, c + 2, r + 2)
+            return True
+        return False
+
+    def _padded_grid(self, c0, r0, c1, r1):
+        # tile ids of [c0, c1) x [r0, r1) plus a one-tile ring; outside the map counts as grass
+        padded = np.full((r1 - r0 + 2, c1 - c0 + 2), self.autotiler.base_id, dtype=self.grid.dtype)
+        top, left = max(0, r0 - 1), max(0, c0 - 1)
+        block = self.grid[top:r1 + 1, left:c1 + 1]
+        padded[top - r0 + 1:top - r0 + 1 + block.shape[0], left - c0 + 1:left - c0 + 1 + block.shape[1]] = block
+        return padded
+
+    def autotile(self, c0, r0, c1, r1):
+        """Re-resolve the drawn variants of the tiles in [c0, c1) x [r0, r1) after their neighbours changed."""
+        c0, r0, c1, r1 = self._clip(c0, r0, c1, r1)
+        if c1 <= c0 or r1 <= r0:
+            return
+        drawn = self.variants[r0:r1, c0:c1]
+        resolved = self.autotiler.resolve(self._padded_grid(c0, r0, c1, r1))
+        rows, cols = np.nonzero(resolved != drawn)
+        if len(rows):
+            drawn[:] = resolved
+            for r, c in zip((rows + r0).tolist(), (cols + c0).tolist()):
+                self.invalidate_tile(c, r)
+                self.damage(c, r)
 
     def is_tillable(self, c, r):
         if 0 <= r < self.rows and 0 <= c < self.cols:
-            return self.map[r][c].startswith('grass') or self.map[r][c].startswith('flower_')
+            if self._unloaded:
+                self._ensure_chunk(c // CHUNK_TILES, r // CHUNK_TILES)
+            return bool(self.palette.tillable[self.grid[r, c]])
+        return False
+
+    def is_tilled(self, c, r):
+        if 0 <= r < self.rows and 0 <= c < self.cols:
+            if self._unloaded:
+                self._ensure_chunk(c // CHUNK_TILES, r // CHUNK_TILES)
+            return bool(self.flags[r, c] & FLAG_TILLED)
         return False
 
     def till(self, c, r):
         if 0 <= r < self.rows and 0 <= c < self.cols and self.is_tillable(c, r):
-            self.map[r][c] = 'dirt'
-            self.tilled.add((c, r))
+            self.set_tile(c, r, self.palette.id_of('dirt'))  # also preserves the chunk for snapshots
+            self.flags[r, c] |= FLAG_TILLED
+            self.save_dirty.add(self.chunk_of(c, r))
             return True
         return False
 
+    # Area operations: one vectorized pass, one round of invalidation per call
+
+    def _touched_chunks(self, cols, rows):
+        keys = set(zip((cols // CHUNK_TILES).tolist(), (rows // CHUNK_TILES).tolist()))
+        if self.snapshots:
+            for key in keys:
+                self._before_write(*key)
+        return keys
+
+    def _changed(self, cols, rows, keys):
+        # re-bake, save and damage the tiles a bulk operation changed
+        self._dirty_chunks.update(key for key in keys if key in self._chunks)
+        self.save_dirty |= keys
+        if len(cols) > MAX_DAMAGED_TILES:
+            self.damage_all = True
+            self.damaged_tiles = []
+            self._touch_chunks(keys)
+        else:
+            for c, r in zip(cols.tolist(), rows.tolist()):
+                self.damage(c, r)
+
+    def till_rect(self, c0, r0, c1, r1):
+        """Till every tillable tile in the tile rect [c0, c1) x [r0, r1); returns how many were tilled."""
+        c0, r0, c1, r1 = self._clip(c0, r0, c1, r1)
+        mask = self.tillable_mask(c0, r0, c1, r1)
+        rows, cols = np.nonzero(mask)
+        if not len(rows):
+            return 0
+        cols += c0
+        rows += r0
+        keys = self._touched_chunks(cols, rows)
+        dirt = self.palette.id_of('dirt')
+        self.grid[r0:r1, c0:c1][mask] = dirt
+        self.solid[r0:r1, c0:c1][mask] = self.palette.solid[dirt]
+        self.flags[r0:r1, c0:c1][mask] |= FLAG_TILLED
+        self._changed(cols, rows, keys)
+        self.autotile(c0 - 1, r0 - 1, c1 + 1, r1 + 1)
+        return len(rows)
+
+    # Whole-map queries, vectorized over the grid
+
+    def _clip(self, c0, r0, c1, r1):
+        return max(0, c0), max(0, r0), min(self.cols, c1), min(self.rows, r1)
+
+    def count_tilled(self):
+        self.load_all_chunks()
+        return int(np.count_nonzero(self.flags & FLAG_TILLED))
+
+    def count_tiles(self, name):
+        tid = self.palette.ids.get(name)
+        self.load_all_chunks()
+        return 0 if tid is None else int(np.count_nonzero(self.grid == tid))
+
+    def tillable_mask(self, c0=0, r0=0, c1=None, r1=None):
+        """Boolean [row, col] mask of tillable tiles in the tile rect [c0, c1) x [r0, r1)."""
+        c0, r0, c1, r1 = self._clip(c0, r0, self.cols if c1 is None else c1, self.rows if r1 is None else r1)
+        if c1 <= c0 or r1 <= r0:
+            return np.zeros((0, 0), dtype=bool)
+        self._ensure_rect(c0, r0, c1, r1)
+        return self.palette.tillable[self.grid[r0:r1, c0:c1]]
+
+    def tillable_tiles(self, c0=0, r0=0, c1=None, r1=None):
+        """(col, row) of every tillable tile in the tile rect [c0, c1) x [r0, r1)."""
+        c0, r0 = max(0, c0), max(0, r0)
+        rows, cols = np.nonzero(self.tillable_mask(c0, r0, c1, r1))
+        return list(zip((cols + c0).tolist(), (rows + r0).tolist()))
+
+    def crop_at(self, c, r):
+        if self._unloaded:
+            self._ensure_chunk(c // CHUNK_TILES, r // CHUNK_TILES)
+        if self.crop_field is not None:
+            return self.crop_field.view(c, r)
+        return self.crop_index.get((c, r))
+
+    def crop_count(self):
+        self.load_all_chunks()
+        if self.crop_field is not None:
+            return len(self.crop_field)
+        return len(self.crop_index)
+
+    def crops_in_rect(self, rect):
+        """Crops whose tile overlaps rect (world pixels)."""
+        start_col = max(0, rect.left // self.tile_w)
+        end_col = min(self.cols, (rect.right - 1) // self.tile_w + 1)
+        start_row = max(0, rect.top // self.tile_h)
+        end_row = min(self.rows, (rect.bottom - 1) // self.tile_h + 1)
+        if end_col <= start_col or end_row <= start_row:
+            return []
+        self._ensure_rect(start_col, start_row, end_col, end_row)
+        if self.crop_field is not None:
+            field = self.crop_field
+            return [field.view(int(field.col[i]), int(field.row[i])) for i in field.slots_in_rect(rect)]
+
+        index = self.crop_index
+        # walk whichever is smaller: the tiles in the rect or the planted crops
+        if (end_col - start_col) * (end_row - start_row) <= len(index):
+            found = []
+            for r in range(start_row, end_row):
+                for c in range(start_col, end_col):
+                    crop = index.get((c, r))
+                    if crop is not None:
+                        found.append(crop)
+            return found
+        return [crop for (c, r), crop in index.items()
+                if start_col <= c < end_col and start_row <= r < end_row]
+
     def plant(self, c, r, crop_type):
-        if (c, r) in self.tilled and not any((crop.rect.topleft == self.tile_to_world(c, r)) for crop in self.crops):
+        # restore_crop refuses occupied tiles
+        return self.is_tilled(c, r) and self.restore_crop(c, r, crop_type)
+
+    def restore_crop(self, c, r, crop_type, stage=0, progress=0):
+        """Put a crop on (c, r) with the given growth state, skipping the tilled check."""
+        if self._unloaded:
+            self._ensure_chunk(c // CHUNK_TILES, r // CHUNK_TILES)
+        if self.snapshots:
+            self._before_write(c // CHUNK_TILES, r // CHUNK_TILES)
+        if self.crop_field is not None:
+            if not self.crop_field.plant(c, r, crop_type, stage, progress):
+                return False
+        else:
+            if (c, r) in self.crop_index:
+                return False
             wx, wy = self.tile_to_world(c, r)
             crop = Crop(wx, wy, crop_type, frame_w=self.tile_w // 2, frame_h=self.tile_h // 2)
+            # back-date the planting so the crop is `progress` ticks into `stage` right now
+            crop.planted_tick = self.tick - stage * crop.growth_speed - progress
+            crop.update(self.tick)
+            crop.tile = (c, r)
             self.crops.add(crop)
-            return True
-        return False
+            self.crop_index[(c, r)] = crop
+            self._schedule_growth(crop)
+        self.save_dirty.add(self.chunk_of(c, r))
+        self.damage(c, r)
+        return True
+
+    def crop_states(self, c0, r0, c1, r1):
+        """(col, row, crop_type, stage, progress) for each crop in the tile rect [c0, c1) x [r0, r1)."""
+        self._ensure_rect(c0, r0, c1, r1)
+        if self.crop_field is not None:
+            from .crop import CROP_STAGES
+            from .cropfield import CROP_TYPES
+            field = self.crop_field
+            n = field.count
+            col, row = field.col[:n], field.row[:n]
+            slots = np.nonzero((col >= c0) & (col < c1) & (row >= r0) & (row < r1))[0]
+            ripe = CROP_STAGES - 1
+            # ripe crops report 0 progress: their timers keep counting but nothing changes
+            return [(int(field.col[i]), int(field.row[i]), CROP_TYPES[field.type_id[i]], int(field.stage[i]),
+                     0 if field.stage[i] >= ripe else int(field.growth[i])) for i in slots]
+        rect = pygame.Rect(c0 * self.tile_w, r0 * self.tile_h, (c1 - c0) * self.tile_w, (r1 - r0) * self.tile_h)
+        return [(crop.tile[0], crop.tile[1], crop.crop_type, crop.stage,
+                 0 if crop.is_ripe() else crop.ticks_in_stage(self.tick))
+                for crop in self.crops_in_rect(rect)]
+
+    def growing_chunks(self):
+        """Chunks holding crops that are not fully grown (their saved state changes every tick)."""
+        if self.crop_field is not None:
+            from .crop import CROP_STAGES
+            field = self.crop_field
+            n = field.count
+            growing = field.stage[:n] < CROP_STAGES - 1
+            keys = np.unique(np.stack([field.col[:n][growing] // CHUNK_TILES,
+                                       field.row[:n][growing] // CHUNK_TILES], axis=1), axis=0)
+            return {(int(cx), int(cy)) for cx, cy in keys}
+        return {self.chunk_of(c, r) for (c, r), crop in self.crop_index.items() if not crop.is_ripe()}
+
+    def state_hash(self, crc=0):
+        """CRC32 of the map's game state (tick, tiles, flags, crops) chained onto crc; see engine.replay."""
+        crc = zlib.crc32(self.grid.tobytes(), crc)
+        crc = zlib.crc32(self.flags.tobytes(), crc)
+        if self.crop_field is not None:
+            field = self.crop_field
+            for arr in (field.type_id, field.col, field.row, field.stage, field.growth):
+                crc = zlib.crc32(arr[:field.count].tobytes(), crc)
+        else:
+            crops = sorted((c, r, crop.crop_type, crop.planted_tick, crop.stage)
+                           for (c, r), crop in self.crop_index.items())
+            crc = zlib.crc32(repr(crops).encode(), crc)
+        return zlib.crc32(str(self.tick).encode(), crc)
+
+    def remove_crop(self, c, r):
+        """Remove whatever crop is on (c, r) and return its type, or None if the tile is empty."""
+        if self._unloaded:
+            self._ensure_chunk(c // CHUNK_TILES, r // CHUNK_TILES)
+        if self.snapshots:
+            self._before_write(c // CHUNK_TILES, r // CHUNK_TILES)
+        if self.crop_field is not None:
+            crop_type = self.crop_field.remove(c, r)
+        else:
+            crop = self.crop_index.pop((c, r), None)
+            if crop is None:
+                return None
+            crop.kill()
+            crop_type = crop.crop_type
+        if crop_type is not None:
+            self.save_dirty.add(self.chunk_of(c, r))
+            self.damage(c, r)
+        return crop_type
+
+    def harvest(self, c, r):
+        """Remove a fully grown crop and return its type, or None if there is nothing ripe here."""
+        crop = self.crop_at(c, r)
+        if crop is None or not crop.is_ripe():
+            return None
+        return self.remove_crop(c, r)
+
+    def plant_rect(self, c0, r0, c1, r1, crop_type, limit=None):
+        """
+        Plant crop_type on the free tilled tiles of the tile rect [c0, c1) x [r0, r1), row by
+        row, at most limit of them (e.g. the seeds in hand). Returns how many were planted.
+        """
+        c0, r0, c1, r1 = self._clip(c0, r0, c1, r1)
+        if c1 <= c0 or r1 <= r0:
+            return 0
+        self._ensure_rect(c0, r0, c1, r1)
+        rows, cols = np.nonzero(self.flags[r0:r1, c0:c1] & FLAG_TILLED)
+        occupied = self.crop_field.index if self.crop_field is not None else self.crop_index
+        free = [(c, r) for c, r in zip((cols + c0).tolist(), (rows + r0).tolist()) if (c, r) not in occupied]
+        if limit is not None:
+            free = free[:max(0, int(limit))]
+        if not free:
+            return 0
+        cols, rows = (np.array(axis, dtype=np.int32) for axis in zip(*free))
+        keys = self._touched_chunks(cols, rows)
+
+        if self.crop_field is not None:
+            self.crop_field.plant_many(cols, rows, crop_type)
+        else:
+            planted = []
+            queue = self._growth_queue
+            for c, r in free:
+                wx, wy = self.tile_to_world(c, r)
+                crop = Crop(wx, wy, crop_type, frame_w=self.tile_w // 2, frame_h=self.tile_h // 2,
+                            planted_tick=self.tick)
+                crop.tile = (c, r)
+                self.crop_index[(c, r)] = crop
+                planted.append(crop)
+                queue.append((crop.next_stage_tick(), next(self._growth_seq), crop))
+            heapq.heapify(queue)  # once, instead of a push per crop
+            self.crops.add(*planted)
+        self._changed(cols, rows, keys)
+        return len(free)
+
+    def harvest_rect(self, c0, r0, c1, r1):
+        """Harvest every ripe crop in the tile rect [c0, c1) x [r0, r1); returns {crop type: count}."""
+        c0, r0, c1, r1 = self._clip(c0, r0, c1, r1)
+        if c1 <= c0 or r1 <= r0:
+            return {}
+        rect = pygame.Rect(c0 * self.tile_w, r0 * self.tile_h, (c1 - c0) * self.tile_w, (r1 - r0) * self.tile_h)
+        harvested = {}
+        if self.crop_field is not None:
+            from .crop import CROP_STAGES
+            from .cropfield import CROP_TYPES
+            self._ensure_rect(c0, r0, c1, r1)
+            field = self.crop_field
+            slots = field.slots_in_rect(rect)
+            slots = slots[field.stage[slots] >= CROP_STAGES - 1]
+            if not len(slots):
+                return {}
+            cols, rows = field.col[slots].copy(), field.row[slots].copy()
+            keys = self._touched_chunks(cols, rows)
+            type_ids, counts = np.unique(field.remove_many(slots), return_counts=True)
+            harvested = {CROP_TYPES[tid]: int(n) for tid, n in zip(type_ids.tolist(), counts.tolist())}
+        else:
+            ripe = [crop for crop in self.crops_in_rect(rect) if crop.is_ripe()]
+            if not ripe:
+                return {}
+            cols = np.array([crop.tile[0] for crop in ripe])
+            rows = np.array([crop.tile[1] for crop in ripe])
+            keys = self._touched_chunks(cols, rows)
+            for crop in ripe:
+                del self.crop_index[crop.tile]
+                harvested[crop.crop_type] = harvested.get(crop.crop_type, 0) + 1
+            self.crops.remove(*ripe)
+        self._changed(cols, rows, keys)
+        return harvested
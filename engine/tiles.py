@@ -0,0 +1,105 @@
+import os
+import numpy as np
+from .assets import get_asset_path
+
+
+class TileDef:
+    """
+    TileDef(name, path=None, tillable=False, overlay=False, solid=False, upright=False)
+    Static properties of one tile kind. path is a tuple of parts under assets/.
+    Overlay tiles (trees, flowers) are drawn on top of grass. Upright tiles (trees) stand up
+    off the ground: they aren't baked into the ground but drawn as sprites, depth-sorted
+    with crops and characters (engine.render).
+    """
+    def __init__(self, name, path=None, tillable=False, overlay=False, solid=False, upright=False):
+        self.name = name
+        self.path = path
+        self.tillable = tillable
+        self.overlay = overlay
+        self.solid = solid
+        self.upright = upright
+
+    def __repr__(self):
+        return "TileDef(%r)" % self.name
+
+
+def default_tiles():
+    """The built-in tile kinds, grass first so it gets id 0."""
+    tiles = [TileDef('grass', ("environment", "grass", "grass.png"), tillable=True)]
+    for name in ('up', 'down', 'left', 'right', 'up_left', 'up_right', 'down_left', 'down_right',
+                 'corner_northeast', 'corner_northwest', 'corner_southeast', 'corner_south_west'):
+        tiles.append(TileDef(name, ("environment", "grass", name + ".png")))
+
+    # use dirt_tile.png as the visual for dirt (tilled soil)
+    tiles.append(TileDef('dirt', ("environment", "dirt_tile.png")))
+    tiles.append(TileDef('tree', ("environment", "tree.png"), overlay=True, solid=True, upright=True))
+
+    flowers_dir = get_asset_path("environment", "flowers")
+    if os.path.exists(flowers_dir):
+        for fname in sorted(os.listdir(flowers_dir)):
+            key = "flower_" + os.path.splitext(fname)[0]
+            tiles.append(TileDef(key, ("environment", "flowers", fname), tillable=True, overlay=True))
+    return tiles
+
+
+class TilePalette:
+    """
+    TilePalette(tiles=None)
+    Maps compact integer tile ids to TileDefs. Property tables (tillable, overlay, solid,
+    upright) are NumPy arrays indexed by id, so whole-grid queries are a single fancy-index.
+    """
+    def __init__(self, tiles=None):
+        self.tiles = []
+        self.ids = {}
+        self.tillable = np.zeros(0, dtype=bool)
+        self.overlay = np.zeros(0, dtype=bool)
+        self.solid = np.zeros(0, dtype=bool)
+        self.upright = np.zeros(0, dtype=bool)
+        for tile in (default_tiles() if tiles is None else tiles):
+            self.add(tile)
+
+    @classmethod
+    def from_names(cls, names):
+        """Palette whose ids follow names (e.g. from a save file); known names keep their TileDef."""
+        defaults = {tile.name: tile for tile in default_tiles()}
+        palette = cls(tiles=[])
+        for name in names:
+            if name in defaults:
+                palette.add(defaults[name])
+            else:
+                palette.id_of(name)
+        # built-ins the saved palette didn't use yet get ids after the saved ones
+        for tile in defaults.values():
+            palette.add(tile)
+        return palette
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def add(self, tile):
+        if tile.name in self.ids:
+            return self.ids[tile.name]
+        tid = len(self.tiles)
+        self.tiles.append(tile)
+        self.ids[tile.name] = tid
+        self.tillable = np.append(self.tillable, tile.tillable)
+        self.overlay = np.append(self.overlay, tile.overlay)
+        self.solid = np.append(self.solid, tile.solid)
+        self.upright = np.append(self.upright, tile.upright)
+        return tid
+
+    def id_of(self, name):
+        """Id for name; unknown names are registered with the old string-based rules."""
+        tid = self.ids.get(name)
+        if tid is None:
+            tid = self.add(TileDef(name,
+                                   tillable=name.startswith('grass') or name.startswith('flower_'),
+                                   overlay=name == 'tree' or name.startswith('flower_'),
+                                   solid=name == 'tree', upright=name == 'tree'))
+        return tid
+
+    def name_of(self, tid):
+        return self.tiles[tid].name
+
+    def dtype(self):
+        return np.uint8 if len(self.tiles) <= 256 else np.uint16
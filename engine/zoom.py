@@ -0,0 +1,275 @@
+"""
+Drawing the world at camera zooms other than 1:1.
+
+Zoomed in, or out to no further than 1/sqrt(2), the frame is drawn as usual (ground chunks,
+then the render queue) into an offscreen canvas the size of the camera's view, and scaled onto
+the screen in one call.
+
+Further out the view holds too many full-size pixels for that, so chunks are kept pre-scaled
+at 1/2, 1/4, 1/8, ... (mip levels). A level is built straight from tile images scaled once to
+that size (TileMap.bake_level), or by halving the next finer level when there is one, only when
+a chunk at that level is first on screen; the least recently used ones are dropped past a
+memory budget, so levels stay around for the next zoom step. A frame takes the visible chunks
+of the level nearest the zoom and smoothscales each by what is left over (a factor between
+1/sqrt(2) and sqrt(2)), so zooming changes smoothly between levels; those scaled copies are
+kept while the zoom holds still, so a still frame is mostly blits. While the zoom is easing
+from one value to another every frame, the scaling is the cheap nearest-pixel kind instead.
+The queued sprites are scaled to the zoom the same way. Chunks remember TileMap.chunk_stamp when built; once it moves
+(tilling, planting, crops growing) the old copy is still drawn until a later frame gets round
+to rebuilding it, a few chunks a frame.
+"""
+import math
+import time
+from collections import OrderedDict
+
+import pygame
+
+from .tilemap import CHUNK_TILES, GROUND_FILL
+
+
+class ScaledImages:
+    """
+    ScaledImages()
+    images(surface, shift) -> surface scaled to 1 / 2**shift, made once per surface and shift.
+    images.at(surface, scale) -> surface smoothscaled by scale (x, y); only the last scale is kept.
+    """
+    def __init__(self):
+        self._scaled = {}
+        self._at = {}
+        self._at_scale = None
+
+    def __call__(self, surface, shift):
+        if shift == 0:
+            return surface
+        key = (surface, shift)
+        scaled = self._scaled.get(key)
+        if scaled is None:
+            w, h = surface.get_size()
+            scaled = pygame.transform.smoothscale(surface, (max(1, w >> shift), max(1, h >> shift)))
+            self._scaled[key] = scaled
+        return scaled
+
+    def at(self, surface, scale):
+        if scale != self._at_scale:
+            self._at.clear()
+            self._at_scale = scale
+        scaled = self._at.get(surface)
+        if scaled is None:
+            w, h = surface.get_size()
+            scaled = pygame.transform.smoothscale(surface, (max(1, round(w * scale[0])), max(1, round(h * scale[1]))))
+            self._at[surface] = scaled
+        return scaled
+
+    def clear(self):
+        self._scaled.clear()
+        self._at.clear()
+
+
+class ZoomLayer:
+    """
+    ZoomLayer(memory_budget=32 MiB, build_ms=3.0, max_builds=4)
+    Draws frames for a zoomed camera; see the module docstring. A frame builds at most
+    max_builds level chunks and stops early once past build_ms (after the first): chunks missing
+    at this level come first, nearest the middle of the view, then stale ones, longest stale
+    first. Until built, a missing chunk shows the nearest coarser level stretched (else the finer
+    one shrunk, else plain ground) and a stale one keeps its old copy. Near 1:1 the map's own
+    full-size chunks are baked within the same budget.
+    """
+    def __init__(self, memory_budget=32 * 1024 * 1024, build_ms=3.0, max_builds=4):
+        self.memory_budget = int(memory_budget)
+        self.build_ms = build_ms
+        self.max_builds = max_builds
+        self.images = ScaledImages()
+        self.levels = OrderedDict()  # (cx, cy, shift) -> (stamp, surface, frame built), least recently used first
+        self.memory_used = 0
+        self.frame = 0
+        self.built = 0  # level chunks built by the last draw
+        self.pending = 0  # visible chunks the last draw left missing or stale
+        self.shift = 0  # level used by the last draw
+        self._tilemap = None
+        self._canvas = None
+        self._shown = {}  # (cx, cy) -> (source level, its copy scaled for the screen, smoothly?), last frame
+        self._zoom = None  # zoom of the last draw
+        self._plain = None  # GROUND_FILL chunk, standing in at 1:1 when nothing else can
+        self._deadline = 0.0
+
+    def clear(self):
+        self.levels.clear()
+        self.memory_used = 0
+        self._shown.clear()
+
+    @staticmethod
+    def level_for(zoom, max_shift):
+        """(shift, remaining scale) with zoom = remaining / 2**shift: the level nearest zoom (0 from 1/sqrt(2) up)."""
+        if zoom >= math.sqrt(0.5):
+            return 0, zoom
+        shift = min(max_shift, int(round(math.log2(1.0 / zoom))))
+        return shift, zoom * (1 << shift)
+
+    def _canvas_of(self, size):
+        # the view's size changes every frame of a zoom: keep one big enough and use part of it
+        w, h = self._canvas.get_size() if self._canvas is not None else (0, 0)
+        if size[0] > w or size[1] > h:
+            self._canvas = pygame.Surface((max(w, size[0]), max(h, size[1]))).convert()
+        return self._canvas.subsurface((0, 0) + tuple(size))
+
+    def draw(self, surface, tilemap, view, zoom, queue):
+        """
+        Draw tilemap and queue's world sprites as seen through view (world rect) at zoom onto
+        surface. queue is begun on view and holds the characters; the map's crops and trees are
+        added here (at 1/2 and below they are part of the scaled chunks).
+        """
+        if tilemap is not self._tilemap:
+            self.clear()
+            self._tilemap = tilemap
+        max_shift = min(tilemap.tile_w, tilemap.tile_h).bit_length() - 1
+        shift, _ = self.level_for(zoom, max_shift)
+        self.shift = shift
+        self.frame += 1
+        self.built = self.pending = 0
+        self._deadline = time.perf_counter() + self.build_ms / 1000.0
+        # while the zoom is still easing, frames scale the quick way (nearest pixel)
+        settled, self._zoom = zoom == self._zoom, zoom
+        if shift:
+            # view is the camera rect, rounded to whole world pixels: fill the surface exactly
+            scale = (surface.get_width() / view.width, surface.get_height() / view.height)
+            self._draw_levels(surface, tilemap, view, shift, scale, settled)
+            queue.draw_world_zoomed(surface, scale, self.images.at)
+            return
+
+        self._shown.clear()
+        canvas = self._canvas_of(view.size)
+        tilemap.draw_ground(canvas, view, fallback=lambda cx, cy: self._unbaked(tilemap, cx, cy))
+        tilemap.submit_objects(queue)
+        queue.draw_world(canvas)
+        if canvas.get_size() == surface.get_size():
+            surface.blit(canvas, (0, 0))
+        elif zoom > 1.0 or not settled:
+            pygame.transform.scale(canvas, surface.get_size(), surface)
+        else:
+            pygame.transform.smoothscale(canvas, surface.get_size(), surface)
+
+    def _draw_levels(self, surface, tilemap, view, shift, scale, settled):
+        chunk_w, chunk_h = CHUNK_TILES * tilemap.tile_w, CHUNK_TILES * tilemap.tile_h
+        keys = list(tilemap.chunk_keys(view))
+        mid_x, mid_y = view.centerx / chunk_w - 0.5, view.centery / chunk_h - 0.5
+        keys.sort(key=lambda key: (key[0] - mid_x) ** 2 + (key[1] - mid_y) ** 2)
+
+        levels = self.levels
+        missing, stale = [], []
+        for cx, cy in keys:
+            stamp = tilemap.chunk_stamp(cx, cy)
+            entry = levels.get((cx, cy, shift))
+            if entry is None:
+                missing.append((cx, cy, stamp))
+            elif entry[0] != stamp:
+                stale.append((cx, cy, stamp))
+        stale.sort(key=lambda item: levels[(item[0], item[1], shift)][2])
+
+        for cx, cy, stamp in missing + stale:
+            if not self._may_build():
+                self.pending += 1
+                continue
+            built_stamp, level = self._build(tilemap, cx, cy, shift, stamp)
+            if level is None:
+                continue
+            self.built += 1
+            old = levels.get((cx, cy, shift))
+            if old is not None:
+                self.memory_used -= self._bytes(old[1])
+            levels[(cx, cy, shift)] = (built_stamp, level, self.frame)
+            self.memory_used += self._bytes(level)
+
+        # each chunk is scaled the rest of the way on its own, out to the screen pixels its world
+        # rect's edges fall on (so neighbours meet without gaps whatever the view's offset)
+        sx, sy = scale
+        left, top = math.floor(view.left * sx), math.floor(view.top * sy)
+        shown, last = {}, self._shown
+        blits = []
+        used = set()
+        for cx, cy in keys:
+            key = (cx, cy, shift)
+            entry = levels.get(key)
+            if entry is not None:
+                levels.move_to_end(key)
+                used.add(key)
+                level, level_shift = entry[1], shift
+            else:
+                stand_in = self._stand_in(cx, cy, shift)
+                if stand_in is None:
+                    continue
+                level, level_shift = stand_in
+            # chunks at the map's edge are narrower; levels are exactly 1 / 2**shift of the world
+            x0, y0 = math.floor(cx * chunk_w * sx), math.floor(cy * chunk_h * sy)
+            size = (math.floor((cx * chunk_w + (level.get_width() << level_shift)) * sx) - x0,
+                    math.floor((cy * chunk_h + (level.get_height() << level_shift)) * sy) - y0)
+            if size[0] <= 0 or size[1] <= 0:
+                continue
+            smooth = settled and entry is not None  # stand-ins only last a frame or two
+            prev = last.get((cx, cy))
+            if prev is not None and prev[0] is level and prev[1].get_size() == size and (prev[2] or not smooth):
+                scaled, smooth = prev[1], prev[2]
+            elif level.get_size() == size:
+                scaled, smooth = level, True
+            elif smooth:
+                scaled = pygame.transform.smoothscale(level, size)
+            else:
+                scaled = pygame.transform.scale(level, size)
+            shown[(cx, cy)] = (level, scaled, smooth)
+            blits.append((scaled, (x0 - left, y0 - top)))
+        self._shown = shown
+        surface.fill(GROUND_FILL)
+        surface.blits(blits, doreturn=False)
+        self._evict(used)
+
+    def _may_build(self):
+        return self.built < self.max_builds and (not self.built or time.perf_counter() < self._deadline)
+
+    def _unbaked(self, tilemap, cx, cy):
+        # draw_ground's fallback at 1:1 and a little below: full-size chunks count against the
+        # same budget as the levels, and stand in the same way
+        if self._may_build():
+            self.built += 1
+            return None
+        self.pending += 1
+        size = (CHUNK_TILES * tilemap.tile_w, CHUNK_TILES * tilemap.tile_h)
+        stand_in = self._stand_in(cx, cy, 0)
+        if stand_in is not None:
+            level, level_shift = stand_in
+            return pygame.transform.scale(level, (level.get_width() << level_shift, level.get_height() << level_shift))
+        if self._plain is None or self._plain.get_size() != size:
+            self._plain = pygame.Surface(size).convert()
+            self._plain.fill(GROUND_FILL)
+        return self._plain
+
+    def _stand_in(self, cx, cy, shift):
+        # (level, its shift), shown scaled to fit for a chunk not built yet at this level: the
+        # nearest coarser level, else the next finer one
+        for other in (shift + 1, shift + 2, shift + 3, shift - 1):
+            entry = self.levels.get((cx, cy, other))
+            if entry is not None:
+                return entry[1], other
+        return None
+
+    def _build(self, tilemap, cx, cy, shift, stamp):
+        # (stamp, surface). Halving the next finer level is much cheaper than baking; a stale finer
+        # level is still halved (and the result keeps its stamp, so it is refreshed later in turn)
+        # unless this level already has a copy that new.
+        finer = self.levels.get((cx, cy, shift - 1))
+        current = self.levels.get((cx, cy, shift))
+        if finer is not None and (finer[0] == stamp or current is None or current[0] < finer[0]):
+            w, h = finer[1].get_size()
+            return finer[0], pygame.transform.smoothscale(finer[1], (max(1, w >> 1), max(1, h >> 1)))
+        return stamp, tilemap.bake_level(cx, cy, shift, self.images)
+
+    @staticmethod
+    def _bytes(level):
+        return level.get_width() * level.get_height() * level.get_bytesize()
+
+    def _evict(self, keep):
+        levels = self.levels
+        while self.memory_used > self.memory_budget and levels:
+            key = next(iter(levels))
+            if key in keep:  # everything left was drawn this frame
+                break
+            self.memory_used -= self._bytes(levels.pop(key)[1])
@@ -1,17 +1,94 @@
+import time
+_started = time.perf_counter()  # the startup report counts the imports below
+
+import argparse
+import json
+import os
 import pygame
 import sys
 from engine.tilemap import TileMap
 from engine.camera import Camera
 from engine.player import Player
 from engine.inventory import Inventory
+from engine.simulation import Simulation
+from engine.profiler import FrameProfiler, StartupTimer
+from engine.assets import get_assets
+from engine.savefile import load_world, restore_inventory
+from engine.autosave import Autosave
+from engine.streaming import StreamingTileMap
+from engine.framebuffer import GroundLayer
+from engine.entities import Entities, villager_kind
+from engine.render import RenderQueue
+from engine.replay import InputRecorder, LiveInput, ReplayInput, state_hash
+
+SAVE_PATH = "savegame.sdv"
+# changed chunks of the endless world (python main.py --stream) are paged out here
+STREAM_DIR = "world"
+# with more villagers than this on screen the whole frame is redrawn instead of one rect per villager
+MAX_DIRTY_ENTITIES = 32
+# converted and scaled images are kept here so later launches skip decoding them
+ASSET_CACHE_DIR = "asset_cache"
+# one press of +/- (or one Ctrl+wheel notch) zooms by this factor; M toggles the whole-farm overview
+ZOOM_STEP = 1.25
+
+
+def apply_area_tool(tilemap, inventory, button, start, end, mods=0):
+    """
+    Apply the mouse tool to every tile from start to end (tile corners of a drag, inclusive):
+    left button tills, right button (or shift in mods) plants the selected seeds, middle button harvests.
+    """
+    c0, c1 = min(start[0], end[0]), max(start[0], end[0]) + 1
+    r0, r1 = min(start[1], end[1]), max(start[1], end[1]) + 1
+    if button == 2:
+        for crop_name, count in tilemap.harvest_rect(c0, r0, c1, r1).items():
+            inventory.add_item(crop_name, count)
+    elif button == 3 or (mods & pygame.KMOD_SHIFT):
+        selected_item = inventory.get_selected_item()
+        if selected_item and selected_item.item.plants:
+            # no more than the seeds in hand, paid for in one go
+            planted = tilemap.plant_rect(c0, r0, c1, r1, selected_item.item.plants, limit=selected_item.count)
+            if planted:
+                inventory.consume_selected(planted)
+    else:
+        tilemap.till_rect(c0, r0, c1, r1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stardew Clone")
+    parser.add_argument('--stream', action='store_true', help="play in the endless streaming world")
+    parser.add_argument('--npcs', type=int, default=0, help="villagers wandering around the farm")
+    parser.add_argument('--record', metavar='FILE', help="record every frame's input to FILE (see engine.replay)")
+    parser.add_argument('--replay', metavar='FILE', help="play back a recording instead of reading input")
+    parser.add_argument('--no-render', action='store_true', help="with --replay: don't draw, run as fast as possible")
+    parser.add_argument('--report', metavar='FILE', help="with --replay: write per-frame state hashes and timings")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="print how long each startup phase took once the first frame is drawn")
+    return parser.parse_args(argv)
 
-pygame.init()
 
 def main():
+    startup = StartupTimer(_started)
+    startup.mark('imports')
+    args = parse_args()
+    replay = ReplayInput(args.replay) if args.replay else None
+    if replay:
+        args.stream = replay.meta.get('stream', False)
+        args.npcs = replay.meta.get('npcs', 0)
+    # recordings start from a fresh world with nothing running in the background, so the
+    # game state depends only on the recorded input
+    fresh = bool(args.record or replay)
+    render = not (replay and args.no_render)
+
+    # only the display; fonts are initialised by whatever first draws text, and there is no sound
+    pygame.display.init()
+    startup.mark('pygame.init')
+
     # Screen and world settings
     screen_width, screen_height = 800, 600
     screen = pygame.display.set_mode((screen_width, screen_height))
     pygame.display.set_caption("Stardew Clone")
+    get_assets().set_cache_dir(ASSET_CACHE_DIR)
+    startup.mark('display')
 
     clock = pygame.time.Clock()
 
@@ -20,8 +97,25 @@ def main():
 
     # Initialize game objects
     player = Player(100, 100)
-    tilemap = TileMap(world_width, world_height)
+    startup.mark('player')
+    saved = None
+    streaming = args.stream
+    if streaming:
+        # endless world: chunks are generated/loaded around the camera on a worker thread
+        # (for recordings: on this thread, kept in memory)
+        tilemap = StreamingTileMap(seed=1, store_dir=None if fresh else STREAM_DIR, threaded=not fresh)
+        world_width = world_height = None
+    elif os.path.exists(SAVE_PATH) and not fresh:
+        # decodes only the chunks around the saved player position; the rest load on demand
+        tilemap, saved = load_world(SAVE_PATH)
+        world_width, world_height = tilemap.cols * tilemap.tile_w, tilemap.rows * tilemap.tile_h
+        if saved.get('player'):
+            player.set_position(*saved['player'])
+    else:
+        tilemap = TileMap(world_width, world_height)
     camera = Camera(screen_width, screen_height, world_width, world_height)
+    player.collision_map = tilemap  # trees and the world edge block the player
+    startup.mark('world')
 
     # Inventory with seeds
     # 8 slots to match inventory_bar.png; enlarge slots for better visibility
@@ -29,75 +123,246 @@ def main():
     # Start with seeds but hide numeric counts in UI
     inventory.add_item("carrot_seed", 5)
     inventory.add_item("tomato_seed", 5)
+    if saved:
+        restore_inventory(inventory, saved)
     player.inventory = inventory  # Link inventory to player
+    startup.mark('inventory')
+
+    # Villagers: moved and animated together, drawn only when on screen
+    entities = Entities(world_width, world_height, seed=1)
+    if args.npcs:
+        spread = 2000 if streaming else None
+        lo_x, hi_x = (player.rect.x - spread, player.rect.x + spread) if spread else (0, world_width - 64)
+        lo_y, hi_y = (player.rect.y - spread, player.rect.y + spread) if spread else (0, world_height - 64)
+        rng = entities.rng
+        entities.add_many(villager_kind(), rng.uniform(lo_x, hi_x, args.npcs), rng.uniform(lo_y, hi_y, args.npcs))
+    startup.mark('villagers')
+
+    # World logic runs at a fixed tick rate, independent of render FPS
+    simulation = Simulation(tick_rate=60)
+
+    # Frame profiler overlay: F3 toggles it, F4 dumps a Chrome trace of the buffered frames
+    profiler = FrameProfiler(history=240)
+    simulation.add_system(profiler.timed('player.update', player.update))
+    simulation.add_system(profiler.timed('tilemap.update', tilemap.update))
+    simulation.add_system(profiler.timed('entities.update', entities.update))
+
+    # Saves in the background every 120 s of play and on F5; registered last so it snapshots whole ticks.
+    # The streaming world pages its own chunks out instead.
+    autosave = None
+    if not streaming and not fresh:
+        autosave = Autosave(SAVE_PATH, tilemap, inventory, player, interval=120.0)
+        simulation.add_system(profiler.timed('autosave', autosave.update))
+
+    # Ground image that scrolls with the camera; sprites are drawn over a copy of it
+    ground = GroundLayer(screen_width, screen_height)
+    render_queue = RenderQueue()
+    screen_rect = screen.get_rect()
+    prev_rects = []
+    force_full = True
+
+    # Area tool: press a mouse button on a tile and release it on another to act on the whole rectangle
+    drag_start = drag_button = None
+
+    def mouse_tile(pos):
+        return tilemap.world_to_tile(*camera.screen_to_world(pos))
+
+    # Input comes from pygame (optionally recorded) or from a recording being replayed
+    if replay:
+        source = replay
+    else:
+        recorder = None
+        if args.record:
+            recorder = InputRecorder(args.record, {'stream': streaming, 'npcs': args.npcs,
+                                                   'screen': [screen_width, screen_height],
+                                                   'tick_rate': simulation.tick_rate})
+        source = LiveInput(clock, 60, recorder)
+    startup.mark('systems')
 
     running = True
     while running:
-        dt = clock.tick(60) / 1000.0  # Delta time in seconds
+        frame = source.next_frame()
+        if frame is None:
+            break  # end of the recording
+        dt = frame.dt  # Delta time in seconds
+        profiler.begin_frame()
 
         # Event handling
-        for event in pygame.event.get():
+        for event in frame.events:
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     running = False
+                elif event.key == pygame.K_F3:
+                    profiler.toggle()
+                    force_full = True  # put back what the overlay covered
+                elif event.key == pygame.K_F4:
+                    trace_path = time.strftime("frame_trace_%Y%m%d_%H%M%S.json")
+                    profiler.dump_trace(trace_path)
+                    print("Wrote", trace_path)
+                elif event.key == pygame.K_F5:  # Quick save (written in the background)
+                    if autosave:
+                        autosave.request()
+                    elif streaming:
+                        tilemap.flush()
                 elif event.key == pygame.K_e:  # Interact with tile
                     player.interact(tilemap)
                 elif event.key == pygame.K_p:  # Plant at player position using selected item
                     c, r = tilemap.world_to_tile(player.rect.centerx, player.rect.centery)
                     selected_item = inventory.get_selected_item()
-                    if selected_item and selected_item.get('name', '').endswith('_seed'):
-                        crop_name = selected_item['name'].replace('_seed', '')
-                        if tilemap.plant(c, r, crop_name):
+                    if selected_item and selected_item.item.plants:
+                        if tilemap.plant(c, r, selected_item.item.plants):
                             inventory.consume_selected(1)
                 elif event.key == pygame.K_SPACE:  # Till at player position
                     c, r = tilemap.world_to_tile(player.rect.centerx, player.rect.centery)
                     tilemap.till(c, r)
+                elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):  # Zoom in
+                    camera.zoom_by(ZOOM_STEP)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):  # Zoom out
+                    camera.zoom_by(1 / ZOOM_STEP)
+                elif event.key == pygame.K_m:  # Overview of the whole farm, and back
+                    camera.overview()
                 # number key handling is below in KEYDOWN block
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button in (1, 3):  # Left click: till / Right click: plant
-                    mouse_x, mouse_y = event.pos
-                    world_x = mouse_x + camera.rect.left
-                    world_y = mouse_y + camera.rect.top
-                    col, row = tilemap.world_to_tile(world_x, world_y)
-
-                    do_plant = (event.button == 3) or (pygame.key.get_mods() & pygame.KMOD_SHIFT)
-                    if do_plant:  # Plant
-                        selected_item = inventory.get_selected_item()
-                        if selected_item and selected_item.get('name', '').endswith('_seed'):
-                            crop_name = selected_item['name'].replace('_seed', '')
-                            planted = tilemap.plant(col, row, crop_name)
-                            if planted:
-                                inventory.consume_selected(1)
-                    else:  # Till
-                        tilemap.till(col, row)
+                if event.button in (1, 2, 3):  # Left: till / Right: plant / Middle: harvest
+                    drag_start, drag_button = mouse_tile(event.pos), event.button
+            elif event.type == pygame.MOUSEBUTTONUP:
+                if drag_start is not None and event.button == drag_button:
+                    apply_area_tool(tilemap, inventory, drag_button, drag_start, mouse_tile(event.pos), frame.mods)
+                    drag_start = drag_button = None
 
             elif event.type == pygame.MOUSEWHEEL:
-                inventory.scroll(event.y)
+                if frame.mods & pygame.KMOD_CTRL:
+                    camera.zoom_by(ZOOM_STEP ** event.y)
+                else:
+                    inventory.scroll(event.y)
             elif event.type == pygame.KEYDOWN:
                 # Number keys 1-9 to select inventory slots
                 if pygame.K_1 <= event.key <= pygame.K_9:
                     inventory.set_selected_index(event.key - pygame.K_1)
 
+        profiler.mark('events')
+
         # Player input and movement
-        keys = pygame.key.get_pressed()
+        keys = frame.keys
         player.handle_input(keys, dt)  # ✅ Pass dt here
+        profiler.mark('player.handle_input')
+
+        # Run as many fixed simulation ticks as this frame's dt covers
+        alpha = simulation.advance(dt)
+        profiler.mark('simulation')
+
+        # Update camera to follow player (interpolated between ticks) and ease towards its zoom
+        camera.update(player.render_rect(alpha), dt)
+        profiler.mark('camera.update')
+        frame_hash = state_hash(tilemap, player, inventory, simulation, camera, entities) if source.wants_hash else None
+
+        # Without rendering the ground layer is still kept up to date: it bakes the chunks in
+        # view, which the streaming world's memory budget (and so its paging) counts.
+        # Zoomed frames are drawn whole through the map's zoom layer instead (engine.zoom).
+        view = camera.world_view_rect()
+        zoomed = camera.zoom != 1.0
+        if streaming:
+            tilemap.stream(view)
+        if not render:
+            if not zoomed:
+                ground.update(tilemap, view)
+            profiler.end_frame()
+            source.end_frame(frame_hash)
+            continue
 
-        # Update player with delta time
-        player.update(dt)  # ✅ Updated for dt
+        # Draw everything. The ground layer scrolls with the camera and only draws the strips
+        # that scrolled in; while the view holds still, only the rects around changed sprites
+        # and tiles are redrawn and pushed to the display.
+        highlight = tilemap.world_to_tile(player.rect.centerx, player.rect.centery)
+        if zoomed:
+            ground.invalidate()  # redrawn from scratch once back at 1:1
+            moved, damage = True, []
+        else:
+            moved, damage = ground.update(tilemap, view)
+        profiler.mark('ground.update')
+        sprite_rects = [camera.apply(player.render_rect(alpha)), tilemap.highlight_rect(highlight, view),
+                        inventory.hud_rect(screen_width, screen_height)]
+        drag_rect = None
+        if drag_start is not None:
+            # outline of the tiles the area tool will act on
+            drag_end = mouse_tile(frame.mouse_pos)
+            x0, y0 = tilemap.tile_to_world(min(drag_start[0], drag_end[0]), min(drag_start[1], drag_end[1]))
+            x1, y1 = tilemap.tile_to_world(max(drag_start[0], drag_end[0]) + 1, max(drag_start[1], drag_end[1]) + 1)
+            drag_rect = camera.apply(pygame.Rect(x0, y0, x1 - x0, y1 - y0))
+            sprite_rects.append(drag_rect)
+        entity_rects = entities.rects(view, alpha) if len(entities) else []
+        crowded = len(entity_rects) > MAX_DIRTY_ENTITIES
+        sprite_rects.extend(entity_rects)
 
-        # Update camera to follow player
-        camera.update(player.rect)
+        # Crops, trees, villagers and the player go through one queue, culled to the view and
+        # drawn back to front by where they stand; the HUD goes in its screen layer
+        render_queue.begin(view)
+        if not zoomed:  # the zoom layer adds the map's own (or has them in its scaled chunks)
+            tilemap.submit_objects(render_queue)
+        entities.submit(render_queue, alpha)
+        player.submit(render_queue, alpha)
+        inventory.submit(render_queue, screen_width, screen_height)
+        profiler.mark('render.submit')
 
-        # Draw everything
-        screen.fill((50, 150, 50))
-        tilemap.draw(screen, camera, highlight_pos=tilemap.world_to_tile(player.rect.centerx, player.rect.centery))
-        player.draw(screen, camera)
-        inventory.draw(screen, screen_width, screen_height)
+        if moved or force_full or crowded or profiler.enabled:
+            if zoomed:
+                tilemap.draw_zoomed(screen, camera, highlight, render_queue)
+            else:
+                screen.blit(ground.surface, (0, 0))
+                render_queue.draw_world(screen)
+                tilemap.draw_highlight(screen, view, highlight)
+            if drag_rect:
+                pygame.draw.rect(screen, (255, 255, 255), drag_rect, 2)
+            render_queue.draw_screen(screen)
+            profiler.mark('render.draw')
+            if profiler.enabled:
+                profiler.draw(screen)
+                profiler.mark('profiler.overlay')
 
-        pygame.display.flip()
+            pygame.display.flip()
+            profiler.mark('display.flip')
+            force_full = False
+        else:
+            dirty = [rect.clip(screen_rect) for rect in damage + prev_rects + sprite_rects if rect]
+            dirty = [rect for rect in dirty if rect.width and rect.height]
+            for rect in dirty:
+                screen.set_clip(rect)
+                screen.blit(ground.surface, rect, rect)
+                render_queue.draw_world(screen, rect.move(view.left, view.top))
+                tilemap.draw_highlight(screen, view, highlight)
+                if drag_rect:
+                    pygame.draw.rect(screen, (255, 255, 255), drag_rect, 2)
+                render_queue.draw_screen(screen)
+            screen.set_clip(None)
+            profiler.mark('dirty.redraw')
+            pygame.display.update(dirty)
+            profiler.mark('display.update')
+        prev_rects = sprite_rects
+        if startup is not None:
+            # lazily loaded assets (ground tiles, crops, the HUD) load during the first frame
+            startup.mark('first frame')
+            if args.startup_report:
+                print(startup.report(get_assets()))
+            startup = None
+        profiler.end_frame()
+        source.end_frame(frame_hash)
 
+    source.close()
+    if replay:
+        report = replay.report()
+        print("Replayed %d frames in %.1f ms (mean %.3f ms, p99 %.3f ms); %s"
+              % (report['frames'], report['total_ms'], report['mean_ms'] or 0.0, report['p99_ms'] or 0.0,
+                 "diverged at frame %d" % replay.diverged_at if replay.diverged_at is not None
+                 else "state matched the recording on every frame"))
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(report, f)
+    if autosave:
+        autosave.close()  # let a save that is still being written finish
+    elif streaming:
+        tilemap.close()  # writes changed chunks and waits for the worker
     pygame.quit()
     sys.exit()
 